@@ -0,0 +1,229 @@
+"""add serving_ads table maintained by triggers
+
+Revision ID: 20261017_0004
+Revises: 20260221_0003
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision = "20261017_0004"
+down_revision = "20260221_0003"
+branch_labels = None
+depends_on = None
+
+# The maintenance functions and triggers as of this revision. Kept inline
+# rather than imported from app.db.serving, so later edits there do not
+# change what this revision installs; change them in a new revision.
+# Campaign.is_running as of this revision; `c` is the campaigns alias.
+_RUNNING = """
+    c.is_enabled = 1
+    AND c.start_date <= now()
+    AND (c.end_date IS NULL OR c.end_date > now())
+    AND c.spending < c.budget
+"""
+
+_CREATE_SQL = (
+    f"""
+    CREATE OR REPLACE FUNCTION serving_ads_refresh(p_ad_ids integer[])
+    RETURNS integer LANGUAGE plpgsql AS $$
+    DECLARE
+        removed integer;
+        upserted integer;
+    BEGIN
+        DELETE FROM serving_ads s
+        WHERE s.id = ANY(p_ad_ids)
+          AND NOT EXISTS (
+              SELECT 1 FROM ad_campaigns ac JOIN campaigns c ON c.id = ac.campaign_id
+              WHERE ac.ad_id = s.id AND {_RUNNING}
+          );
+        GET DIAGNOSTICS removed = ROW_COUNT;
+
+        INSERT INTO serving_ads AS s (
+            id, title, description, keywords, url, image_url, cpc, embedding,
+            search_vector, refreshed_at
+        )
+        SELECT
+            a.id, a.title, a.description, a.keywords, a.url, a.image_url, a.cpc,
+            a.embedding,
+            setweight(to_tsvector('english', a.title), 'A')
+                || setweight(to_tsvector('english', coalesce(array_to_string(a.keywords, ' '), '')), 'B')
+                || setweight(to_tsvector('english', a.description), 'C'),
+            now()
+        FROM ads a
+        WHERE a.id = ANY(p_ad_ids)
+          AND EXISTS (
+              SELECT 1 FROM ad_campaigns ac JOIN campaigns c ON c.id = ac.campaign_id
+              WHERE ac.ad_id = a.id AND {_RUNNING}
+          )
+        ON CONFLICT (id) DO UPDATE SET
+            title = EXCLUDED.title,
+            description = EXCLUDED.description,
+            keywords = EXCLUDED.keywords,
+            url = EXCLUDED.url,
+            image_url = EXCLUDED.image_url,
+            cpc = EXCLUDED.cpc,
+            embedding = EXCLUDED.embedding,
+            search_vector = EXCLUDED.search_vector,
+            refreshed_at = EXCLUDED.refreshed_at
+        -- Skip no-op rewrites (and their HNSW/GIN index churn).
+        WHERE (s.title, s.description, s.keywords, s.url, s.image_url, s.cpc)
+                  IS DISTINCT FROM
+              (EXCLUDED.title, EXCLUDED.description, EXCLUDED.keywords,
+               EXCLUDED.url, EXCLUDED.image_url, EXCLUDED.cpc)
+           OR s.embedding IS DISTINCT FROM EXCLUDED.embedding;
+        GET DIAGNOSTICS upserted = ROW_COUNT;
+
+        RETURN removed + upserted;
+    END
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION serving_ads_refresh_due(p_since timestamptz)
+    RETURNS integer LANGUAGE sql AS $$
+        SELECT serving_ads_refresh(ARRAY(
+            SELECT ac.ad_id
+            FROM ad_campaigns ac JOIN campaigns c ON c.id = ac.campaign_id
+            WHERE p_since IS NULL
+               OR (c.start_date > p_since AND c.start_date <= now())
+               OR (c.end_date > p_since AND c.end_date <= now())
+            UNION
+            SELECT s.id FROM serving_ads s WHERE p_since IS NULL
+        ))
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION serving_ads_on_ads() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        PERFORM serving_ads_refresh(ARRAY[NEW.id]);
+        RETURN NULL;
+    END
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION serving_ads_on_ad_campaigns() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            PERFORM serving_ads_refresh(ARRAY[NEW.ad_id]);
+        ELSIF TG_OP = 'DELETE' THEN
+            PERFORM serving_ads_refresh(ARRAY[OLD.ad_id]);
+        ELSE
+            PERFORM serving_ads_refresh(ARRAY[OLD.ad_id, NEW.ad_id]);
+        END IF;
+        RETURN NULL;
+    END
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION serving_ads_on_campaigns() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        PERFORM serving_ads_refresh(ARRAY(
+            SELECT ad_id FROM ad_campaigns WHERE campaign_id = NEW.id
+        ));
+        RETURN NULL;
+    END
+    $$
+    """,
+    # Deleting an ad cascades to serving_ads; deleting a campaign cascades to
+    # ad_campaigns, whose trigger refreshes the ads involved.
+    """
+    CREATE OR REPLACE TRIGGER trg_serving_ads_ads
+    AFTER INSERT OR UPDATE OF title, description, keywords, url, image_url, cpc, embedding
+    ON ads FOR EACH ROW EXECUTE FUNCTION serving_ads_on_ads()
+    """,
+    # click_count updates do not touch eligibility.
+    """
+    CREATE OR REPLACE TRIGGER trg_serving_ads_ad_campaigns
+    AFTER INSERT OR DELETE OR UPDATE OF ad_id, campaign_id
+    ON ad_campaigns FOR EACH ROW EXECUTE FUNCTION serving_ads_on_ad_campaigns()
+    """,
+    # Spending changes on every billed click; only the budget crossing matters.
+    """
+    CREATE OR REPLACE TRIGGER trg_serving_ads_campaigns
+    AFTER UPDATE OF is_enabled, start_date, end_date, spending, budget
+    ON campaigns FOR EACH ROW
+    WHEN (
+        (OLD.is_enabled, OLD.start_date, OLD.end_date, OLD.budget)
+            IS DISTINCT FROM (NEW.is_enabled, NEW.start_date, NEW.end_date, NEW.budget)
+        OR (OLD.spending < OLD.budget) IS DISTINCT FROM (NEW.spending < NEW.budget)
+    )
+    EXECUTE FUNCTION serving_ads_on_campaigns()
+    """,
+)
+
+_DROP_SQL = (
+    "DROP TRIGGER IF EXISTS trg_serving_ads_campaigns ON campaigns",
+    "DROP TRIGGER IF EXISTS trg_serving_ads_ad_campaigns ON ad_campaigns",
+    "DROP TRIGGER IF EXISTS trg_serving_ads_ads ON ads",
+    "DROP FUNCTION IF EXISTS serving_ads_on_campaigns()",
+    "DROP FUNCTION IF EXISTS serving_ads_on_ad_campaigns()",
+    "DROP FUNCTION IF EXISTS serving_ads_on_ads()",
+    "DROP FUNCTION IF EXISTS serving_ads_refresh_due(timestamptz)",
+    "DROP FUNCTION IF EXISTS serving_ads_refresh(integer[])",
+)
+
+
+def upgrade() -> None:
+    # Denormalized copy of ads with at least one running campaign; retrieval
+    # reads only this table. Maintained by the triggers installed below and by
+    # the app's ServingAdsScheduler (campaign start/end-date transitions).
+    op.create_table(
+        "serving_ads",
+        sa.Column(
+            "id",
+            sa.Integer(),
+            sa.ForeignKey("ads.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("title", sa.Text(), nullable=False),
+        sa.Column("description", sa.Text(), nullable=False),
+        sa.Column("keywords", sa.ARRAY(sa.Text()), nullable=True),
+        sa.Column("url", sa.Text(), nullable=False),
+        sa.Column("image_url", sa.Text(), nullable=True),
+        sa.Column("cpc", sa.Numeric(10, 2), nullable=False),
+        sa.Column("embedding", Vector(768), nullable=True),
+        sa.Column("search_vector", postgresql.TSVECTOR(), nullable=False),
+        sa.Column("refreshed_at", sa.DateTime(timezone=True), nullable=False),
+    )
+
+    # Backfill before building the indexes: one bulk build is much cheaper
+    # than maintaining the HNSW graph row by row.
+    for statement in _CREATE_SQL:
+        op.execute(statement)
+    op.execute("SELECT serving_ads_refresh_due(NULL)")
+
+    op.create_index(
+        "ix_serving_ads_embedding_hnsw",
+        "serving_ads",
+        ["embedding"],
+        unique=False,
+        postgresql_using="hnsw",
+        postgresql_ops={"embedding": "vector_cosine_ops"},
+    )
+    op.create_index(
+        "ix_serving_ads_search_vector",
+        "serving_ads",
+        ["search_vector"],
+        unique=False,
+        postgresql_using="gin",
+    )
+
+
+def downgrade() -> None:
+    for statement in _DROP_SQL:
+        op.execute(statement)
+    op.drop_index("ix_serving_ads_search_vector", table_name="serving_ads")
+    op.drop_index("ix_serving_ads_embedding_hnsw", table_name="serving_ads")
+    op.drop_table("serving_ads")
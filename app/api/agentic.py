@@ -1,75 +1,112 @@
 import logging
 import asyncio
-from fastapi import APIRouter, Depends, HTTPException
+import time
+from typing import Any
 
-from app.dependencies import get_agentic_service, get_gemini_service
-from app.models.chat import ChatRequest, AgenticChatResponse
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sse_starlette.sse import EventSourceResponse
+
+from app.api.sse import sse_error, sse_event
+from app.core import deadline
+from app.core.settings import Settings, get_settings
+from app.dependencies import (
+    get_agentic_service,
+    get_gemini_service,
+    get_single_flight,
+)
+from app.models.chat import ChatRequest, AgenticChatResponse, ChatStreamDone
 from app.services.adAgent_service import AdAgentService
 from app.services.gemini_service import GeminiService
+from app.services.model_router import track_model_choices
+from app.services.single_flight import SingleFlight, request_key
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+AD_SEPARATOR = "\n\n----------------\n"
+
+
+def _ad_usage(ad_response: dict[str, Any]) -> tuple[int, int, int]:
+    """Return (ad_llm_tokens, ad_embedding_tokens, ad_used_tokens)."""
+    ad_llm_tokens = int(ad_response.get("ad_llm_tokens", 0))
+    ad_embedding_tokens = int(ad_response.get("ad_embedding_tokens", 0))
+    ad_used_tokens = ad_llm_tokens + ad_embedding_tokens
+
+    if ad_used_tokens == 0:
+        ad_used_tokens = int(ad_response.get("used_tokens", 0))
+        ad_llm_tokens = ad_used_tokens
+    return ad_llm_tokens, ad_embedding_tokens, ad_used_tokens
+
 
 @router.post("/agentic-chat", response_model=AgenticChatResponse)
 async def chat_agentic(
     request: ChatRequest,
+    http_request: Request,
     gemini_service: GeminiService = Depends(get_gemini_service),
     ad_agent_service: AdAgentService = Depends(get_agentic_service),
+    single_flight: SingleFlight = Depends(get_single_flight),
 ) -> AgenticChatResponse:
     try:
-        chat_task = gemini_service.generate_chat_response(
-            message=request.message,
-            history=request.history,
-        )
+        async def _generate():
+            chat_task = gemini_service.generate_chat_response(
+                message=request.message,
+                history=request.history,
+            )
 
-        ad_task = ad_agent_service.analyze_and_get_ad(
-            history=request.history,
-            latest_message=request.message,
-        )
+            ad_task = ad_agent_service.analyze_and_get_ad(
+                history=request.history,
+                latest_message=request.message,
+            )
+
+            with track_model_choices() as models:
+                chat_result, ad_result = await asyncio.gather(chat_task, ad_task)
+            return chat_result, ad_result, dict(models)
 
-        chat_response, ad_response = await asyncio.gather(chat_task, ad_task)
+        (chat_response, ad_response, models), shared = await single_flight.do(
+            request_key("agentic-chat", request),
+            _generate,
+            timeout=deadline.request_timeout(
+                get_settings(), http_request.url.path, None
+            ),
+        )
 
         response, chat_generation_time, chat_used_tokens = chat_response
 
         ad_text = ad_response.get("ad_text")
         ad_generation_time = ad_response.get("generation_time", 0.0)
-        
-        ad_llm_tokens = int(ad_response.get("ad_llm_tokens", 0))
-        ad_embedding_tokens = int(ad_response.get("ad_embedding_tokens", 0))
-        ad_used_tokens = ad_llm_tokens + ad_embedding_tokens
-        
-        if ad_used_tokens == 0:
-            ad_used_tokens = int(ad_response.get("used_tokens", 0))
-            ad_llm_tokens = ad_used_tokens
+        ad_llm_tokens, ad_embedding_tokens, ad_used_tokens = _ad_usage(ad_response)
 
         logger.info("Chat Response: %s", chat_response)
         logger.info("Ad Agent Response: %s", ad_response)
         final_response = response
         if ad_text:
-            final_response += (
-                "\n\n----------------\n"
-                f"{ad_text}"
-            )
+            final_response += f"{AD_SEPARATOR}{ad_text}"
 
         total_generation_time = max(chat_generation_time, ad_generation_time)
         total_used_tokens = chat_used_tokens + ad_used_tokens
 
+        breakdown = {
+            "chat_generation_time": chat_generation_time,
+            "ad_generation_time": ad_generation_time,
+            "ad_llm_tokens": ad_llm_tokens,
+            "ad_embedding_tokens": ad_embedding_tokens,
+            "ad_total_tokens": ad_used_tokens,
+            "aggregation": "max_parallel",
+            "models": models,
+        }
+        if ad_response.get("skipped"):
+            breakdown["ad_skipped"] = ad_response["skipped"]
+        if shared:
+            breakdown["coalesced"] = True
+
         return AgenticChatResponse(
             response=final_response,
             chat_response=response,
             ad_text=ad_text,
             generation_time=total_generation_time,
             used_tokens=total_used_tokens,
-            breakdown={
-                "chat_generation_time": chat_generation_time,
-                "ad_generation_time": ad_generation_time,
-                "ad_llm_tokens": ad_llm_tokens,
-                "ad_embedding_tokens": ad_embedding_tokens,
-                "ad_total_tokens": ad_used_tokens,
-                "aggregation": "max_parallel",
-            },
+            breakdown=breakdown,
             ad_generation_time=ad_generation_time,
             ad_used_tokens=ad_used_tokens,
             metadata={
@@ -87,3 +124,100 @@ async def chat_agentic(
             detail=f"Internal server error:\
                 {e.__dict__.get('message', str(e))}"
             )
+
+
+@router.post("/agentic-chat/stream")
+async def chat_agentic_stream(
+    request: ChatRequest,
+    gemini_service: GeminiService = Depends(get_gemini_service),
+    ad_agent_service: AdAgentService = Depends(get_agentic_service),
+    settings: Settings = Depends(get_settings),
+) -> EventSourceResponse:
+    """
+    Stream the chat answer immediately and late-bind the sponsored block.
+
+    The ad agent runs concurrently with the chat stream. Events: `token`
+    ({"text"}) per chat chunk, then `ad` ({"ad_text", "separator"}) if the
+    agent produced an ad by the end of the chat stream plus
+    AGENTIC_AD_GRACE_PERIOD seconds (otherwise it is dropped), then `done`
+    (ChatStreamDone) or `error` ({"detail"}).
+    """
+    async def _events():
+        start_time = time.perf_counter()
+        ad_task = asyncio.create_task(
+            ad_agent_service.analyze_and_get_ad(
+                history=request.history,
+                latest_message=request.message,
+            )
+        )
+        try:
+            chat_generation_time = 0.0
+            time_to_first_token = 0.0
+            chat_used_tokens = 0
+            chat_model = None
+            async for event in gemini_service.stream_chat_response(
+                message=request.message,
+                history=request.history,
+            ):
+                if event["type"] == "token":
+                    yield sse_event("token", {"text": event["text"]})
+                elif event["type"] == "done":
+                    chat_generation_time = event["generation_time"]
+                    time_to_first_token = event["time_to_first_token"]
+                    chat_used_tokens = event["used_tokens"]
+                    chat_model = event.get("model")
+
+            ad_response: dict[str, Any] = {}
+            ad_dropped = False
+            try:
+                ad_response = await asyncio.wait_for(
+                    ad_task,
+                    timeout=deadline.timeout_for(settings.agentic_ad_grace_period),
+                )
+            except asyncio.TimeoutError:
+                ad_dropped = True
+                logger.info(
+                    "Ad agent not ready %.2fs after chat stream; dropping ad",
+                    settings.agentic_ad_grace_period,
+                )
+
+            ad_text = ad_response.get("ad_text")
+            ad_generation_time = ad_response.get("generation_time", 0.0)
+            ad_llm_tokens, ad_embedding_tokens, ad_used_tokens = _ad_usage(ad_response)
+            if ad_text:
+                yield sse_event("ad", {"ad_text": ad_text, "separator": AD_SEPARATOR})
+
+            yield sse_event("done", ChatStreamDone(
+                generation_time=time.perf_counter() - start_time,
+                time_to_first_token=time_to_first_token,
+                used_tokens=chat_used_tokens + ad_used_tokens,
+                breakdown={
+                    "chat_generation_time": chat_generation_time,
+                    "ad_generation_time": ad_generation_time,
+                    "chat_used_tokens": chat_used_tokens,
+                    "ad_llm_tokens": ad_llm_tokens,
+                    "ad_embedding_tokens": ad_embedding_tokens,
+                    "ad_total_tokens": ad_used_tokens,
+                    "ad_injected": bool(ad_text),
+                    "ad_dropped": ad_dropped,
+                    "ad_skipped": ad_response.get("skipped"),
+                    "aggregation": "streamed_late_bound_ad",
+                    "models": {
+                        "chat": chat_model,
+                        **ad_response.get("models", {}),
+                    },
+                },
+            ))
+        except Exception as e:
+            logger.exception("Agentic chat stream endpoint failed")
+            yield sse_error(f"Internal server error: {e}")
+        finally:
+            # Client disconnects and errors must not leave the agent running,
+            # and an agent that already failed must not log "exception was
+            # never retrieved" when the task is collected.
+            if not ad_task.done():
+                ad_task.cancel()
+            elif not ad_task.cancelled():
+                ad_task.exception()
+
+    return EventSourceResponse(_events())
@@ -1,22 +1,67 @@
 import logging
+import time
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sse_starlette.sse import EventSourceResponse
 
-from app.dependencies import get_gemini_service
-from app.models.chat import ChatRequest, ChatResponse
+from app.api.sse import sse_error, sse_event
+from app.core.deadline import DeadlineExceeded, request_timeout
+from app.core.settings import get_settings
+from app.dependencies import (
+    get_gemini_service,
+    get_semantic_response_cache,
+    get_single_flight,
+)
+from app.models.chat import ChatRequest, ChatResponse, ChatStreamDone
+from app.services.circuit_breaker import CircuitOpenError
 from app.services.gemini_service import GeminiService
+from app.services.model_router import track_model_choices
+from app.services.response_cache import SemanticResponseCache
+from app.services.single_flight import SingleFlight, mark_coalesced, request_key
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
-@router.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(
+async def _answer_chat(
     request: ChatRequest,
-    gemini_service: GeminiService = Depends(get_gemini_service),
+    gemini_service: GeminiService,
+    response_cache: SemanticResponseCache | None,
 ) -> ChatResponse:
-    try:
+    start_time = time.perf_counter()
+    cache_key = None
+    query_embedding = None
+    embedding_tokens = 0
+    if response_cache is not None and response_cache.eligible(request.history):
+        try:
+            query_embedding, embedding_usage = (
+                await gemini_service.embed_text_with_usage_details(
+                    request.message
+                )
+            )
+            embedding_tokens = embedding_usage.tokens
+            cache_key = response_cache.context_key("chat", request.history)
+        except Exception:
+            logger.exception("Chat: semantic cache lookup embedding failed")
+
+    if cache_key is not None:
+        cached = response_cache.lookup(cache_key, query_embedding)
+        if cached is not None:
+            cached_text, similarity = cached
+            return ChatResponse(
+                response=cached_text,
+                generation_time=time.perf_counter() - start_time,
+                used_tokens=embedding_tokens,
+                breakdown={
+                    "llm_call_count": 0,
+                    "embedding_tokens": embedding_tokens,
+                    "semantic_cache_hit": True,
+                    "semantic_cache_similarity": similarity,
+                },
+            )
+
+    with track_model_choices() as models:
         (
             response_text,
             generation_time,
@@ -25,14 +70,82 @@ async def chat_endpoint(
             message=request.message,
             history=request.history,
         )
-        return ChatResponse(
-            response=response_text,
-            generation_time=generation_time,
-            used_tokens=used_tokens,
-            breakdown={
-                "llm_call_count": 1,
-            },
+    breakdown = {
+        "llm_call_count": 1,
+        "models": dict(models),
+    }
+    if response_cache is not None:
+        breakdown["embedding_tokens"] = embedding_tokens
+        breakdown["semantic_cache_hit"] = False
+    if cache_key is not None:
+        response_cache.store(cache_key, query_embedding, response_text)
+    return ChatResponse(
+        response=response_text,
+        generation_time=generation_time,
+        used_tokens=used_tokens + embedding_tokens,
+        breakdown=breakdown,
+    )
+
+
+@router.post("/chat", response_model=ChatResponse)
+async def chat_endpoint(
+    request: ChatRequest,
+    http_request: Request,
+    gemini_service: GeminiService = Depends(get_gemini_service),
+    response_cache: SemanticResponseCache | None = Depends(
+        get_semantic_response_cache
+    ),
+    single_flight: SingleFlight = Depends(get_single_flight),
+) -> ChatResponse:
+    try:
+        response, shared = await single_flight.do(
+            request_key("chat", request),
+            lambda: _answer_chat(request, gemini_service, response_cache),
+            timeout=request_timeout(get_settings(), http_request.url.path, None),
         )
+        return mark_coalesced(response) if shared else response
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.exception("Chat endpoint failed")
         raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+
+@router.post("/chat/stream")
+async def chat_stream_endpoint(
+    request: ChatRequest,
+    gemini_service: GeminiService = Depends(get_gemini_service),
+) -> EventSourceResponse:
+    """
+    Stream the chat answer as Server-Sent Events.
+
+    Events: `token` ({"text"}) per generated chunk, then a final `done`
+    (ChatStreamDone with generation_time, time_to_first_token, used_tokens),
+    or `error` ({"detail"}) if generation fails mid-stream.
+    """
+    async def _events():
+        try:
+            async for event in gemini_service.stream_chat_response(
+                message=request.message,
+                history=request.history,
+            ):
+                if event["type"] == "token":
+                    yield sse_event("token", {"text": event["text"]})
+                elif event["type"] == "done":
+                    yield sse_event("done", ChatStreamDone(
+                        generation_time=event["generation_time"],
+                        time_to_first_token=event["time_to_first_token"],
+                        used_tokens=event["used_tokens"],
+                        breakdown={
+                            "llm_call_count": 1,
+                            "time_to_first_token": event["time_to_first_token"],
+                            "models": {"chat": event.get("model")},
+                        },
+                    ))
+        except Exception as e:
+            logger.exception("Chat stream endpoint failed")
+            yield sse_error(f"Internal server error: {e}")
+
+    return EventSourceResponse(_events())
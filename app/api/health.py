@@ -1,6 +1,16 @@
 import logging
+from typing import Any
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+
+from app.db.vector_index import get_vector_index
+from app.services.circuit_breaker import CLOSED, get_circuit_breakers
+from app.services.conversation import conversation_stats
+from app.services.gemini_clients import get_gemini_client_registry
+from app.services.gemini_service import get_gemini_service
+from app.services.model_router import get_model_router
+from app.services.rate_limiter import get_gemini_rate_limiter
+from app.services.response_cache import get_semantic_response_cache
 
 
 logger = logging.getLogger(__name__)
@@ -8,6 +18,48 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
+def _gemini_service_metrics() -> dict[str, Any]:
+    try:
+        service = get_gemini_service()
+    except RuntimeError:
+        # GEMINI_API_KEY is not configured
+        return {
+            "embedding_tokens": None,
+            "embedding_cache": None,
+            "embedding_batcher": None,
+            "gemini_hedging": None,
+        }
+    return {
+        "embedding_tokens": service.token_accounting_stats(),
+        "embedding_cache": service.embedding_cache_stats(),
+        "embedding_batcher": service.embedding_batcher_stats(),
+        "gemini_hedging": service.hedging_stats(),
+    }
+
+
+def _semantic_cache_stats() -> dict[str, Any] | None:
+    cache = get_semantic_response_cache()
+    return cache.stats() if cache is not None else None
+
+
+def _rate_limiter_stats() -> dict[str, Any] | None:
+    limiter = get_gemini_rate_limiter()
+    return limiter.stats() if limiter is not None else None
+
+
+def _serving_ads_stats(request: Request) -> dict[str, Any] | None:
+    scheduler = request.app.state.serving_ads
+    return scheduler.stats() if scheduler is not None else None
+
+
+def _vector_index_stats(request: Request) -> dict[str, Any] | None:
+    sync = request.app.state.vector_index_sync
+    if sync is not None:
+        return sync.stats()
+    index = get_vector_index()
+    return index.stats() if index is not None else None
+
+
 @router.get("/")
 def root_health_check() -> dict[str, str]:
     try:
@@ -18,9 +70,32 @@ def root_health_check() -> dict[str, str]:
 
 
 @router.get("/health")
-def health_check() -> dict[str, str]:
+def health_check() -> dict[str, Any]:
     try:
-        return {"status": "ok"}
+        # Open circuits degrade answers but do not take the service down.
+        circuits = get_circuit_breakers().states()
+        degraded = any(state not in {CLOSED, "disabled"} for state in circuits.values())
+        return {"status": "degraded" if degraded else "ok", "circuits": circuits}
     except Exception as e:
         logger.exception("Health endpoint failed")
         raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+
+@router.get("/metrics")
+def metrics(request: Request) -> dict[str, Any]:
+    try:
+        return {
+            "single_flight": request.app.state.single_flight.stats(),
+            "gemini_clients": get_gemini_client_registry().stats(),
+            "gemini_rate_limiter": _rate_limiter_stats(),
+            "model_router": get_model_router().stats(),
+            "circuit_breakers": get_circuit_breakers().stats(),
+            **_gemini_service_metrics(),
+            "semantic_cache": _semantic_cache_stats(),
+            "conversation": conversation_stats(),
+            "serving_ads": _serving_ads_stats(request),
+            "vector_index": _vector_index_stats(request),
+        }
+    except Exception as e:
+        logger.exception("Metrics endpoint failed")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
@@ -1,11 +1,18 @@
 import asyncio
 import logging
+from functools import lru_cache
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 
+from app.core.deadline import request_timeout
+from app.dependencies import get_single_flight
 from app.models.chat import ChatRequest, ChatResponse
+from app.services.circuit_breaker import CircuitOpenError, get_circuit_breakers
+from app.services.gemini_clients import get_gemini_client_registry
 from app.services.mcp_client import McpClient
 from app.services.mcp_service import McpService
+from app.services.model_router import get_model_router
+from app.services.single_flight import SingleFlight, request_key
 from app.core.settings import get_settings
 
 logger = logging.getLogger(__name__)
@@ -15,30 +22,48 @@ router = APIRouter()
 mcp_client_instance = McpClient(server_script_path="app/mcp/server.py")
 
 
+@lru_cache
 def get_mcp_service():
+    # McpService keeps no per-request state, so one instance is shared.
     settings = get_settings()
     return McpService(
         mcp_client=mcp_client_instance,
         system_prompt=settings.mcp_system_prompt,
+        clients=get_gemini_client_registry(),
+        router=get_model_router(),
+        breakers=get_circuit_breakers(),
     )
 
 
 @router.post("/mcp-chat", response_model=ChatResponse)
 async def mcp_endpoint(
     request: ChatRequest,
+    http_request: Request,
     mcp_service: McpService = Depends(get_mcp_service),
+    single_flight: SingleFlight = Depends(get_single_flight),
 ) -> ChatResponse:
     try:
-        response_text, generation_time, used_tokens, breakdown = await mcp_service.answer(
-            message=request.message,
-            history=request.history,
+        (
+            (response_text, generation_time, used_tokens, breakdown),
+            shared,
+        ) = await single_flight.do(
+            request_key("mcp-chat", request),
+            lambda: mcp_service.answer(
+                message=request.message,
+                history=request.history,
+            ),
+            timeout=request_timeout(get_settings(), http_request.url.path, None),
         )
+        if shared:
+            breakdown = {**breakdown, "coalesced": True}
         return ChatResponse(
             response=response_text,
             generation_time=generation_time,
             used_tokens=used_tokens,
             breakdown=breakdown,
         )
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except TimeoutError as e:
         raise HTTPException(
             status_code=504,
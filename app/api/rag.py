@@ -1,10 +1,22 @@
 import logging
+from collections.abc import Callable
+from contextlib import AbstractAsyncContextManager
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sse_starlette.sse import EventSourceResponse
 
-from app.dependencies import get_rag_service
-from app.models.rag import RagRequest, RagResponse
+from app.api.sse import sse_error, sse_event
+from app.core.deadline import request_timeout
+from app.core.settings import get_settings
+from app.dependencies import (
+    get_rag_service,
+    get_rag_service_factory,
+    get_single_flight,
+)
+from app.models.chat import ChatStreamDone
+from app.models.rag import RagCitation, RagRequest, RagResponse
 from app.services.rag_service import RagService
+from app.services.single_flight import SingleFlight, mark_coalesced, request_key
 
 logger = logging.getLogger(__name__)
 
@@ -14,14 +26,28 @@ router = APIRouter()
 @router.post("/rag-chat", response_model=RagResponse)
 async def rag_endpoint(
     request: RagRequest,
-    rag_service: RagService = Depends(get_rag_service),
+    http_request: Request,
+    rag_services: Callable[[], AbstractAsyncContextManager[RagService]] = Depends(
+        get_rag_service_factory
+    ),
+    single_flight: SingleFlight = Depends(get_single_flight),
 ) -> RagResponse:
+    async def _answer() -> RagResponse:
+        # Shared with identical requests: not bound to this request's session.
+        async with rag_services() as rag_service:
+            return await rag_service.answer(
+                message=request.message,
+                history=request.history,
+                top_k=request.top_k,
+            )
+
     try:
-        return await rag_service.answer(
-            message=request.message,
-            history=request.history,
-            top_k=request.top_k,
+        response, shared = await single_flight.do(
+            request_key("rag-chat", request),
+            _answer,
+            timeout=request_timeout(get_settings(), http_request.url.path, None),
         )
+        return mark_coalesced(response) if shared else response
     except Exception as e:
         logger.exception("RAG endpoint failed")
         raise HTTPException(
@@ -29,3 +55,45 @@ async def rag_endpoint(
             detail=f"Internal server error:\
                 {e.__dict__.get('message', str(e))}"
             )
+
+
+@router.post("/rag-chat/stream")
+async def rag_stream_endpoint(
+    request: RagRequest,
+    rag_service: RagService = Depends(get_rag_service),
+) -> EventSourceResponse:
+    """
+    Stream a RAG answer as Server-Sent Events.
+
+    Events: `citations` ({"citations": [RagCitation]}) as soon as retrieval
+    returns, `token` ({"text"}) per answer chunk, a final `done`
+    (ChatStreamDone with the usual RAG breakdown), or `error` ({"detail"}).
+    """
+    async def _events():
+        try:
+            async for event in rag_service.stream_answer(
+                message=request.message,
+                history=request.history,
+                top_k=request.top_k,
+            ):
+                if event["type"] == "citations":
+                    yield sse_event("citations", {
+                        "citations": [
+                            RagCitation.model_validate(c).model_dump(mode="json")
+                            for c in event["citations"]
+                        ],
+                    })
+                elif event["type"] == "token":
+                    yield sse_event("token", {"text": event["text"]})
+                elif event["type"] == "done":
+                    yield sse_event("done", ChatStreamDone(
+                        generation_time=event["generation_time"],
+                        time_to_first_token=event["time_to_first_token"],
+                        used_tokens=event["used_tokens"],
+                        breakdown=event["breakdown"],
+                    ))
+        except Exception as e:
+            logger.exception("RAG stream endpoint failed")
+            yield sse_error(f"Internal server error: {e}")
+
+    return EventSourceResponse(_events())
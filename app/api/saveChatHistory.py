@@ -4,7 +4,7 @@ from fastapi import APIRouter, Depends, HTTPException
 
 from app.dependencies import get_save_chat_service
 from app.models.chat import SaveChatRequest, SaveChatResponse
-from app.services.save_chat_service import SaveChatService
+from app.services.save_chat_service import AsyncSaveChatService
 
 logger = logging.getLogger(__name__)
 
@@ -14,7 +14,7 @@ router = APIRouter()
 @router.post("/save-chat-history", response_model=SaveChatResponse)
 async def save_chat_history(
     request: SaveChatRequest,
-    save_chat_service: SaveChatService = Depends(get_save_chat_service),
+    save_chat_service: AsyncSaveChatService = Depends(get_save_chat_service),
 ) -> SaveChatResponse:
     """
     Save a complete chat session snapshot.
@@ -46,7 +46,7 @@ async def save_chat_history(
                 ),
             )
 
-        response = save_chat_service.save_session(
+        response = await save_chat_service.save_session(
             mode=request.mode,
             history=request.history,
             version=request.version,
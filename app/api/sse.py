@@ -0,0 +1,23 @@
+"""Helpers shared by the Server-Sent Events (streaming) endpoints."""
+
+from __future__ import annotations
+
+import json
+from typing import Any
+
+from pydantic import BaseModel
+from sse_starlette.sse import ServerSentEvent
+
+
+def sse_event(event: str, data: BaseModel | dict[str, Any]) -> ServerSentEvent:
+    """Build one SSE frame whose `data` is a JSON document."""
+    if isinstance(data, BaseModel):
+        payload = data.model_dump_json()
+    else:
+        payload = json.dumps(data, default=str)
+    return ServerSentEvent(event=event, data=payload)
+
+
+def sse_error(detail: str) -> ServerSentEvent:
+    """Terminal error frame; HTTP errors are impossible once streaming began."""
+    return sse_event("error", {"detail": detail})
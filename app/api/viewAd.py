@@ -1,11 +1,11 @@
 import logging
 
 from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.dependencies import get_db
+from app.dependencies import get_async_db
 from app.models.ad import ViewAdResponse
-from app.services.view_ad_service import ViewAdService
+from app.services.view_ad_service import AsyncViewAdService, ViewAdService
 
 logger = logging.getLogger(__name__)
 
@@ -16,7 +16,7 @@ router = APIRouter()
 async def view_ad_endpoint(
     ad_id: int,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> ViewAdResponse:
     """
     Retrieve an ad by ID.
@@ -26,8 +26,8 @@ async def view_ad_endpoint(
     is returned, ensuring fast response times.
     """
     try:
-        service = ViewAdService(db)
-        ad = service.get_ad(ad_id)
+        service = AsyncViewAdService(db)
+        ad = await service.get_ad(ad_id)
 
         if not ad:
             raise HTTPException(
@@ -0,0 +1,136 @@
+"""Per-request deadlines carried through a context variable.
+
+`DeadlineMiddleware` starts each request's budget from the
+`X-Request-Timeout` header (seconds) or the per-path default. Gemini
+calls, DB statements (`statement_timeout`), MCP tool calls and agent steps
+read the remaining budget. Optional work (ads, retrieval, tool steps) keeps
+`DEADLINE_RESERVE` seconds back for the answer itself, so a tight budget
+drops the optional part instead of timing out at the load balancer.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TypeVar
+
+from app.core.errors import ServiceError
+from app.core.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+TIMEOUT_HEADER = "x-request-timeout"
+
+# Absolute `time.monotonic()` deadline of the current request, if any.
+_deadline: ContextVar[float | None] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(ServiceError, TimeoutError):
+    """The request ran out of its time budget."""
+
+    def __init__(self, what: str = "request"):
+        super().__init__(f"Deadline exceeded during {what}", 504)
+
+
+@contextmanager
+def deadline_scope(timeout: float | None) -> Iterator[None]:
+    """Bound the enclosed work to `timeout` seconds (never extends a deadline)."""
+    if timeout is None or timeout <= 0:
+        yield
+        return
+    deadline = time.monotonic() + timeout
+    current = _deadline.get()
+    if current is not None:
+        deadline = min(deadline, current)
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> float | None:
+    """Seconds left in the current request, or None without a deadline."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def has_budget(reserve: float = 0.0) -> bool:
+    """Whether more than `reserve` seconds are left (always True without a deadline)."""
+    left = remaining()
+    return left is None or left > reserve
+
+
+def check(what: str = "request") -> None:
+    """Raise DeadlineExceeded if the budget is already spent."""
+    if not has_budget():
+        raise DeadlineExceeded(what)
+
+
+def timeout_for(default: float, reserve: float = 0.0) -> float:
+    """`default`, capped at the remaining budget minus `reserve`."""
+    left = remaining()
+    if left is None:
+        return default
+    return max(0.0, min(default, left - reserve))
+
+
+async def bounded(
+    awaitable: Awaitable[T], *, reserve: float = 0.0, what: str = "request"
+) -> T:
+    """Await within the remaining budget minus `reserve`; else DeadlineExceeded."""
+    left = remaining()
+    if left is None:
+        return await awaitable
+    budget = left - reserve
+    if budget <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceeded(what)
+    try:
+        return await asyncio.wait_for(awaitable, timeout=budget)
+    except DeadlineExceeded:
+        # Raised inside `awaitable` (itself a TimeoutError); keep its label.
+        raise
+    except asyncio.TimeoutError as e:
+        raise DeadlineExceeded(what) from e
+
+
+def request_timeout(settings: Settings, path: str, header: str | None) -> float | None:
+    """Budget for a request: the header (capped) or the per-path default."""
+    timeout = settings.request_timeouts.get(path, settings.request_timeout)
+    if header:
+        try:
+            timeout = min(float(header), settings.request_timeout_max)
+        except ValueError:
+            logger.warning(f"Ignoring invalid {TIMEOUT_HEADER} header: {header!r}")
+    return timeout if timeout > 0 else None
+
+
+class DeadlineMiddleware:
+    """ASGI middleware that opens a deadline scope per HTTP request."""
+
+    def __init__(self, app, settings: Settings):
+        self.app = app
+        self._settings = settings
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        header = None
+        for name, value in scope.get("headers", []):
+            if name.decode("latin-1").lower() == TIMEOUT_HEADER:
+                header = value.decode("latin-1")
+                break
+        timeout = request_timeout(self._settings, scope["path"], header)
+        with deadline_scope(timeout):
+            await self.app(scope, receive, send)
@@ -0,0 +1,17 @@
+"""Base class for expected failures that carry an HTTP status."""
+
+from __future__ import annotations
+
+
+class ServiceError(Exception):
+    """A failure with the HTTP status (`code`) and `message` to report.
+
+    /rag-chat and /agentic-chat turn the `code` and `message` of whatever
+    they catch into the response; /chat and /mcp-chat catch the concrete
+    subclasses instead.
+    """
+
+    def __init__(self, message: str, code: int):
+        super().__init__(message)
+        self.message = message
+        self.code = code
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from functools import lru_cache
-from typing import Literal
+from typing import Any, Literal
 
 from pydantic import AliasChoices, Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -59,16 +59,233 @@ class Settings(BaseSettings):
         alias="GEMINI_CHAT_SYSTEM_PROMPT",
     )
 
+    # Shared Gemini HTTP connection pool (per client purpose: chat,
+    # embeddings, langchain). Connections are kept alive and reused.
+    gemini_http_pool_size: int = Field(
+        default=20, ge=1, alias="GEMINI_HTTP_POOL_SIZE"
+    )
+    gemini_http_keepalive_expiry: float = Field(
+        default=60.0, gt=0, alias="GEMINI_HTTP_KEEPALIVE_EXPIRY"
+    )
+
+    # Client-side Gemini rate limiter shared by every pooled client. Set the
+    # limits to the project's quota; calls over it queue (interactive first)
+    # and 429s lower the effective rate until calls succeed again.
+    gemini_rate_limit_enabled: bool = Field(
+        default=True, alias="GEMINI_RATE_LIMIT_ENABLED"
+    )
+    gemini_rpm: int = Field(default=1000, ge=1, alias="GEMINI_RPM")
+    gemini_tpm: int = Field(default=1_000_000, ge=1, alias="GEMINI_TPM")
+    gemini_rate_limit_queue_size: int = Field(
+        default=256, ge=0, alias="GEMINI_RATE_LIMIT_QUEUE_SIZE"
+    )
+    gemini_rate_limit_max_retries: int = Field(
+        default=3, ge=0, alias="GEMINI_RATE_LIMIT_MAX_RETRIES"
+    )
+    gemini_rate_limit_backoff: float = Field(
+        default=2.0, gt=0, alias="GEMINI_RATE_LIMIT_BACKOFF"
+    )
+    # Output tokens reserved per call until the response reports real usage.
+    gemini_rate_limit_output_tokens: int = Field(
+        default=512, ge=0, alias="GEMINI_RATE_LIMIT_OUTPUT_TOKENS"
+    )
+
+    # Opt-in hedging of non-streaming chat generations: past the given
+    # percentile of recent latencies one duplicate request is sent and the
+    # first answer wins. The hedge rate cap bounds the extra cost.
+    gemini_hedge_enabled: bool = Field(default=False, alias="GEMINI_HEDGE_ENABLED")
+    gemini_hedge_percentile: float = Field(
+        default=95.0, gt=0, lt=100, alias="GEMINI_HEDGE_PERCENTILE"
+    )
+    gemini_hedge_min_samples: int = Field(
+        default=20, ge=1, alias="GEMINI_HEDGE_MIN_SAMPLES"
+    )
+    gemini_hedge_min_delay: float = Field(
+        default=0.5, ge=0, alias="GEMINI_HEDGE_MIN_DELAY"
+    )
+    gemini_hedge_max_rate: float = Field(
+        default=0.05, ge=0, le=1, alias="GEMINI_HEDGE_MAX_RATE"
+    )
+    gemini_hedge_window: int = Field(default=200, ge=1, alias="GEMINI_HEDGE_WINDOW")
+
+    # Model routing: JSON object mapping a route ("chat", "rag", "mcp.plan",
+    # "mcp.answer", "agent.plan", "agent.answer", or a prefix such as "mcp")
+    # to an ordered list of tiers, each a model name or an object with
+    # model / temperature / max_output_tokens / thinking_budget.
+    # Unconfigured routes use GEMINI_MODEL.
+    model_routes: dict[str, list[str | dict[str, Any]]] = Field(
+        default_factory=dict, alias="MODEL_ROUTES"
+    )
+    # A tier is skipped once its rolling mean latency (seconds, 0 = ignore)
+    # or error rate exceeds these, and probed again after the cooldown.
+    model_route_max_latency: float = Field(
+        default=30.0, ge=0, alias="MODEL_ROUTE_MAX_LATENCY"
+    )
+    model_route_max_error_rate: float = Field(
+        default=0.5, ge=0, le=1, alias="MODEL_ROUTE_MAX_ERROR_RATE"
+    )
+    model_route_window: int = Field(default=20, ge=1, alias="MODEL_ROUTE_WINDOW")
+    model_route_min_samples: int = Field(
+        default=5, ge=1, alias="MODEL_ROUTE_MIN_SAMPLES"
+    )
+    model_route_cooldown: float = Field(
+        default=30.0, ge=0, alias="MODEL_ROUTE_COOLDOWN"
+    )
+
+    # End-to-end request deadlines (seconds; 0 = none). Clients may send a
+    # shorter or longer budget in X-Request-Timeout, capped at the maximum.
+    # REQUEST_TIMEOUTS overrides the default per path, as a JSON object.
+    request_timeout: float = Field(default=30.0, ge=0, alias="REQUEST_TIMEOUT")
+    request_timeouts: dict[str, float] = Field(
+        default_factory=dict, alias="REQUEST_TIMEOUTS"
+    )
+    request_timeout_max: float = Field(
+        default=120.0, gt=0, alias="REQUEST_TIMEOUT_MAX"
+    )
+    # Budget kept back for the answer itself: optional work (ads, retrieval,
+    # tool steps) is skipped or cut short once less than this remains.
+    deadline_reserve: float = Field(default=3.0, ge=0, alias="DEADLINE_RESERVE")
+
+    # Circuit breakers around Gemini embeddings, Gemini generation and DB
+    # retrieval: a dependency that fails this many times in a row is skipped
+    # for the recovery timeout, then probed with a few half-open calls.
+    circuit_breaker_enabled: bool = Field(
+        default=True, alias="CIRCUIT_BREAKER_ENABLED"
+    )
+    circuit_breaker_failure_threshold: int = Field(
+        default=5, ge=1, alias="CIRCUIT_BREAKER_FAILURE_THRESHOLD"
+    )
+    circuit_breaker_recovery_timeout: float = Field(
+        default=30.0, ge=0, alias="CIRCUIT_BREAKER_RECOVERY_TIMEOUT"
+    )
+    circuit_breaker_half_open_max_calls: int = Field(
+        default=1, ge=1, alias="CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS"
+    )
+
     # Optional: system prompt used only by McpService.
     # Lets you guide the agent behavior without affecting other Gemini usages.
     mcp_system_prompt: str | None = Field(default=None, alias="MCP_SYSTEM_PROMPT")
 
+    # /agentic-chat/stream: how long (seconds) to wait for the ad agent after
+    # the chat stream finished before dropping the sponsored block.
+    agentic_ad_grace_period: float = Field(
+        default=2.0, ge=0, alias="AGENTIC_AD_GRACE_PERIOD"
+    )
+
+    # Per-tool timeout (seconds) for MCP tool calls made by McpService.
+    mcp_tool_timeout: float = Field(default=15.0, gt=0, alias="MCP_TOOL_TIMEOUT")
+
+    # MCP transport: "stdio" runs app/mcp/server.py as an isolated subprocess,
+    # "inprocess" mounts the same FastMCP server over in-memory streams.
+    mcp_transport: Literal["stdio", "inprocess"] = Field(
+        default="stdio", alias="MCP_TRANSPORT"
+    )
+
+    # MCP session pool (pre-spawned server subprocesses reused across requests)
+    # MCP_POOL_SIZE=0 disables pooling and spawns one subprocess per request.
+    mcp_pool_size: int = Field(default=2, ge=0, alias="MCP_POOL_SIZE")
+    mcp_pool_checkout_timeout: float = Field(
+        default=10.0, gt=0, alias="MCP_POOL_CHECKOUT_TIMEOUT"
+    )
+    mcp_pool_health_check_interval: float = Field(
+        default=30.0,
+        ge=0,
+        alias="MCP_POOL_HEALTH_CHECK_INTERVAL",
+        description="Ping idle sessions older than this (seconds) on checkout",
+    )
+
     # Embeddings
     gemini_embedding_model: str = Field(
         default="gemini-embedding-001", alias="GEMINI_EMBEDDING_MODEL"
     )
     gemini_embedding_dim: int = Field(default=768, alias="GEMINI_EMBEDDING_DIM")
 
+    # Embedding token accounting. "estimate" reports usage metadata from the
+    # embed response when present, else a local chars-per-token estimate.
+    # "exact" additionally runs count_tokens as a background task (off the
+    # request path) to calibrate the estimator.
+    embedding_token_accounting: Literal["estimate", "exact"] = Field(
+        default="estimate", alias="EMBEDDING_TOKEN_ACCOUNTING"
+    )
+    embedding_chars_per_token: float = Field(
+        default=4.0, gt=0, alias="EMBEDDING_CHARS_PER_TOKEN"
+    )
+
+    # Micro-batching of concurrent single-query embeddings: wait up to
+    # EMBEDDING_BATCH_MAX_WAIT_MS or EMBEDDING_BATCH_MAX_SIZE texts, then send
+    # one embed_content request. EMBEDDING_BATCH_BYPASS=true disables it.
+    embedding_batch_bypass: bool = Field(default=False, alias="EMBEDDING_BATCH_BYPASS")
+    embedding_batch_max_size: int = Field(
+        default=32, ge=1, le=100, alias="EMBEDDING_BATCH_MAX_SIZE"
+    )
+    embedding_batch_max_wait_ms: float = Field(
+        default=5.0, ge=0, alias="EMBEDDING_BATCH_MAX_WAIT_MS"
+    )
+
+    # Query-embedding cache (in-memory LRU + TTL). EMBEDDING_CACHE_SIZE=0
+    # disables it; EMBEDDING_CACHE_DIR adds a persistent diskcache tier.
+    embedding_cache_size: int = Field(default=1024, ge=0, alias="EMBEDDING_CACHE_SIZE")
+    embedding_cache_ttl: float = Field(
+        default=24 * 3600, gt=0, alias="EMBEDDING_CACHE_TTL"
+    )
+    embedding_cache_dir: str | None = Field(default=None, alias="EMBEDDING_CACHE_DIR")
+    embedding_cache_disk_size_limit: int = Field(
+        default=256 * 1024 * 1024, gt=0, alias="EMBEDDING_CACHE_DISK_SIZE_LIMIT"
+    )
+
+    # Conversation window per mode: latest turns are sent verbatim within the
+    # token budget (0 = unlimited); older turns are replaced by a rolling
+    # summary computed in the background. A conversation's first trimmed
+    # request waits up to HISTORY_SUMMARY_FIRST_WAIT_MS for its summary
+    # instead of dropping every older turn. The ad agent only sees the last
+    # HISTORY_MAX_TURNS_AGENT messages and no summary.
+    history_token_budget_chat: int = Field(
+        default=4000, ge=0, alias="HISTORY_TOKEN_BUDGET_CHAT"
+    )
+    history_token_budget_mcp: int = Field(
+        default=4000, ge=0, alias="HISTORY_TOKEN_BUDGET_MCP"
+    )
+    history_token_budget_agent: int = Field(
+        default=1000, ge=0, alias="HISTORY_TOKEN_BUDGET_AGENT"
+    )
+    history_max_turns_agent: int = Field(
+        default=4, ge=0, alias="HISTORY_MAX_TURNS_AGENT"
+    )
+    history_summary_enabled: bool = Field(
+        default=True, alias="HISTORY_SUMMARY_ENABLED"
+    )
+    history_summary_first_wait_ms: float = Field(
+        default=1500.0, ge=0, alias="HISTORY_SUMMARY_FIRST_WAIT_MS"
+    )
+    history_summary_model: str | None = Field(
+        default=None,
+        alias="HISTORY_SUMMARY_MODEL",
+        description="Defaults to GEMINI_MODEL",
+    )
+
+    # Coalescing of identical in-flight chat requests (same endpoint, message,
+    # history). Results are replayed for SINGLE_FLIGHT_RESULT_TTL seconds to
+    # absorb immediate retries; 0 disables the window.
+    single_flight_enabled: bool = Field(default=True, alias="SINGLE_FLIGHT_ENABLED")
+    single_flight_result_ttl: float = Field(
+        default=2.0, ge=0, alias="SINGLE_FLIGHT_RESULT_TTL"
+    )
+
+    # Opt-in semantic cache of /chat and /rag-chat answers: near-paraphrased
+    # prompts (cosine >= SEMANTIC_CACHE_THRESHOLD) with the same short history
+    # are answered from cache without an LLM call.
+    semantic_cache_enabled: bool = Field(default=False, alias="SEMANTIC_CACHE_ENABLED")
+    semantic_cache_threshold: float = Field(
+        default=0.95, gt=0, le=1, alias="SEMANTIC_CACHE_THRESHOLD"
+    )
+    semantic_cache_ttl: float = Field(default=600.0, gt=0, alias="SEMANTIC_CACHE_TTL")
+    semantic_cache_max_entries: int = Field(
+        default=2048, ge=1, alias="SEMANTIC_CACHE_MAX_ENTRIES"
+    )
+    semantic_cache_max_history: int = Field(
+        default=2, ge=0, alias="SEMANTIC_CACHE_MAX_HISTORY"
+    )
+
     db_host: str = Field(default="localhost", alias="POSTGRES_HOST")
     db_port: int = Field(default=5432, alias="POSTGRES_PORT")
     db_user: str = Field(default="app", alias="POSTGRES_USER")
@@ -77,6 +294,62 @@ class Settings(BaseSettings):
 
     database_url_override: str | None = Field(default=None, alias="DATABASE_URL")
 
+    # Vector search over the HNSW index. A filtered index scan stops after
+    # ef_search candidates, so a sparse filter can return fewer than top_k
+    # ads; iterative scans (pgvector >= 0.8) keep scanning until enough pass.
+    # Off by default: serving_ads holds only eligible ads, so retrieval has
+    # no such filter, and the SET fails on older pgvector versions.
+    vector_iterative_scan: Literal["off", "strict_order", "relaxed_order"] = Field(
+        default="off", alias="VECTOR_ITERATIVE_SCAN"
+    )
+    # hnsw.ef_search for retrieval queries; 0 = server default (40).
+    vector_ef_search: int = Field(default=0, ge=0, le=1000, alias="VECTOR_EF_SEARCH")
+    # "memory": answer vector searches from an in-process NumPy index of
+    # serving_ads (exact, no DB round trip), refreshed every
+    # VECTOR_INDEX_REFRESH_INTERVAL seconds; Postgres serves until it loads.
+    # "snapshot": memory-map the current snapshot in VECTOR_SNAPSHOT_DIR
+    # (written by app.scripts.export_vector_snapshot), shared by every
+    # process, and check for a new version every refresh interval.
+    vector_index_backend: Literal["postgres", "memory", "snapshot"] = Field(
+        default="postgres", alias="VECTOR_INDEX_BACKEND"
+    )
+    vector_index_refresh_interval: float = Field(
+        default=5.0, gt=0, alias="VECTOR_INDEX_REFRESH_INTERVAL"
+    )
+    # Incremental refreshes re-read rows refreshed up to this many seconds
+    # before the newest one applied, catching transactions that committed
+    # late; every VECTOR_INDEX_RECONCILE_INTERVAL seconds the whole table is
+    # reloaded, which also catches transactions open longer than that.
+    vector_index_watermark_overlap: float = Field(
+        default=60.0, ge=0, alias="VECTOR_INDEX_WATERMARK_OVERLAP"
+    )
+    vector_index_reconcile_interval: float = Field(
+        default=3600.0, gt=0, alias="VECTOR_INDEX_RECONCILE_INTERVAL"
+    )
+    # Index searches over at least this many ads run in a worker thread
+    # instead of on the event loop (about 25 ms at 100k ads).
+    vector_index_offload_threshold: int = Field(
+        default=10000, ge=0, alias="VECTOR_INDEX_OFFLOAD_THRESHOLD"
+    )
+    vector_snapshot_dir: str = Field(
+        default="var/vector_snapshot", alias="VECTOR_SNAPSHOT_DIR"
+    )
+    # A snapshot older than this (seconds since export; 0 = no bound) is not
+    # served, so a stalled exporter falls back to Postgres.
+    vector_snapshot_max_age: float = Field(
+        default=900.0, ge=0, alias="VECTOR_SNAPSHOT_MAX_AGE"
+    )
+
+    # serving_ads is kept current by triggers; campaign start/end dates passing
+    # are applied every SERVING_ADS_REFRESH_INTERVAL seconds (0 = no scheduler)
+    # and the whole table is re-derived every SERVING_ADS_RECONCILE_INTERVAL.
+    serving_ads_refresh_interval: float = Field(
+        default=60.0, ge=0, alias="SERVING_ADS_REFRESH_INTERVAL"
+    )
+    serving_ads_reconcile_interval: float = Field(
+        default=3600.0, gt=0, alias="SERVING_ADS_RECONCILE_INTERVAL"
+    )
+
     @property
     def database_url(self) -> str:
         if self.database_url_override:
@@ -1,7 +1,12 @@
 from app.db.base import Base
-from app.db.engine import get_engine
+from app.db.engine import get_async_engine, get_engine
 from app.db.init_db import init_db
-from app.db.session import get_db_session, get_sessionmaker
+from app.db.session import (
+    get_async_db_session,
+    get_async_sessionmaker,
+    get_db_session,
+    get_sessionmaker,
+)
 
 # Ensure ORM models are registered on Base.metadata when importing app.db.
 from app.db import models as _models  # noqa: F401
@@ -9,7 +14,10 @@ from app.db import models as _models  # noqa: F401
 __all__ = [
     "Base",
     "get_engine",
+    "get_async_engine",
     "get_sessionmaker",
+    "get_async_sessionmaker",
     "get_db_session",
+    "get_async_db_session",
     "init_db",
 ]
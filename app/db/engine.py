@@ -3,7 +3,8 @@ from __future__ import annotations
 from functools import lru_cache
 
 from sqlalchemy import create_engine
-from sqlalchemy.engine import Engine
+from sqlalchemy.engine import URL, Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 
 from app.core.settings import get_settings
 
@@ -27,3 +28,37 @@ def get_engine(database_url: str | None = None) -> Engine:
         pool_recycle=3600,  # Recycle connections after 1 hour
         future=True,
     )
+
+
+def to_async_url(database_url: str) -> URL:
+    """The asyncpg form of a libpq-style `postgresql://` URL.
+
+    asyncpg takes `ssl=` instead of libpq's `sslmode=` and has no
+    `channel_binding` option (Neon connection strings carry both).
+    """
+    url = make_url(database_url).set(drivername="postgresql+asyncpg")
+    query = dict(url.query)
+    sslmode = query.pop("sslmode", None)
+    query.pop("channel_binding", None)
+    if sslmode is not None:
+        query["ssl"] = sslmode
+    return url.set(query=query)
+
+
+@lru_cache
+def get_async_engine(database_url: str | None = None) -> AsyncEngine:
+    """Async (asyncpg) engine for the request path; same pool sizing as `get_engine`."""
+    settings = get_settings()
+    url = to_async_url(database_url or settings.database_url)
+
+    # Each instance has its own pool, so the instance total is 2 x 15.
+    # No pgvector codec is registered: asyncpg then carries `vector` values in
+    # text form, which is exactly what the `Vector` column type binds and
+    # parses. A binary codec would receive that text and fail to encode it.
+    return create_async_engine(
+        url,
+        pool_size=5,
+        max_overflow=10,
+        pool_pre_ping=True,
+        pool_recycle=3600,
+    )
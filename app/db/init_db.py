@@ -4,6 +4,7 @@ from sqlalchemy import text
 from sqlalchemy.engine import Engine
 
 from app.db.base import Base
+from app.db.serving import install_serving_ads
 
 
 def init_db(engine: Engine) -> None:
@@ -11,9 +12,13 @@ def init_db(engine: Engine) -> None:
 
     - Ensures pgvector extension exists
     - Creates ORM tables (dev-friendly; prefer Alembic in production)
+    - Installs the serving_ads triggers and backfills the table
     """
 
     with engine.begin() as conn:
         conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
 
     Base.metadata.create_all(bind=engine)
+
+    with engine.begin() as conn:
+        install_serving_ads(conn)
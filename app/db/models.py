@@ -9,6 +9,7 @@ from sqlalchemy import (
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
     Numeric,
     SmallInteger,
@@ -18,7 +19,7 @@ from sqlalchemy import (
     func,
     or_,
 )
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -57,6 +58,47 @@ class Ad(Base):
     )
 
 
+class ServingAd(Base):
+    """Ads with at least one running campaign, copied for retrieval.
+
+    Maintained by triggers and `serving_ads_refresh_due` (app/db/serving.py);
+    read-only for the application. Carries the `Ad` columns the payloads use,
+    so it can stand in for an `Ad` in search results.
+    """
+
+    __tablename__ = "serving_ads"
+    __table_args__ = (
+        Index(
+            "ix_serving_ads_embedding_hnsw",
+            "embedding",
+            postgresql_using="hnsw",
+            postgresql_ops={"embedding": "vector_cosine_ops"},
+        ),
+        Index(
+            "ix_serving_ads_search_vector",
+            "search_vector",
+            postgresql_using="gin",
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(
+        ForeignKey("ads.id", ondelete="CASCADE"), primary_key=True
+    )
+    title: Mapped[str] = mapped_column(Text, nullable=False)
+    description: Mapped[str] = mapped_column(Text, nullable=False)
+    keywords: Mapped[list[str] | None] = mapped_column(ARRAY(Text))
+    url: Mapped[str] = mapped_column(Text, nullable=False)
+    image_url: Mapped[str | None] = mapped_column(Text)
+    cpc: Mapped[float] = mapped_column(Numeric(10, 2), nullable=False)
+    embedding: Mapped[list[float] | None] = mapped_column(Vector(768))
+    # title (A), keywords (B) and description (C), 'english' configuration.
+    search_vector: Mapped[str] = mapped_column(TSVECTOR, nullable=False)
+
+    refreshed_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False
+    )
+
+
 class AdCampaign(Base):
     __tablename__ = "ad_campaigns"
     __table_args__ = (
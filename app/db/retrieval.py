@@ -1,48 +1,140 @@
 from __future__ import annotations
 
+from collections.abc import Iterable
 from dataclasses import dataclass
 
+import anyio
 import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.db.models import Ad, AdCampaign, Campaign
+from app.core.settings import Settings, get_settings
+from app.db.models import Ad, ServingAd
+from app.db.vector_index import IndexedAd, InMemoryVectorIndex, get_vector_index
+from app.db.vector_snapshot import SnapshotVectorIndex
 
 
 @dataclass(frozen=True)
 class AdMatch:
-    ad: Ad
+    ad: Ad | ServingAd | IndexedAd
     score: float  # cosine similarity in [-1, 1]; higher is better
     distance: float  # cosine distance in [0, 2]; lower is better
 
 
+def search_stmt(query_embedding: list[float], top_k: int) -> sa.Select:
+    # serving_ads only holds eligible ads, so the HNSW scan needs no filter
+    # beyond NULL embeddings. Order by the bare `<=>` expression (no cast):
+    # only that form matches ix_serving_ads_embedding_hnsw (vector_cosine_ops).
+    distance_expr = ServingAd.embedding.op("<=>", return_type=sa.Float)(query_embedding)
+
+    return (
+        sa.select(
+            ServingAd,
+            (sa.literal(1.0) - distance_expr).label("score"),
+            distance_expr.label("distance"),
+        )
+        .where(ServingAd.embedding.is_not(None))
+        .order_by(distance_expr)
+        .limit(top_k)
+    )
+
+
+def keyword_search_stmt(words: list[str], limit: int) -> sa.Select:
+    """Eligible ads whose title, keywords or description match any word.
+
+    Served by the GIN index on `serving_ads.search_vector`.
+    """
+    config = sa.cast("english", REGCONFIG)
+    return (
+        sa.select(ServingAd)
+        .where(
+            sa.or_(
+                *(
+                    ServingAd.search_vector.op("@@")(sa.func.plainto_tsquery(config, word))
+                    for word in words
+                )
+            )
+        )
+        .limit(limit)
+    )
+
+
+def search_settings(settings: Settings) -> list[sa.TextClause]:
+    """Transaction-local HNSW settings to apply before `search_stmt`."""
+    statements: list[sa.TextClause] = []
+    if settings.vector_iterative_scan != "off":
+        statements.append(
+            sa.text(f"SET LOCAL hnsw.iterative_scan = {settings.vector_iterative_scan}")
+        )
+    if settings.vector_ef_search:
+        statements.append(
+            sa.text(f"SET LOCAL hnsw.ef_search = {int(settings.vector_ef_search)}")
+        )
+    return statements
+
+
+def _to_matches(rows: Iterable[sa.Row]) -> list[AdMatch]:
+    matches: list[AdMatch] = []
+    for ad, score, distance in rows:
+        matches.append(AdMatch(ad=ad, score=float(score), distance=float(distance)))
+    # relaxed_order scans may return rows slightly out of order.
+    matches.sort(key=lambda m: m.distance)
+    return matches
+
+
 class AdsVectorRepository:
-    def __init__(self, db: Session):
+    """Vector search over serving_ads, or the in-process/snapshot index once loaded."""
+
+    def __init__(
+        self,
+        db: Session,
+        settings: Settings | None = None,
+        index: InMemoryVectorIndex | SnapshotVectorIndex | None = None,
+    ):
         self._db = db
+        self._settings = settings or get_settings()
+        self._index = index if index is not None else get_vector_index()
 
     def search_ads_by_embedding(self, query_embedding: list[float], top_k: int) -> list[AdMatch]:
         if top_k <= 0:
             return []
+        if self._index is not None and self._index.ready:
+            return _to_matches(self._index.search(query_embedding, top_k))
 
-        # Index-friendly: order by cosine distance ascending (pgvector <=> operator)
-        distance_expr = sa.cast(Ad.embedding.op("<=>")(query_embedding), sa.Float)
-        distance_labeled = distance_expr.label("distance")
-        score_expr = (sa.literal(1.0) - distance_expr).label("score")
-
-        stmt = (
-            sa.select(Ad, score_expr, distance_labeled)
-            .join(AdCampaign, Ad.id == AdCampaign.ad_id)
-            .join(Campaign, AdCampaign.campaign_id == Campaign.id)
-            .where(
-                Ad.embedding.is_not(None),
-                Campaign.is_running
-            )
-            .distinct()
-            .order_by(distance_expr.asc())
-            .limit(top_k)
-        )
+        for statement in search_settings(self._settings):
+            self._db.execute(statement)
+        rows = self._db.execute(search_stmt(query_embedding, top_k)).all()
+        return _to_matches(rows)
+
+
+class AsyncAdsVectorRepository:
+    """`AdsVectorRepository` on an `AsyncSession`, for the request path."""
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        settings: Settings | None = None,
+        index: InMemoryVectorIndex | SnapshotVectorIndex | None = None,
+    ):
+        self._db = db
+        self._settings = settings or get_settings()
+        self._index = index if index is not None else get_vector_index()
+
+    async def search_ads_by_embedding(self, query_embedding: list[float], top_k: int) -> list[AdMatch]:
+        if top_k <= 0:
+            return []
+        if self._index is not None and self._index.ready:
+            if len(self._index) >= self._settings.vector_index_offload_threshold:
+                # Large catalogs: keep the matrix product off the event loop.
+                results = await anyio.to_thread.run_sync(
+                    self._index.search, query_embedding, top_k
+                )
+            else:
+                results = self._index.search(query_embedding, top_k)
+            return _to_matches(results)
 
-        rows = self._db.execute(stmt).all()
-        matches: list[AdMatch] = []
-        for ad, score, distance in rows:
-            matches.append(AdMatch(ad=ad, score=float(score), distance=float(distance)))
-        return matches
+        for statement in search_settings(self._settings):
+            await self._db.execute(statement)
+        result = await self._db.execute(search_stmt(query_embedding, top_k))
+        return _to_matches(result.all())
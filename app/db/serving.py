@@ -0,0 +1,189 @@
+"""Maintenance of `serving_ads`, the denormalized table of eligible ads.
+
+An ad is eligible while it is linked to at least one running campaign
+(`Campaign.is_running`). Triggers on `ads`, `ad_campaigns` and `campaigns`
+re-derive the affected rows inside the writing transaction, so retrieval
+reads a single indexed table instead of re-evaluating the three-table join.
+
+Time alone also changes eligibility (a campaign's start_date or end_date
+passes); `serving_ads_refresh_due(since)` picks those up and is run
+periodically by `ServingAdsScheduler`. With `since` NULL it re-derives
+every row.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+
+import sqlalchemy as sa
+from sqlalchemy.engine import Connection
+
+# Mirrors Campaign.is_running; `c` is the campaigns alias.
+_RUNNING = """
+    c.is_enabled = 1
+    AND c.start_date <= now()
+    AND (c.end_date IS NULL OR c.end_date > now())
+    AND c.spending < c.budget
+"""
+
+SERVING_ADS_SQL: tuple[str, ...] = (
+    f"""
+    CREATE OR REPLACE FUNCTION serving_ads_refresh(p_ad_ids integer[])
+    RETURNS integer LANGUAGE plpgsql AS $$
+    DECLARE
+        removed integer;
+        upserted integer;
+    BEGIN
+        DELETE FROM serving_ads s
+        WHERE s.id = ANY(p_ad_ids)
+          AND NOT EXISTS (
+              SELECT 1 FROM ad_campaigns ac JOIN campaigns c ON c.id = ac.campaign_id
+              WHERE ac.ad_id = s.id AND {_RUNNING}
+          );
+        GET DIAGNOSTICS removed = ROW_COUNT;
+
+        INSERT INTO serving_ads AS s (
+            id, title, description, keywords, url, image_url, cpc, embedding,
+            search_vector, refreshed_at
+        )
+        SELECT
+            a.id, a.title, a.description, a.keywords, a.url, a.image_url, a.cpc,
+            a.embedding,
+            setweight(to_tsvector('english', a.title), 'A')
+                || setweight(to_tsvector('english', coalesce(array_to_string(a.keywords, ' '), '')), 'B')
+                || setweight(to_tsvector('english', a.description), 'C'),
+            now()
+        FROM ads a
+        WHERE a.id = ANY(p_ad_ids)
+          AND EXISTS (
+              SELECT 1 FROM ad_campaigns ac JOIN campaigns c ON c.id = ac.campaign_id
+              WHERE ac.ad_id = a.id AND {_RUNNING}
+          )
+        ON CONFLICT (id) DO UPDATE SET
+            title = EXCLUDED.title,
+            description = EXCLUDED.description,
+            keywords = EXCLUDED.keywords,
+            url = EXCLUDED.url,
+            image_url = EXCLUDED.image_url,
+            cpc = EXCLUDED.cpc,
+            embedding = EXCLUDED.embedding,
+            search_vector = EXCLUDED.search_vector,
+            refreshed_at = EXCLUDED.refreshed_at
+        -- Skip no-op rewrites (and their HNSW/GIN index churn).
+        WHERE (s.title, s.description, s.keywords, s.url, s.image_url, s.cpc)
+                  IS DISTINCT FROM
+              (EXCLUDED.title, EXCLUDED.description, EXCLUDED.keywords,
+               EXCLUDED.url, EXCLUDED.image_url, EXCLUDED.cpc)
+           OR s.embedding IS DISTINCT FROM EXCLUDED.embedding;
+        GET DIAGNOSTICS upserted = ROW_COUNT;
+
+        RETURN removed + upserted;
+    END
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION serving_ads_refresh_due(p_since timestamptz)
+    RETURNS integer LANGUAGE sql AS $$
+        SELECT serving_ads_refresh(ARRAY(
+            SELECT ac.ad_id
+            FROM ad_campaigns ac JOIN campaigns c ON c.id = ac.campaign_id
+            WHERE p_since IS NULL
+               OR (c.start_date > p_since AND c.start_date <= now())
+               OR (c.end_date > p_since AND c.end_date <= now())
+            UNION
+            SELECT s.id FROM serving_ads s WHERE p_since IS NULL
+        ))
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION serving_ads_on_ads() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        PERFORM serving_ads_refresh(ARRAY[NEW.id]);
+        RETURN NULL;
+    END
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION serving_ads_on_ad_campaigns() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            PERFORM serving_ads_refresh(ARRAY[NEW.ad_id]);
+        ELSIF TG_OP = 'DELETE' THEN
+            PERFORM serving_ads_refresh(ARRAY[OLD.ad_id]);
+        ELSE
+            PERFORM serving_ads_refresh(ARRAY[OLD.ad_id, NEW.ad_id]);
+        END IF;
+        RETURN NULL;
+    END
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION serving_ads_on_campaigns() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        PERFORM serving_ads_refresh(ARRAY(
+            SELECT ad_id FROM ad_campaigns WHERE campaign_id = NEW.id
+        ));
+        RETURN NULL;
+    END
+    $$
+    """,
+    # Deleting an ad cascades to serving_ads; deleting a campaign cascades to
+    # ad_campaigns, whose trigger refreshes the ads involved.
+    """
+    CREATE OR REPLACE TRIGGER trg_serving_ads_ads
+    AFTER INSERT OR UPDATE OF title, description, keywords, url, image_url, cpc, embedding
+    ON ads FOR EACH ROW EXECUTE FUNCTION serving_ads_on_ads()
+    """,
+    # click_count updates do not touch eligibility.
+    """
+    CREATE OR REPLACE TRIGGER trg_serving_ads_ad_campaigns
+    AFTER INSERT OR DELETE OR UPDATE OF ad_id, campaign_id
+    ON ad_campaigns FOR EACH ROW EXECUTE FUNCTION serving_ads_on_ad_campaigns()
+    """,
+    # Spending changes on every billed click; only the budget crossing matters.
+    """
+    CREATE OR REPLACE TRIGGER trg_serving_ads_campaigns
+    AFTER UPDATE OF is_enabled, start_date, end_date, spending, budget
+    ON campaigns FOR EACH ROW
+    WHEN (
+        (OLD.is_enabled, OLD.start_date, OLD.end_date, OLD.budget)
+            IS DISTINCT FROM (NEW.is_enabled, NEW.start_date, NEW.end_date, NEW.budget)
+        OR (OLD.spending < OLD.budget) IS DISTINCT FROM (NEW.spending < NEW.budget)
+    )
+    EXECUTE FUNCTION serving_ads_on_campaigns()
+    """,
+)
+
+DROP_SERVING_ADS_SQL: tuple[str, ...] = (
+    "DROP TRIGGER IF EXISTS trg_serving_ads_campaigns ON campaigns",
+    "DROP TRIGGER IF EXISTS trg_serving_ads_ad_campaigns ON ad_campaigns",
+    "DROP TRIGGER IF EXISTS trg_serving_ads_ads ON ads",
+    "DROP FUNCTION IF EXISTS serving_ads_on_campaigns()",
+    "DROP FUNCTION IF EXISTS serving_ads_on_ad_campaigns()",
+    "DROP FUNCTION IF EXISTS serving_ads_on_ads()",
+    "DROP FUNCTION IF EXISTS serving_ads_refresh_due(timestamptz)",
+    "DROP FUNCTION IF EXISTS serving_ads_refresh(integer[])",
+)
+
+
+def refresh_due_stmt(since: datetime | None) -> sa.Select:
+    """`(now(), refreshed_rows)`; `since` None re-derives the whole table."""
+    return sa.select(
+        sa.func.now(),
+        sa.func.serving_ads_refresh_due(
+            sa.bindparam("since", since, type_=sa.DateTime(timezone=True))
+        ),
+    )
+
+
+def install_serving_ads(conn: Connection) -> int:
+    """(Re)create the maintenance functions and triggers, then backfill.
+
+    Expects the `serving_ads` table to exist. Returns the backfilled rows.
+    """
+    for statement in SERVING_ADS_SQL:
+        conn.execute(sa.text(statement))
+    return conn.execute(refresh_due_stmt(None)).one()[1]
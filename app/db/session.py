@@ -1,10 +1,39 @@
 from __future__ import annotations
 
-from collections.abc import Generator
+from collections.abc import AsyncGenerator, Generator
 
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from sqlalchemy.orm import Session, sessionmaker
 
-from app.db.engine import get_engine
+from app.core import deadline
+from app.db.engine import get_async_engine, get_engine
+
+
+@event.listens_for(Session, "after_begin")
+def _apply_request_deadline(session: Session, transaction, connection) -> None:
+    """Bound the transaction's statements by the request's remaining budget.
+
+    Also applies to `AsyncSession`, which runs on a sync `Session`.
+    """
+    left = deadline.remaining()
+    if left is None or connection.dialect.name != "postgresql":
+        return
+    timeout_ms = max(int(left * 1000), 1)
+    connection.exec_driver_sql(f"SET LOCAL statement_timeout = {timeout_ms}")
+
+
+def is_query_canceled(error: BaseException) -> bool:
+    """Whether `error` is Postgres cancelling a statement (57014 query_canceled).
+
+    That is what the deadline's `statement_timeout` raises: the request ran
+    out of time, which says nothing about the database's health.
+    """
+    return (
+        isinstance(error, DBAPIError)
+        and getattr(error.orig, "pgcode", None) == "57014"
+    )
 
 
 def get_sessionmaker(database_url: str | None = None) -> sessionmaker[Session]:
@@ -20,3 +49,20 @@ def get_db_session() -> Generator[Session, None, None]:
         yield db
     finally:
         db.close()
+
+
+def get_async_sessionmaker(
+    database_url: str | None = None,
+) -> async_sessionmaker[AsyncSession]:
+    engine = get_async_engine(database_url)
+
+    # No expiry on commit: attribute access after commit must not lazy-load.
+    return async_sessionmaker(
+        bind=engine, autoflush=False, expire_on_commit=False
+    )
+
+
+async def get_async_db_session() -> AsyncGenerator[AsyncSession, None]:
+    SessionLocal = get_async_sessionmaker()
+    async with SessionLocal() as db:
+        yield db
@@ -0,0 +1,223 @@
+"""Opt-in in-process vector index over `serving_ads`.
+
+The eligible ad catalog fits in RAM, so with VECTOR_INDEX_BACKEND=memory
+the vector repositories answer from a contiguous float32 matrix of unit
+embeddings instead of a Postgres round trip: one matrix-vector product and
+an `argpartition` for the top k. Search is exact (no HNSW approximation).
+
+Rows are added, updated and removed in place as `VectorIndexSync` observes
+changes to `serving_ads`; until its first load completes the index is not
+`ready` and the repositories fall back to Postgres. VECTOR_INDEX_BACKEND=
+snapshot shares one memory-mapped copy across processes instead
+(app/db/vector_snapshot.py).
+"""
+
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+import sqlalchemy as sa
+
+from app.core.settings import get_settings
+from app.db.models import ServingAd
+
+if TYPE_CHECKING:
+    from app.db.vector_snapshot import SnapshotVectorIndex
+
+_MIN_CAPACITY = 1024
+
+
+@dataclass(frozen=True, slots=True)
+class IndexedAd:
+    """The `Ad` fields search results expose, held alongside each vector."""
+
+    id: int
+    title: str
+    description: str
+    keywords: list[str] | None
+    url: str
+    image_url: str | None
+    cpc: Decimal
+
+
+def unit_vector(vector: Any, dim: int) -> np.ndarray | None:
+    """`vector` as a float32 unit vector, or None if its shape or norm is unusable."""
+    v = np.asarray(vector, dtype=np.float32).reshape(-1)
+    if v.shape[0] != dim:
+        return None
+    norm = float(np.linalg.norm(v))
+    if norm == 0.0:
+        return None
+    return v / norm
+
+
+def top_k_rows(vectors: np.ndarray, q: np.ndarray, top_k: int) -> tuple[np.ndarray, np.ndarray]:
+    """Rows of the `top_k` highest `vectors @ q`, best first, and all scores."""
+    scores = vectors @ q
+    size = scores.shape[0]
+    k = min(top_k, size)
+    if k < size:
+        top = np.argpartition(-scores, k - 1)[:k]
+    else:
+        top = np.arange(size)
+    return top[np.argsort(-scores[top], kind="stable")], scores
+
+
+class InMemoryVectorIndex:
+    """Exact cosine top-k over a dense matrix, with in-place row updates."""
+
+    def __init__(self, dim: int):
+        self._dim = dim
+        self._lock = threading.Lock()
+        # Rows [0, size) are live; removal moves the last row into the hole.
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._ads: list[IndexedAd] = []
+        self._row_of: dict[int, int] = {}
+        self._ready = False
+
+        self.searches = 0
+        self.upserts = 0
+        self.removals = 0
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def mark_ready(self) -> None:
+        self._ready = True
+
+    def __len__(self) -> int:
+        return len(self._ads)
+
+    def ids(self) -> set[int]:
+        with self._lock:
+            return set(self._row_of)
+
+    def _grow(self, needed: int) -> None:
+        capacity = self._vectors.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(_MIN_CAPACITY, capacity * 2, needed)
+        vectors = np.zeros((new_capacity, self._dim), dtype=np.float32)
+        ids = np.zeros(new_capacity, dtype=np.int64)
+        size = len(self._ads)
+        vectors[:size] = self._vectors[:size]
+        ids[:size] = self._ids[:size]
+        self._vectors, self._ids = vectors, ids
+
+    def upsert(self, ad: IndexedAd, embedding: Any) -> bool:
+        """Insert or replace `ad`; False (and the ad dropped) if the vector is unusable."""
+        v = unit_vector(embedding, self._dim)
+        with self._lock:
+            if v is None:
+                self._remove_locked(ad.id)
+                return False
+            row = self._row_of.get(ad.id)
+            if row is None:
+                row = len(self._ads)
+                self._grow(row + 1)
+                self._ads.append(ad)
+                self._row_of[ad.id] = row
+                self._ids[row] = ad.id
+            else:
+                self._ads[row] = ad
+            self._vectors[row] = v
+            self.upserts += 1
+            return True
+
+    def remove(self, ad_id: int) -> bool:
+        with self._lock:
+            return self._remove_locked(ad_id)
+
+    def _remove_locked(self, ad_id: int) -> bool:
+        row = self._row_of.pop(ad_id, None)
+        if row is None:
+            return False
+        last = len(self._ads) - 1
+        if row != last:
+            moved = self._ads[last]
+            self._vectors[row] = self._vectors[last]
+            self._ids[row] = moved.id
+            self._ads[row] = moved
+            self._row_of[moved.id] = row
+        self._ads.pop()
+        self.removals += 1
+        return True
+
+    def search(
+        self, query_embedding: Any, top_k: int
+    ) -> list[tuple[IndexedAd, float, float]]:
+        """`(ad, score, distance)` of the `top_k` most similar ads, best first."""
+        q = unit_vector(query_embedding, self._dim)
+        with self._lock:
+            self.searches += 1
+            size = len(self._ads)
+            if q is None or size == 0 or top_k <= 0:
+                return []
+            top, scores = top_k_rows(self._vectors[:size], q, top_k)
+            return [
+                (self._ads[row], float(scores[row]), 1.0 - float(scores[row]))
+                for row in top
+            ]
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "ready": self._ready,
+                "size": len(self._ads),
+                "capacity": int(self._vectors.shape[0]),
+                "bytes": int(self._vectors.nbytes),
+                "searches": self.searches,
+                "upserts": self.upserts,
+                "removals": self.removals,
+            }
+
+
+def changed_rows_stmt(since: datetime | None) -> sa.Select:
+    """serving_ads rows refreshed after `since` (all rows when None)."""
+    stmt = sa.select(
+        ServingAd.id,
+        ServingAd.title,
+        ServingAd.description,
+        ServingAd.keywords,
+        ServingAd.url,
+        ServingAd.image_url,
+        ServingAd.cpc,
+        ServingAd.embedding,
+        ServingAd.refreshed_at,
+    )
+    if since is not None:
+        stmt = stmt.where(ServingAd.refreshed_at > since)
+    return stmt
+
+
+def live_ids_stmt() -> sa.Select:
+    """Ids the index should hold; anything else was removed from serving_ads."""
+    return sa.select(ServingAd.id).where(ServingAd.embedding.is_not(None))
+
+
+@lru_cache
+def get_vector_index() -> InMemoryVectorIndex | SnapshotVectorIndex | None:
+    """Process-wide index for VECTOR_INDEX_BACKEND, or None for "postgres"."""
+    # Imported here: vector_snapshot builds on this module's helpers.
+    from app.db.vector_snapshot import SnapshotVectorIndex
+
+    settings = get_settings()
+    dim = int(settings.gemini_embedding_dim)
+    if settings.vector_index_backend == "memory":
+        return InMemoryVectorIndex(dim=dim)
+    if settings.vector_index_backend == "snapshot":
+        return SnapshotVectorIndex(
+            settings.vector_snapshot_dir,
+            dim,
+            check_interval=settings.vector_index_refresh_interval,
+            max_age=settings.vector_snapshot_max_age,
+        )
+    return None
@@ -0,0 +1,313 @@
+"""Versioned embedding snapshots of `serving_ads`, memory-mapped by workers.
+
+With VECTOR_INDEX_BACKEND=snapshot every process (uvicorn workers, MCP
+subprocesses) maps the same read-only files instead of loading its own
+copy of the matrix: the embeddings live once in the page cache and a
+worker is ready as soon as it has read the payload list.
+
+Layout of VECTOR_SNAPSHOT_DIR:
+
+    CURRENT                      name of the live version
+    v<version>/embeddings.npy    float32 (n, dim) unit vectors
+    v<version>/ids.npy           int64 (n,) ad ids, row-aligned
+    v<version>/ads.json          payload fields per row
+    v<version>/meta.json         {"exported_at": unix time the rows were read}
+
+`write_snapshot` builds a version in a temporary directory, renames it into
+place and then replaces CURRENT, both atomic on POSIX; readers never see a
+partial version. A background thread in each process checks CURRENT and
+swaps the mapping, so searches never touch the filesystem themselves; maps
+of pruned versions stay valid until released. A snapshot older than
+`max_age` (the exporter stopped) is not served: the repositories fall back
+to Postgres until a fresh one appears.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from decimal import Decimal
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.db.vector_index import IndexedAd, changed_rows_stmt, top_k_rows, unit_vector
+
+logger = logging.getLogger(__name__)
+
+_CURRENT = "CURRENT"
+# Versions kept on disk, so a worker that read CURRENT just before a swap
+# can still open the version it names.
+_KEEP_VERSIONS = 3
+
+
+def _fsync(path: Path) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def read_current(directory: str | Path) -> str | None:
+    try:
+        return (Path(directory) / _CURRENT).read_text().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def write_snapshot(
+    directory: str | Path,
+    ads: list[IndexedAd],
+    embeddings: Iterable[Any],
+    dim: int,
+    *,
+    exported_at: float | None = None,
+) -> str:
+    """Write a new version and make it current; returns its name.
+
+    `exported_at` is when the rows were read (default: now). Ads whose
+    embedding has the wrong dimension or a zero norm are skipped.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    kept: list[IndexedAd] = []
+    rows: list[np.ndarray] = []
+    for ad, embedding in zip(ads, embeddings, strict=True):
+        v = unit_vector(embedding, dim)
+        if v is not None:
+            kept.append(ad)
+            rows.append(v)
+    vectors = np.stack(rows) if rows else np.zeros((0, dim), dtype=np.float32)
+
+    version = f"v{time.time_ns()}"
+    tmp = directory / f".{version}.tmp"
+    tmp.mkdir()
+    np.save(tmp / "embeddings.npy", vectors)
+    np.save(tmp / "ids.npy", np.array([ad.id for ad in kept], dtype=np.int64))
+    (tmp / "ads.json").write_text(json.dumps([
+        {
+            "id": ad.id,
+            "title": ad.title,
+            "description": ad.description,
+            "keywords": ad.keywords,
+            "url": ad.url,
+            "image_url": ad.image_url,
+            "cpc": str(ad.cpc),
+        }
+        for ad in kept
+    ]))
+    (tmp / "meta.json").write_text(json.dumps({
+        "exported_at": time.time() if exported_at is None else exported_at,
+    }))
+    for name in ("embeddings.npy", "ids.npy", "ads.json", "meta.json"):
+        _fsync(tmp / name)
+    os.rename(tmp, directory / version)
+
+    current_tmp = directory / f".{_CURRENT}.{version}.tmp"
+    current_tmp.write_text(version)
+    _fsync(current_tmp)
+    os.replace(current_tmp, directory / _CURRENT)
+    _fsync(directory)
+
+    _prune(directory, keep=version)
+    return version
+
+
+def _prune(directory: Path, keep: str) -> None:
+    versions = sorted(
+        (p for p in directory.iterdir() if p.is_dir() and p.name.startswith("v")),
+        key=lambda p: int(p.name[1:]),
+    )
+    for path in versions[:-_KEEP_VERSIONS]:
+        if path.name != keep:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def export_snapshot(session: Session, directory: str | Path, dim: int) -> tuple[str, int]:
+    """Snapshot every `serving_ads` row with an embedding; returns (version, ads)."""
+    exported_at = time.time()
+    ads: list[IndexedAd] = []
+    embeddings: list[Any] = []
+    for row in session.execute(changed_rows_stmt(None)).all():
+        if row.embedding is None:
+            continue
+        ads.append(IndexedAd(
+            id=row.id,
+            title=row.title,
+            description=row.description,
+            keywords=row.keywords,
+            url=row.url,
+            image_url=row.image_url,
+            cpc=row.cpc,
+        ))
+        embeddings.append(row.embedding)
+    version = write_snapshot(directory, ads, embeddings, dim, exported_at=exported_at)
+    return version, len(ads)
+
+
+@dataclass(frozen=True)
+class _Mapped:
+    version: str
+    exported_at: float
+    vectors: np.ndarray  # np.memmap, read-only
+    ids: np.ndarray
+    ads: list[IndexedAd]
+
+
+def _open_version(directory: Path, version: str, dim: int) -> _Mapped:
+    path = directory / version
+    vectors = np.load(path / "embeddings.npy", mmap_mode="r")
+    ids = np.load(path / "ids.npy", mmap_mode="r")
+    if vectors.ndim != 2 or vectors.shape[1] != dim or ids.shape[0] != vectors.shape[0]:
+        raise ValueError(f"snapshot {version} does not match dimension {dim}")
+    ads = [
+        IndexedAd(**{**payload, "cpc": Decimal(payload["cpc"])})
+        for payload in json.loads((path / "ads.json").read_text())
+    ]
+    meta = json.loads((path / "meta.json").read_text())
+    return _Mapped(
+        version=version,
+        exported_at=float(meta["exported_at"]),
+        vectors=vectors,
+        ids=ids,
+        ads=ads,
+    )
+
+
+class SnapshotVectorIndex:
+    """Read-only index over the current snapshot.
+
+    A daemon thread, started on first use, re-checks CURRENT every
+    `check_interval` seconds (0 = no thread; call `check` yourself).
+    `ready` and `search` only read the mapping it installed.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        dim: int,
+        *,
+        check_interval: float,
+        max_age: float = 0.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        self._directory = Path(directory)
+        self._dim = dim
+        self._check_interval = check_interval
+        self._max_age = max_age
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._mapped: _Mapped | None = None
+        self._watcher: threading.Thread | None = None
+        self._watcher_lock = threading.Lock()
+        self._stop = threading.Event()
+
+        self.searches = 0
+        self.swaps = 0
+        self.failures = 0
+
+    def check(self) -> None:
+        """Map CURRENT if it names a version other than the mapped one (blocking IO)."""
+        with self._lock:
+            version = read_current(self._directory)
+            if version is None or (
+                self._mapped is not None and self._mapped.version == version
+            ):
+                return
+            try:
+                mapped = _open_version(self._directory, version, self._dim)
+            except (OSError, ValueError, KeyError):
+                self.failures += 1
+                logger.exception(f"Could not open vector snapshot {version}")
+                return
+            # In-flight searches keep the previous mapping until they return.
+            self._mapped = mapped
+            self.swaps += 1
+            logger.info(f"Vector snapshot {version} mapped ({len(mapped.ads)} ads)")
+
+    def _watch(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.check()
+            except Exception:
+                self.failures += 1
+                logger.exception("Vector snapshot check failed")
+            self._stop.wait(self._check_interval)
+
+    def _ensure_watcher(self) -> None:
+        # Lazy, so processes without a lifespan (MCP stdio servers) get one too.
+        if self._watcher is not None or self._check_interval <= 0:
+            return
+        with self._watcher_lock:
+            if self._watcher is None:
+                self._watcher = threading.Thread(
+                    target=self._watch, name="vector-snapshot-watch", daemon=True
+                )
+                self._watcher.start()
+
+    def close(self) -> None:
+        self._stop.set()
+
+    def _age(self, mapped: _Mapped) -> float:
+        return max(0.0, self._clock() - mapped.exported_at)
+
+    def _servable(self) -> _Mapped | None:
+        mapped = self._mapped
+        if mapped is None:
+            return None
+        if self._max_age > 0 and self._age(mapped) > self._max_age:
+            return None
+        return mapped
+
+    @property
+    def ready(self) -> bool:
+        self._ensure_watcher()
+        return self._servable() is not None
+
+    def __len__(self) -> int:
+        mapped = self._mapped
+        return len(mapped.ads) if mapped is not None else 0
+
+    @property
+    def version(self) -> str | None:
+        mapped = self._mapped
+        return mapped.version if mapped is not None else None
+
+    def search(
+        self, query_embedding: Any, top_k: int
+    ) -> list[tuple[IndexedAd, float, float]]:
+        """`(ad, score, distance)` of the `top_k` most similar ads, best first."""
+        mapped = self._servable()
+        self.searches += 1
+        q = unit_vector(query_embedding, self._dim)
+        if mapped is None or q is None or not mapped.ads or top_k <= 0:
+            return []
+        top, scores = top_k_rows(mapped.vectors, q, top_k)
+        return [
+            (mapped.ads[row], float(scores[row]), 1.0 - float(scores[row]))
+            for row in top
+        ]
+
+    def stats(self) -> dict[str, Any]:
+        mapped = self._mapped
+        return {
+            "ready": self._servable() is not None,
+            "version": mapped.version if mapped is not None else None,
+            "age": self._age(mapped) if mapped is not None else None,
+            "max_age": self._max_age,
+            "size": len(mapped.ads) if mapped is not None else 0,
+            "bytes": int(mapped.vectors.nbytes) if mapped is not None else 0,
+            "searches": self.searches,
+            "swaps": self.swaps,
+            "failures": self.failures,
+        }
@@ -1,35 +1,86 @@
 from __future__ import annotations
 
-from collections.abc import Generator
+from collections.abc import AsyncGenerator, Callable, Generator
+from contextlib import AbstractAsyncContextManager, asynccontextmanager
 from functools import lru_cache
 
 from fastapi import Depends
 from fastapi import HTTPException
+from fastapi import Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.core.settings import get_settings
-from app.db.session import get_db_session
-from app.services.gemini_service import GeminiService
+from app.db.session import (
+    get_async_db_session,
+    get_async_sessionmaker,
+    get_db_session,
+)
+from app.services.circuit_breaker import get_circuit_breakers
+from app.services.gemini_clients import get_gemini_client_registry
+from app.services.gemini_service import GeminiService, get_gemini_service
+from app.services.model_router import get_model_router
 from app.services.rag_service import RagService
+from app.services.response_cache import (
+    SemanticResponseCache,
+    get_semantic_response_cache,
+)
 from app.services.adAgent_service import AdAgentService
-from app.services.save_chat_service import SaveChatService
-
-
-@lru_cache
-def get_gemini_service() -> GeminiService:
-    return GeminiService(settings=get_settings())
+from app.services.save_chat_service import AsyncSaveChatService
+from app.services.single_flight import SingleFlight
 
 
 def get_db() -> Generator[Session, None, None]:
     yield from get_db_session()
 
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    # Request-path sessions: DB round trips never block the event loop.
+    async for db in get_async_db_session():
+        yield db
+
+
 def get_rag_service(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     gemini_service: GeminiService = Depends(get_gemini_service),
+    response_cache: SemanticResponseCache | None = Depends(
+        get_semantic_response_cache
+    ),
 ) -> RagService:
     return RagService(
-        db=db, gemini_service=gemini_service, settings=get_settings()
+        db=db,
+        gemini_service=gemini_service,
+        settings=get_settings(),
+        response_cache=response_cache,
+        breakers=get_circuit_breakers(),
+    )
+
+
+def get_rag_service_factory(
+    gemini_service: GeminiService = Depends(get_gemini_service),
+    response_cache: SemanticResponseCache | None = Depends(
+        get_semantic_response_cache
+    ),
+) -> Callable[[], AbstractAsyncContextManager[RagService]]:
+    """Opens a RagService on its own session, for work that outlives the request
+    (coalesced calls shared by several requests)."""
+
+    @asynccontextmanager
+    async def _open() -> AsyncGenerator[RagService, None]:
+        async with get_async_sessionmaker()() as db:
+            yield get_rag_service(db, gemini_service, response_cache)
+
+    return _open
+
+
+@lru_cache
+def _get_shared_agentic_service() -> AdAgentService:
+    # Built once: the LangChain model and compiled agent graph are reused.
+    return AdAgentService(
+        settings=get_settings(),
+        clients=get_gemini_client_registry(),
+        router=get_model_router(),
+        breakers=get_circuit_breakers(),
     )
 
 
@@ -37,7 +88,7 @@ def get_agentic_service(
     # gemini_service: GeminiService = Depends(get_gemini_service),
 ) -> AdAgentService:
     try:
-        return AdAgentService(settings=get_settings())
+        return _get_shared_agentic_service()
     except RuntimeError as e:
         # Misconfiguration (missing Gemini key) should be explicit
         # for API clients.
@@ -45,6 +96,10 @@ def get_agentic_service(
 
 
 def get_save_chat_service(
-    db: Session = Depends(get_db),
-) -> SaveChatService:
-    return SaveChatService(db=db)
+    db: AsyncSession = Depends(get_async_db),
+) -> AsyncSaveChatService:
+    return AsyncSaveChatService(db=db)
+
+
+def get_single_flight(request: Request) -> SingleFlight:
+    return request.app.state.single_flight
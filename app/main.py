@@ -6,9 +6,16 @@ from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy import text
 
 from app.api import chat, health, rag, mcp, agentic, saveChatHistory, viewAd
+from app.core.deadline import DeadlineMiddleware
 from app.core.logging import configure_logging
 from app.core.settings import get_settings
+from app.db.engine import get_async_engine
 from app.db.session import get_db_session
+from app.services.gemini_clients import get_gemini_client_registry
+from app.services.response_cache import get_semantic_response_cache
+from app.services.serving_ads import build_serving_ads_scheduler
+from app.services.vector_index_sync import build_vector_index_sync
+from app.services.single_flight import build_single_flight
 
 logger = logging.getLogger(__name__)
 
@@ -35,9 +42,30 @@ async def lifespan(app: FastAPI):
             "Application will continue but database operations may fail"
         )
 
+    # Pre-spawn pooled MCP server sessions so /mcp-chat skips cold starts
+    try:
+        await mcp.mcp_client_instance.start()
+    except Exception as e:
+        logger.error(f"MCP session pool failed to start: {e}")
+        logger.warning("MCP requests will spawn a server per request")
+
+    # Apply campaign start/end-date transitions to serving_ads
+    if app.state.serving_ads is not None:
+        app.state.serving_ads.start()
+    # Load the in-process vector index (VECTOR_INDEX_BACKEND=memory)
+    if app.state.vector_index_sync is not None:
+        app.state.vector_index_sync.start()
+
     yield
 
     # Shutdown
+    if app.state.vector_index_sync is not None:
+        await app.state.vector_index_sync.aclose()
+    if app.state.serving_ads is not None:
+        await app.state.serving_ads.aclose()
+    await mcp.mcp_client_instance.close()
+    await get_gemini_client_registry().aclose()
+    await get_async_engine().dispose()
     logger.info(f"Shutting down {settings.app_name}")
 
 
@@ -46,6 +74,12 @@ def create_app() -> FastAPI:
     configure_logging(settings)
 
     app = FastAPI(title=settings.app_name, lifespan=lifespan)
+    # Per-app so in-flight futures never outlive the app's event loop.
+    app.state.single_flight = build_single_flight(settings)
+    app.state.serving_ads = build_serving_ads_scheduler(
+        settings, response_cache=get_semantic_response_cache()
+    )
+    app.state.vector_index_sync = build_vector_index_sync(settings)
 
     # Parse CORS origins from comma-separated string
     cors_origins = [
@@ -61,6 +95,9 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
 
+    # Per-request time budget read by Gemini, DB, MCP and agent calls.
+    app.add_middleware(DeadlineMiddleware, settings=settings)
+
     app.include_router(chat.router, prefix="/api/v1")
     app.include_router(rag.router, prefix="/api/v1")
     app.include_router(mcp.router, prefix="/api/v1")
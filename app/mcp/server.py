@@ -1,20 +1,19 @@
 from mcp.server.fastmcp import FastMCP
 import anyio
-import sqlalchemy as sa
-from app.db.session import get_db_session
-from app.core.settings import get_settings
-from app.db.retrieval import AdsVectorRepository
-from app.services.gemini_service import GeminiService
+from app.db.session import get_db_session, is_query_canceled
+from app.db.retrieval import AdsVectorRepository, keyword_search_stmt
+from app.services.circuit_breaker import DB_RETRIEVAL, get_circuit_breakers
+from app.services.gemini_service import get_gemini_service
 from typing import Any
 from decimal import Decimal
-from app.db.models import Ad, AdCampaign, Campaign
+from app.db.models import Ad, ServingAd
 
 
 # Initialize the MCP Server
 mcp = FastMCP("AdAI-MCP")
 
 
-def _ad_to_payload(ad: Ad) -> dict[str, Any]:
+def _ad_to_payload(ad: Ad | ServingAd) -> dict[str, Any]:
     """
     Convert an Ad ORM model to a dictionary payload.
     """
@@ -38,7 +37,7 @@ def _ad_to_payload(ad: Ad) -> dict[str, Any]:
 @mcp.tool(description="Fast exact-match search for ads by keyword. Use when user mentions specific product names, brands, or short search terms (1-3 words). Performs full text search in title/description/keywords.")
 async def get_ads_by_keyword(keyword: str, limit: int = 8) -> dict[str, Any]:
     """
-    Fast keyword-based search using exact substring matching (SQL LIKE).
+    Fast keyword-based search using full-text matching on eligible ads.
     Best for specific product names, brands, or categorical terms.
 
     Use this tool when:
@@ -78,30 +77,17 @@ async def get_ads_by_keyword(keyword: str, limit: int = 8) -> dict[str, Any]:
         session_gen = get_db_session()
         try:
             db = next(session_gen)
-            # Improved query: search for ANY of the words provided
-            conditions = []
-            for word in words:
-                like = f"%{word}%"
-                conditions.append(Ad.keywords.any(like))
-                conditions.append(Ad.title.match(like))
-                conditions.append(Ad.description.match(like))
-
-            stmt = (
-                sa.select(Ad)
-                .join(AdCampaign, Ad.id == AdCampaign.ad_id)
-                .join(Campaign, AdCampaign.campaign_id == Campaign.id)
-                .where(
-                    sa.or_(*conditions),
-                    Campaign.is_running
-                )
-                .distinct()
-                .limit(safe_limit)
-            )
+            # Any of the words, over the precomputed serving_ads table
+            stmt = keyword_search_stmt(words, safe_limit)
             ads = db.execute(stmt).scalars().all()
             return {"count": len(ads), "ads": [_ad_to_payload(a) for a in ads]}
         finally:
             session_gen.close()
-    tool_result = await anyio.to_thread.run_sync(_query_ads)
+    # A statement stopped by the request deadline is no DB failure.
+    tool_result = await get_circuit_breakers().get(DB_RETRIEVAL).call(
+        lambda: anyio.to_thread.run_sync(_query_ads),
+        is_cancel=is_query_canceled,
+    )
 
     return tool_result
 
@@ -137,13 +123,11 @@ async def get_ads_semantic(search_query: str, limit: int = 5) -> dict[str, Any]:
         {"query_intent": str, "count": int, "ads": [{"score", "distance", "data": {...}}]}
         where score is cosine similarity (higher=better) and distance is cosine distance (lower=better).
     """
-    settings = get_settings()
-    embedding_tokens = 0
     try:
-        # Using GeminiService to embed the query string
-        gemini = GeminiService(settings=settings)
-        query_embedding, embedding_tokens = await gemini.embed_text_with_usage(
-            search_query
+        # Shared GeminiService: in-process transport reuses the API's client
+        gemini = get_gemini_service()
+        query_embedding, embedding_usage = (
+            await gemini.embed_text_with_usage_details(search_query)
         )
     except Exception as e:
         return {"error": f"Failed to embed query: {str(e)}"}
@@ -162,7 +146,9 @@ async def get_ads_semantic(search_query: str, limit: int = 5) -> dict[str, Any]:
             return {
                 "query_intent": search_query,
                 "count": len(matches),
-                "embedding_tokens": embedding_tokens,
+                "embedding_tokens": embedding_usage.tokens,
+                "embedding_tokens_estimated": embedding_usage.estimated,
+                "embedding_cache_hit": embedding_usage.cached,
                 "ads": [
                     {
                         "score": m.score,
@@ -174,7 +160,10 @@ async def get_ads_semantic(search_query: str, limit: int = 5) -> dict[str, Any]:
         finally:
             session_gen.close()
 
-    return await anyio.to_thread.run_sync(_vector_search)
+    return await get_circuit_breakers().get(DB_RETRIEVAL).call(
+        lambda: anyio.to_thread.run_sync(_vector_search),
+        is_cancel=is_query_canceled,
+    )
 
 
 if __name__ == "__main__":
@@ -22,6 +22,14 @@ class ChatResponse(BaseModel):
     breakdown: dict[str, Any] = Field(default_factory=dict)
 
 
+class ChatStreamDone(BaseModel):
+    """Final event of a streamed chat response."""
+    generation_time: float = 0.0
+    time_to_first_token: float = 0.0
+    used_tokens: int = 0
+    breakdown: dict[str, Any] = Field(default_factory=dict)
+
+
 class AgenticChatResponse(ChatResponse):
     """Extended chat response with ad agent metrics breakdown."""
     chat_response: str = ""
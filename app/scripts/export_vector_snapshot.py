@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import logging
+import time
+
+import typer
+
+from app.core.settings import get_settings
+from app.db.session import get_sessionmaker
+from app.db.vector_snapshot import export_snapshot
+
+logger = logging.getLogger(__name__)
+
+
+def run_export(directory: str | None = None) -> str:
+    settings = get_settings()
+    directory = directory or settings.vector_snapshot_dir
+    SessionLocal = get_sessionmaker(settings.database_url)
+
+    started = time.perf_counter()
+    with SessionLocal() as session:
+        version, count = export_snapshot(
+            session, directory, int(settings.gemini_embedding_dim)
+        )
+    logger.info(
+        "Vector snapshot %s written to %s: %d ads in %.2fs",
+        version,
+        directory,
+        count,
+        time.perf_counter() - started,
+    )
+    return version
+
+
+app = typer.Typer()
+
+
+@app.command()
+def main(
+    directory: str | None = typer.Option(
+        None,
+        "--dir",
+        help="Snapshot directory (default: VECTOR_SNAPSHOT_DIR)",
+    ),
+    every: float = typer.Option(
+        0.0,
+        "--every",
+        help="Re-export every N seconds instead of once",
+    ),
+) -> None:
+    """Export serving_ads embeddings as a new memory-mappable snapshot version."""
+    settings = get_settings()
+    logging.basicConfig(
+        level=getattr(logging, settings.log_level.upper(), logging.INFO),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    while True:
+        try:
+            run_export(directory)
+        except Exception:
+            if not every:
+                raise
+            logger.exception("Vector snapshot export failed")
+        if not every:
+            return
+        time.sleep(every)
+
+
+if __name__ == "__main__":
+    app()
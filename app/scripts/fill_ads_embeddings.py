@@ -11,6 +11,7 @@ from app.core.settings import get_settings
 from app.db.models import Ad
 from app.db.session import get_sessionmaker
 from app.services.gemini_service import GeminiService
+from app.services.rate_limiter import Priority, request_priority
 
 logger = logging.getLogger(__name__)
 
@@ -125,7 +126,9 @@ def main(
     ),
 ) -> None:
     """Backfill embeddings for ads in the database."""
-    asyncio.run(run_backfill(force=force))
+    # Yields to interactive traffic when sharing a rate limiter.
+    with request_priority(Priority.BATCH):
+        asyncio.run(run_backfill(force=force))
 
 
 if __name__ == "__main__":
@@ -1,20 +1,50 @@
 from __future__ import annotations
 
+from contextvars import ContextVar
 from typing import Any
 from functools import wraps
 
 from langchain.agents import create_agent
-from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
-from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain.agents.middleware import ModelRequest, wrap_model_call
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    ToolMessage,
+)
 
+from app.core import deadline
 from app.core.settings import Settings, get_settings
 from app.mcp.server import get_ads_by_keyword, get_ads_semantic
 from app.models.chat import ChatMessage
 from app.services.agent_metrics_callback import MetricsCallbackHandler
+from app.services.circuit_breaker import (
+    DB_RETRIEVAL,
+    GEMINI_GENERATION,
+    CircuitBreakers,
+    CircuitOpenError,
+    build_circuit_breakers,
+)
+from app.services.conversation import ConversationAssembler, HistoryBudget
+from app.services.gemini_clients import GeminiClientRegistry
+from app.services.model_router import (
+    ModelRouter,
+    ModelTier,
+    build_model_router,
+    track_model_choices,
+)
+from app.services.rate_limiter import is_queue_full
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Metrics callback of the analyze_and_get_ad call running in this context.
+# A ContextVar (not an attribute) so one AdAgentService can serve concurrent
+# requests without mixing their embedding token counts.
+_active_metrics_callback: ContextVar[MetricsCallbackHandler | None] = (
+    ContextVar("ad_agent_metrics_callback", default=None)
+)
+
 
 SYSTEM_PROMPT = (
     """You are a professional sales agent that helps users find relevant products and services based on their needs.
@@ -70,7 +100,14 @@ SYSTEM_PROMPT = (
 
 
 class AdAgentService:
-    def __init__(self, *, settings: Settings | None = None):
+    def __init__(
+        self,
+        *,
+        settings: Settings | None = None,
+        clients: GeminiClientRegistry | None = None,
+        router: ModelRouter | None = None,
+        breakers: CircuitBreakers | None = None,
+    ):
         self._settings = settings or get_settings()
 
         if not self._settings.gemini_api_key:
@@ -79,12 +116,13 @@ class AdAgentService:
                 Set GEMINI_API_KEY or GOOGLE_API_KEY."""
             )
 
-        self.llm = ChatGoogleGenerativeAI(
-            model=self._settings.gemini_model,
-            temperature=0.1,
-            api_key=self._settings.gemini_api_key,
+        self._clients = clients or GeminiClientRegistry(self._settings)
+        self._router = router or build_model_router(self._settings)
+        self._breakers = breakers or build_circuit_breakers(self._settings)
+        self._default_tier = ModelTier(
+            model=self._settings.gemini_model, temperature=0.1
         )
-        self._active_metrics_callback: MetricsCallbackHandler | None = None
+        self.llm = self._llm_for(self._default_tier)
 
         @wraps(get_ads_semantic)
         async def get_ads_semantic_with_metrics(
@@ -92,7 +130,7 @@ class AdAgentService:
             **kwargs: Any,
         ) -> dict[str, Any]:
             result = await get_ads_semantic(*args, **kwargs)
-            metrics = self._active_metrics_callback
+            metrics = _active_metrics_callback.get()
             if metrics and isinstance(result, dict):
                 embedding_tokens = int(result.get("embedding_tokens", 0))
                 metrics.add_embedding_tokens(embedding_tokens)
@@ -100,12 +138,69 @@ class AdAgentService:
 
         self.tools = [get_ads_by_keyword, get_ads_semantic_with_metrics]
 
+        # Ad intent only depends on the latest turns: no rolling summary.
+        self._conversation = ConversationAssembler()
+        self._history_budget = HistoryBudget(
+            max_tokens=self._settings.history_token_budget_agent,
+            max_turns=self._settings.history_max_turns_agent,
+            summarize=False,
+        )
+
         self.agent = create_agent(
             self.llm,
             self.tools,
-            system_prompt=SYSTEM_PROMPT
+            system_prompt=SYSTEM_PROMPT,
+            middleware=[self._routing_middleware()],
         )
 
+    def _llm_for(self, tier: ModelTier):
+        return self._clients.langchain_chat_model(
+            model=tier.model,
+            temperature=(
+                tier.temperature
+                if tier.temperature is not None
+                else self._default_tier.temperature
+            ),
+            max_output_tokens=tier.max_output_tokens,
+            thinking_budget=tier.thinking_budget,
+        )
+
+    def _routing_middleware(self):
+        """Route each agent LLM step through the model router."""
+
+        @wrap_model_call
+        async def route_model(request: ModelRequest, handler):
+            # Steps before any tool result plan; later ones write the answer.
+            stage = (
+                "agent.answer"
+                if any(isinstance(m, ToolMessage) for m in request.messages)
+                else "agent.plan"
+            )
+
+            async def _call(tier: ModelTier):
+                return await handler(request.override(model=self._llm_for(tier)))
+
+            response, _ = await self._breakers.get(GEMINI_GENERATION).call(
+                lambda: self._router.run(stage, _call, default=self._default_tier),
+                is_cancel=is_queue_full,
+            )
+            return response
+
+        return route_model
+
+    async def _recent_history(
+        self,
+        history: list[ChatMessage] | list[BaseMessage],
+    ) -> list[ChatMessage] | list[BaseMessage]:
+        if history and isinstance(history[0], BaseMessage):
+            max_turns = self._history_budget.max_turns
+            return list(history[-max_turns:]) if max_turns else []
+        return (
+            await self._conversation.assemble(
+                history, self._history_budget  # type: ignore[arg-type]
+            )
+        ).messages
+
     @staticmethod
     def _to_lc_messages(
         history: list[ChatMessage] | list[BaseMessage]
@@ -165,22 +260,51 @@ class AdAgentService:
                 - ad_text: str | None - The ad text if found, or None
                 - generation_time: float - Time spent in LLM calls (seconds)
                 - used_tokens: int - Total tokens consumed across all LLM calls
+                - skipped: "circuit_open" - Only when the agent did not run
         """
+        # Ads need both the model and the ad tables: skip the agent outright
+        # while either dependency's circuit is open.
+        open_circuits = [
+            name for name in (GEMINI_GENERATION, DB_RETRIEVAL)
+            if not self._breakers.get(name).available()
+        ]
+        if open_circuits:
+            logger.warning(
+                f"Ad agent skipped: circuit open for {', '.join(open_circuits)}"
+            )
+            return {
+                "ad_text": None,
+                "generation_time": 0.0,
+                "used_tokens": 0,
+                "ad_llm_tokens": 0,
+                "ad_embedding_tokens": 0,
+                "models": {},
+                "skipped": "circuit_open",
+            }
+
         # Initialize metrics tracking callback
         metrics_callback = MetricsCallbackHandler()
-        self._active_metrics_callback = metrics_callback
+        metrics_token = _active_metrics_callback.set(metrics_callback)
+        models: dict[str, str] = {}
 
         try:
-            lc_history = self._to_lc_messages(history)
+            lc_history = self._to_lc_messages(await self._recent_history(history))
             messages: list[BaseMessage] = [
                 *lc_history,
                 HumanMessage(content=latest_message)
             ]
 
-            result = await self.agent.ainvoke(
-                {"messages": messages},
-                config={"callbacks": [metrics_callback]}
-            )
+            with track_model_choices() as models:
+                # Ads are optional: leave the chat answer its share of the
+                # request budget and give up on the ad instead.
+                result = await deadline.bounded(
+                    self.agent.ainvoke(
+                        {"messages": messages},
+                        config={"callbacks": [metrics_callback]}
+                    ),
+                    reserve=self._settings.deadline_reserve,
+                    what="ad agent",
+                )
 
             result_messages = (
                 result.get("messages", [])
@@ -232,11 +356,17 @@ class AdAgentService:
                 "used_tokens": ad_total_tokens,
                 "ad_llm_tokens": ad_llm_tokens,
                 "ad_embedding_tokens": ad_embedding_tokens,
+                "models": dict(models),
             }
-        except Exception:
-            logger.exception(
-                "AdAgentService failed while analyzing and fetching ad"
-            )
+        except Exception as e:
+            if isinstance(e, deadline.DeadlineExceeded):
+                logger.warning("Ad agent skipped: request deadline reached")
+            elif isinstance(e, CircuitOpenError):
+                logger.warning(f"Ad agent skipped: {e}")
+            else:
+                logger.exception(
+                    "AdAgentService failed while analyzing and fetching ad"
+                )
             metrics = metrics_callback.get_metrics()
             ad_llm_tokens = metrics["llm_tokens"]
             ad_embedding_tokens = metrics["embedding_tokens"]
@@ -247,6 +377,7 @@ class AdAgentService:
                 "used_tokens": ad_total_tokens,
                 "ad_llm_tokens": ad_llm_tokens,
                 "ad_embedding_tokens": ad_embedding_tokens,
+                "models": dict(models),
             }
         finally:
-            self._active_metrics_callback = None
+            _active_metrics_callback.reset(metrics_token)
@@ -0,0 +1,250 @@
+"""Circuit breakers for the Gemini and Postgres dependencies.
+
+When a dependency is down, every request would otherwise wait out its own
+timeouts and retries. A breaker counts consecutive failures. Past the
+threshold it opens and rejects calls at once, so callers take their
+degraded path (answer without retrieval, without ads, without tools).
+After the recovery timeout a few half-open probe calls are let through.
+Their outcome closes the breaker again or reopens it.
+
+Cancellations (client disconnects, request deadlines) are no verdict on the
+dependency and neither trip a breaker nor close it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from functools import lru_cache
+from typing import Any, TypeVar
+
+from app.core.errors import ServiceError
+from app.core.settings import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Breakers guarding the shared dependencies.
+GEMINI_EMBEDDINGS = "gemini_embeddings"
+GEMINI_GENERATION = "gemini_generation"
+DB_RETRIEVAL = "db_retrieval"
+
+
+class CircuitOpenError(ServiceError, RuntimeError):
+    """A call was rejected because its dependency's breaker is open."""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(
+            f"{name} is unavailable (circuit open, retry in {retry_in:.1f}s)", 503
+        )
+        self.name = name
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with half-open probes.
+
+    `before_call` must be followed by exactly one of `on_success`,
+    `on_failure` or `on_cancel`; `call` does that for an awaitable.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+        enabled: bool = True,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self._failure_threshold = failure_threshold
+        self._recovery_timeout = recovery_timeout
+        self._half_open_max_calls = half_open_max_calls
+        self._enabled = enabled
+        self._clock = clock
+        # Sync callers (MCP tools) report from worker threads.
+        self._lock = threading.Lock()
+
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+
+        self.opened = 0
+        self.rejected = 0
+        self.last_error: str | None = None
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def _retry_in(self) -> float:
+        if self._state != OPEN:
+            return 0.0
+        elapsed = self._clock() - self._opened_at
+        return max(0.0, self._recovery_timeout - elapsed)
+
+    def _recovered(self) -> bool:
+        return self._state == OPEN and self._retry_in() <= 0
+
+    def available(self) -> bool:
+        """Whether a call would be let through now (does not claim a probe)."""
+        with self._lock:
+            if not self._enabled or self._state == CLOSED or self._recovered():
+                return True
+            return (
+                self._state == HALF_OPEN
+                and self._probes < self._half_open_max_calls
+            )
+
+    def before_call(self) -> None:
+        """Admit a call or raise CircuitOpenError."""
+        if not self._enabled:
+            return
+        with self._lock:
+            if self._recovered():
+                self._state = HALF_OPEN
+                self._probes = 0
+                logger.info(f"Circuit {self.name}: half-open, probing")
+            if self._state == CLOSED:
+                return
+            if (
+                self._state == HALF_OPEN
+                and self._probes < self._half_open_max_calls
+            ):
+                self._probes += 1
+                return
+            self.rejected += 1
+            retry_in = self._retry_in()
+        raise CircuitOpenError(self.name, retry_in)
+
+    def on_success(self) -> None:
+        if not self._enabled:
+            return
+        with self._lock:
+            if self._state == HALF_OPEN:
+                logger.info(f"Circuit {self.name}: closed after successful probe")
+            self._state = CLOSED
+            self._failures = 0
+            self._probes = 0
+
+    def on_failure(self, error: BaseException | None = None) -> None:
+        if not self._enabled:
+            return
+        with self._lock:
+            if error is not None:
+                self.last_error = f"{type(error).__name__}: {error}"
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self._failure_threshold:
+                if self._state != OPEN:
+                    self.opened += 1
+                    logger.warning(
+                        f"Circuit {self.name}: open after "
+                        f"{self._failures} failure(s): {self.last_error}"
+                    )
+                self._state = OPEN
+                self._opened_at = self._clock()
+                self._probes = 0
+
+    def on_cancel(self) -> None:
+        """Release an admitted call that ended without a verdict."""
+        if not self._enabled:
+            return
+        with self._lock:
+            if self._state == HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    async def call(
+        self,
+        fn: Callable[[], Awaitable[T]],
+        *,
+        is_cancel: Callable[[Exception], bool] | None = None,
+    ) -> T:
+        """Run `fn` under the breaker.
+
+        Errors for which `is_cancel` returns True are reported as
+        cancellations, e.g. statements stopped by the request deadline.
+        """
+        self.before_call()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            self.on_cancel()
+            raise
+        except Exception as e:
+            if is_cancel is not None and is_cancel(e):
+                self.on_cancel()
+            else:
+                self.on_failure(e)
+            raise
+        self.on_success()
+        return result
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            state = HALF_OPEN if self._recovered() else self._state
+            return {
+                "state": state if self._enabled else "disabled",
+                "consecutive_failures": self._failures,
+                "retry_in": self._retry_in() if state == OPEN else 0.0,
+                "opened": self.opened,
+                "rejected": self.rejected,
+                "last_error": self.last_error,
+            }
+
+
+class CircuitBreakers:
+    """Named breakers, one per shared dependency."""
+
+    def __init__(self, settings: Settings, *, clock: Callable[[], float] = time.monotonic):
+        self._breakers = {
+            name: CircuitBreaker(
+                name,
+                failure_threshold=settings.circuit_breaker_failure_threshold,
+                recovery_timeout=settings.circuit_breaker_recovery_timeout,
+                half_open_max_calls=settings.circuit_breaker_half_open_max_calls,
+                enabled=settings.circuit_breaker_enabled,
+                clock=clock,
+            )
+            for name in (GEMINI_EMBEDDINGS, GEMINI_GENERATION, DB_RETRIEVAL)
+        }
+
+    def get(self, name: str) -> CircuitBreaker:
+        return self._breakers[name]
+
+    def open_circuits(self) -> list[str]:
+        """Names of the breakers that currently reject calls."""
+        return [
+            name for name, breaker in self._breakers.items()
+            if not breaker.available()
+        ]
+
+    def states(self) -> dict[str, str]:
+        return {
+            name: breaker.stats()["state"]
+            for name, breaker in self._breakers.items()
+        }
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            name: breaker.stats() for name, breaker in self._breakers.items()
+        }
+
+
+def build_circuit_breakers(settings: Settings) -> CircuitBreakers:
+    return CircuitBreakers(settings)
+
+
+@lru_cache
+def get_circuit_breakers() -> CircuitBreakers:
+    """Process-wide breakers shared by the API services and in-process MCP tools."""
+    return build_circuit_breakers(get_settings())
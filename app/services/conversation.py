@@ -0,0 +1,261 @@
+"""Token-budgeted conversation assembly shared by all chat modes.
+
+Clients send the full `history` on every turn, so without a window prompt
+size, latency and cost grow with the conversation. The assembler keeps the
+latest turns verbatim within a per-mode token budget and replaces older
+turns with a rolling summary.
+
+Summaries are cached per conversation prefix (a hash chain over messages)
+and computed incrementally in the background: the summary of turns 1..n is
+built from the cached summary of turns 1..m plus turns m+1..n. Only a
+request with no cached summary at all (the first one trimmed) waits for
+summarization, up to `summary_wait` seconds within its deadline. Later
+requests use the longest prefix summary already cached, and turns not yet
+covered by it are left out until it catches up.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass, field
+from typing import Any
+
+from cachetools import LRUCache
+from google.genai import types
+
+from app.core import deadline
+from app.core.settings import Settings
+from app.models.chat import ChatMessage
+from app.services.rate_limiter import Priority, request_priority
+from app.services.token_estimator import TokenEstimator
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PREFIX = "Summary of our earlier conversation:\n"
+_SUMMARY_ACK = "Understood, I will keep that context in mind."
+
+_SUMMARY_PROMPT = (
+    "Update the running summary of a conversation between a user and an "
+    "assistant. Keep facts, preferences, constraints and open questions; drop "
+    "pleasantries. Do not mention sponsored blocks or ads. Answer with the "
+    "updated summary only, at most {max_words} words.\n\n"
+    "Current summary:\n{summary}\n\nNew messages:\n{messages}"
+)
+
+# Shared by every assembler so chat, RAG and MCP reuse each other's
+# summaries: (model, prefix hash) -> summary text.
+_SUMMARY_CACHE: LRUCache[tuple[str, str], str] = LRUCache(maxsize=1024)
+_PENDING_SUMMARIES: dict[tuple[str, str], asyncio.Task] = {}
+_SUMMARY_TASKS: set[asyncio.Task] = set()
+_STATS = {
+    "requests": 0,
+    "trimmed_requests": 0,
+    "summary_hits": 0,
+    "summary_misses": 0,
+    "summary_waits": 0,
+    "summaries_computed": 0,
+    "summary_failures": 0,
+}
+
+
+@dataclass(frozen=True)
+class HistoryBudget:
+    """Per-mode window: token budget (0 = unlimited), optional turn cap."""
+
+    max_tokens: int
+    max_turns: int | None = None
+    summarize: bool = True
+
+
+@dataclass
+class AssembledHistory:
+    messages: list[ChatMessage]
+    verbatim_turns: int
+    summarized_turns: int = 0
+    dropped_turns: int = 0
+    history_tokens: int = 0
+    summary: str | None = field(default=None, repr=False)
+
+
+def _message_text(msg: ChatMessage) -> str:
+    return "\n".join(str(part) for part in msg.parts)
+
+
+def _prefix_hashes(messages: list[ChatMessage]) -> list[str]:
+    """hashes[i] identifies messages[:i + 1]."""
+    hashes: list[str] = []
+    previous = b""
+    for msg in messages:
+        digest = hashlib.sha256(previous)
+        digest.update(msg.role.encode("utf-8") + b"\x00")
+        digest.update(_message_text(msg).encode("utf-8"))
+        previous = digest.digest()
+        hashes.append(digest.hexdigest())
+    return hashes
+
+
+class ConversationAssembler:
+    def __init__(
+        self,
+        client: Any | None = None,
+        *,
+        model: str | None = None,
+        estimator: TokenEstimator | None = None,
+        summary_max_words: int = 200,
+        summary_wait: float = 0.0,
+    ):
+        # Without a client older turns are dropped instead of summarized.
+        self._client = client
+        self._model = model or ""
+        self._estimator = estimator or TokenEstimator()
+        self._summary_max_words = summary_max_words
+        self._summary_wait = summary_wait
+
+    def _tokens(self, msg: ChatMessage) -> int:
+        return self._estimator.estimate([_message_text(msg)])
+
+    async def assemble(
+        self, history: list[ChatMessage], budget: HistoryBudget
+    ) -> AssembledHistory:
+        _STATS["requests"] += 1
+        messages = list(history)
+
+        kept: list[ChatMessage] = []
+        used = 0
+        for msg in reversed(messages):
+            if budget.max_turns is not None and len(kept) >= budget.max_turns:
+                break
+            cost = self._tokens(msg)
+            # The latest turn is always kept, even when it alone is over budget.
+            if kept and budget.max_tokens > 0 and used + cost > budget.max_tokens:
+                break
+            kept.append(msg)
+            used += cost
+        kept.reverse()
+
+        older = messages[: len(messages) - len(kept)]
+        if not older:
+            return AssembledHistory(
+                messages=kept, verbatim_turns=len(kept), history_tokens=used
+            )
+
+        _STATS["trimmed_requests"] += 1
+        if not budget.summarize or self._client is None:
+            return AssembledHistory(
+                messages=kept,
+                verbatim_turns=len(kept),
+                dropped_turns=len(older),
+                history_tokens=used,
+            )
+
+        hashes = _prefix_hashes(older)
+        summary, covered = self._best_summary(hashes)
+        if covered < len(older):
+            _STATS["summary_misses"] += 1
+            task = self._schedule_summary(older, hashes)
+            if summary is None and self._summary_wait > 0:
+                # Nothing cached yet: dropping every older turn would lose the
+                # whole conversation, so give the first summary a chance.
+                _STATS["summary_waits"] += 1
+                await asyncio.wait(
+                    {task}, timeout=deadline.timeout_for(self._summary_wait)
+                )
+                summary, covered = self._best_summary(hashes)
+        else:
+            _STATS["summary_hits"] += 1
+
+        if summary is None:
+            return AssembledHistory(
+                messages=kept,
+                verbatim_turns=len(kept),
+                dropped_turns=len(older),
+                history_tokens=used,
+            )
+
+        summary_messages = [
+            ChatMessage(role="user", parts=[f"{SUMMARY_PREFIX}{summary}"]),
+            ChatMessage(role="model", parts=[_SUMMARY_ACK]),
+        ]
+        return AssembledHistory(
+            messages=[*summary_messages, *kept],
+            verbatim_turns=len(kept),
+            summarized_turns=covered,
+            dropped_turns=len(older) - covered,
+            history_tokens=used + sum(self._tokens(m) for m in summary_messages),
+            summary=summary,
+        )
+
+    def _best_summary(self, hashes: list[str]) -> tuple[str | None, int]:
+        """Longest cached prefix summary as (summary, covered message count)."""
+        for covered in range(len(hashes), 0, -1):
+            summary = _SUMMARY_CACHE.get((self._model, hashes[covered - 1]))
+            if summary is not None:
+                return summary, covered
+        return None, 0
+
+    def _schedule_summary(
+        self, older: list[ChatMessage], hashes: list[str]
+    ) -> asyncio.Task:
+        key = (self._model, hashes[-1])
+        pending = _PENDING_SUMMARIES.get(key)
+        if pending is not None:
+            return pending
+        with request_priority(Priority.BACKGROUND):
+            task = asyncio.get_running_loop().create_task(
+                self._summarize(older, hashes)
+            )
+        _PENDING_SUMMARIES[key] = task
+        _SUMMARY_TASKS.add(task)
+        task.add_done_callback(_SUMMARY_TASKS.discard)
+        task.add_done_callback(lambda _: _PENDING_SUMMARIES.pop(key, None))
+        return task
+
+    async def _summarize(
+        self, older: list[ChatMessage], hashes: list[str]
+    ) -> None:
+        previous, covered = self._best_summary(hashes)
+        new_messages = "\n".join(
+            f"{msg.role}: {_message_text(msg)}" for msg in older[covered:]
+        )
+        prompt = _SUMMARY_PROMPT.format(
+            max_words=self._summary_max_words,
+            summary=previous or "(none yet)",
+            messages=new_messages,
+        )
+        try:
+            response = await self._client.aio.models.generate_content(
+                model=self._model,
+                contents=prompt,
+                config=types.GenerateContentConfig(temperature=0.0),
+            )
+            summary = (getattr(response, "text", None) or "").strip()
+        except Exception as e:
+            _STATS["summary_failures"] += 1
+            logger.warning(f"History summarization failed: {e}")
+            return
+        if not summary:
+            _STATS["summary_failures"] += 1
+            return
+        _SUMMARY_CACHE[(self._model, hashes[-1])] = summary
+        _STATS["summaries_computed"] += 1
+
+
+def conversation_stats() -> dict[str, Any]:
+    return {
+        **_STATS,
+        "cached_summaries": len(_SUMMARY_CACHE),
+        "pending_summaries": len(_PENDING_SUMMARIES),
+    }
+
+
+def build_conversation_assembler(
+    settings: Settings, client: Any | None
+) -> ConversationAssembler:
+    return ConversationAssembler(
+        client if settings.history_summary_enabled else None,
+        model=settings.history_summary_model or settings.gemini_model,
+        estimator=TokenEstimator(settings.embedding_chars_per_token),
+        summary_wait=settings.history_summary_first_wait_ms / 1000,
+    )
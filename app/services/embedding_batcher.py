@@ -0,0 +1,110 @@
+"""Micro-batching of concurrent single-text embedding requests.
+
+Under load every `/rag-chat` request and semantic tool call embeds one
+query with its own `embed_content` request, although the API accepts a
+list. The batcher holds single-text requests for at most `max_wait`
+seconds (or until `max_batch_size` texts are queued), sends one batched
+request and hands each caller its own vector and token usage.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from app.services.token_estimator import EmbeddingUsage
+
+logger = logging.getLogger(__name__)
+
+EmbedManyFn = Callable[
+    [list[str]], Awaitable[tuple[list[list[float]], list[EmbeddingUsage]]]
+]
+
+
+class EmbeddingBatcher:
+    """Coalesces `embed(text)` calls made within one event loop."""
+
+    def __init__(
+        self,
+        embed_many: EmbedManyFn,
+        *,
+        max_batch_size: int,
+        max_wait: float,
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self._embed_many = embed_many
+        self._max_batch_size = max_batch_size
+        self._max_wait = max_wait
+
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+        self.batches = 0
+        self.texts = 0
+        self.max_observed_batch = 0
+        self.failed_batches = 0
+
+    async def embed(self, text: str) -> tuple[list[float], EmbeddingUsage]:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # A shared service may outlive an event loop (tests, scripts);
+            # never mix futures from different loops in one batch.
+            self._loop = loop
+            self._pending = []
+            self._timer = None
+
+        future: asyncio.Future = loop.create_future()
+        self._pending.append((text, future))
+
+        if len(self._pending) >= self._max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self._max_wait, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list[tuple[str, asyncio.Future]]) -> None:
+        self.batches += 1
+        self.texts += len(batch)
+        self.max_observed_batch = max(self.max_observed_batch, len(batch))
+
+        try:
+            vectors, usages = await self._embed_many([text for text, _ in batch])
+        except Exception as e:
+            self.failed_batches += 1
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), vector, usage in zip(batch, vectors, usages, strict=True):
+            # Callers that gave up (cancelled) simply miss their result.
+            if not future.done():
+                future.set_result((vector, usage))
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "max_batch_size": self._max_batch_size,
+            "max_wait_ms": self._max_wait * 1000,
+            "batches": self.batches,
+            "texts": self.texts,
+            "mean_batch_size": self.texts / self.batches if self.batches else 0.0,
+            "max_observed_batch": self.max_observed_batch,
+            "failed_batches": self.failed_batches,
+        }
@@ -0,0 +1,145 @@
+"""Cache for query embeddings.
+
+Users repeat the same short queries ("running shoes", "laptop for gaming")
+and each one used to cost an embedding round trip. Entries are keyed on the
+normalized text plus embedding model and dimension, held in an in-memory
+LRU with a TTL, and optionally mirrored to a `diskcache` directory so a
+fresh instance (e.g. a Cloud Run cold start with a mounted volume) starts
+warm. Memory hits are served inline; diskcache's SQLite reads and writes
+run in a worker thread so they never block the event loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import threading
+import unicodedata
+from typing import Any
+
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class _CountingTTLCache(TTLCache):
+    """TTLCache that counts LRU evictions and TTL expirations."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self.evictions = 0
+        self.expirations = 0
+
+    def popitem(self):
+        item = super().popitem()
+        self.evictions += 1
+        return item
+
+    def expire(self, time=None):
+        expired = super().expire(time)
+        self.expirations += len(expired)
+        return expired
+
+
+def normalize_query(text: str) -> str:
+    """Case-fold, NFKC-normalize and collapse whitespace."""
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+
+class EmbeddingCache:
+    """Two-tier (memory LRU + optional disk) embedding cache with a TTL."""
+
+    def __init__(
+        self,
+        *,
+        max_entries: int,
+        ttl: float,
+        disk_path: str | None = None,
+        disk_size_limit: int = 256 * 1024 * 1024,
+    ):
+        self._ttl = ttl
+        self._memory = _CountingTTLCache(maxsize=max_entries, ttl=ttl)
+        self._lock = threading.Lock()
+        self._disk = None
+        if disk_path:
+            try:
+                # Imported lazily: the disk tier is optional.
+                import diskcache
+
+                self._disk = diskcache.Cache(disk_path, size_limit=disk_size_limit)
+            except Exception:
+                logger.exception(
+                    f"Embedding disk cache unavailable at {disk_path}; memory only"
+                )
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(text: str, *, model: str, dim: int) -> str:
+        raw = f"{model}\x00{dim}\x00{normalize_query(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> list[float] | None:
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self.memory_hits += 1
+                return list(vector)
+
+        if self._disk is not None:
+            try:
+                vector = await asyncio.to_thread(self._disk.get, key)
+            except Exception as e:
+                logger.warning(f"Embedding disk cache read failed: {e}")
+                vector = None
+            if vector is not None:
+                with self._lock:
+                    self._memory[key] = tuple(vector)
+                    self.disk_hits += 1
+                return list(vector)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    async def set(self, key: str, vector: list[float]) -> None:
+        with self._lock:
+            self._memory[key] = tuple(vector)
+        if self._disk is not None:
+            try:
+                await asyncio.to_thread(
+                    self._disk.set, key, list(vector), expire=self._ttl
+                )
+            except Exception as e:
+                logger.warning(f"Embedding disk cache write failed: {e}")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        if self._disk is not None:
+            self._disk.clear()
+
+    def close(self) -> None:
+        if self._disk is not None:
+            self._disk.close()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "size": len(self._memory),
+                "max_entries": self._memory.maxsize,
+                "ttl": self._ttl,
+                "disk_enabled": self._disk is not None,
+                "hits": hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": hits / lookups if lookups else 0.0,
+                "evictions": self._memory.evictions,
+                "expirations": self._memory.expirations,
+            }
@@ -0,0 +1,246 @@
+"""Process-wide registry of long-lived, connection-pooled Gemini clients.
+
+Every `genai.Client` built without explicit HTTP clients opens its own
+connection pool, so creating one per request (or per tool call) pays the
+TCP/TLS handshake every time. The registry owns one pooled client per
+purpose ("chat", "embeddings", "langchain") and counts how many requests
+were served over a reused keep-alive connection. All of its clients send
+through one `GeminiRateLimiter` (see `app.services.rate_limiter`).
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from functools import lru_cache
+from typing import Any, Literal
+
+import httpx
+from google import genai
+from google.genai import types
+
+from app.core.settings import Settings, get_settings
+from app.services.rate_limiter import (
+    GeminiRateLimiter,
+    RateLimitedAsyncTransport,
+    RateLimitedTransport,
+    build_gemini_rate_limiter,
+    get_gemini_rate_limiter,
+)
+
+logger = logging.getLogger(__name__)
+
+ClientPurpose = Literal["chat", "embeddings", "langchain"]
+
+
+class ConnectionStats:
+    """Request / new-connection counters fed by httpx event hooks.
+
+    httpcore reports every fresh TCP connect through the `trace` request
+    extension; any answered request that did not trigger one reused a
+    pooled keep-alive connection.
+    """
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.new_connections = 0
+
+    @property
+    def reused_connections(self) -> int:
+        return max(self.requests - self.new_connections, 0)
+
+    def _on_event(self, event_name: str) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            self.new_connections += 1
+
+    def on_request(self, request: httpx.Request) -> None:
+        request.extensions["trace"] = self._trace
+
+    def on_response(self, response: httpx.Response) -> None:
+        self.requests += 1
+
+    async def on_request_async(self, request: httpx.Request) -> None:
+        request.extensions["trace"] = self._trace_async
+
+    async def on_response_async(self, response: httpx.Response) -> None:
+        self.requests += 1
+
+    def _trace(self, event_name: str, info: dict[str, Any]) -> None:
+        self._on_event(event_name)
+
+    async def _trace_async(self, event_name: str, info: dict[str, Any]) -> None:
+        self._on_event(event_name)
+
+    def snapshot(self) -> dict[str, int | float]:
+        return {
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "reused_connections": self.reused_connections,
+            "reuse_ratio": (
+                self.reused_connections / self.requests if self.requests else 0.0
+            ),
+        }
+
+
+class GeminiClientRegistry:
+    """Owns pooled `genai.Client` instances and shared LangChain chat models."""
+
+    def __init__(
+        self,
+        settings: Settings | None = None,
+        *,
+        rate_limiter: GeminiRateLimiter | None = None,
+    ):
+        self._settings = settings or get_settings()
+        self._rate_limiter = rate_limiter or build_gemini_rate_limiter(self._settings)
+        self._clients: dict[str, genai.Client] = {}
+        self._httpx_clients: list[httpx.Client | httpx.AsyncClient] = []
+        self._stats: dict[str, ConnectionStats] = {}
+        self._chat_models: dict[tuple[str, float, int | None, int | None], Any] = {}
+        self._lock = threading.Lock()
+
+    def _limits(self) -> httpx.Limits:
+        pool_size = self._settings.gemini_http_pool_size
+        return httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=self._settings.gemini_http_keepalive_expiry,
+        )
+
+    @property
+    def rate_limiter(self) -> GeminiRateLimiter | None:
+        return self._rate_limiter
+
+    def _transports(
+        self, limits: httpx.Limits
+    ) -> tuple[httpx.BaseTransport, httpx.AsyncBaseTransport]:
+        # httpx ignores `limits=` once a transport is given, so the pool
+        # limits go on the inner transports.
+        sync_transport: httpx.BaseTransport = httpx.HTTPTransport(limits=limits)
+        async_transport: httpx.AsyncBaseTransport = httpx.AsyncHTTPTransport(
+            limits=limits
+        )
+        if self._rate_limiter is not None:
+            options = {
+                "max_retries": self._settings.gemini_rate_limit_max_retries,
+                "output_allowance": self._settings.gemini_rate_limit_output_tokens,
+            }
+            sync_transport = RateLimitedTransport(
+                sync_transport, self._rate_limiter, **options
+            )
+            async_transport = RateLimitedAsyncTransport(
+                async_transport, self._rate_limiter, **options
+            )
+        return sync_transport, async_transport
+
+    def _build_client(self, purpose: str) -> genai.Client:
+        if not self._settings.gemini_api_key:
+            raise RuntimeError("GEMINI_API_KEY is not configured")
+
+        stats = ConnectionStats()
+        sync_transport, async_transport = self._transports(self._limits())
+        # Both sync and async paths go through our own httpx clients so they
+        # share the configured pool limits, the rate limiter and report
+        # reuse counters.
+        sync_client = httpx.Client(
+            transport=sync_transport,
+            timeout=None,
+            event_hooks={
+                "request": [stats.on_request],
+                "response": [stats.on_response],
+            },
+        )
+        async_client = httpx.AsyncClient(
+            transport=async_transport,
+            timeout=None,
+            event_hooks={
+                "request": [stats.on_request_async],
+                "response": [stats.on_response_async],
+            },
+        )
+        self._httpx_clients.extend([sync_client, async_client])
+        self._stats[purpose] = stats
+
+        # Recommended google-genai usage: instantiate a client.
+        # Ref: https://pypi.org/project/google-genai/
+        return genai.Client(
+            api_key=self._settings.gemini_api_key,
+            http_options=types.HttpOptions(
+                httpx_client=sync_client,
+                httpx_async_client=async_client,
+            ),
+        )
+
+    def client(self, purpose: ClientPurpose = "chat") -> genai.Client:
+        with self._lock:
+            client = self._clients.get(purpose)
+            if client is None:
+                client = self._build_client(purpose)
+                self._clients[purpose] = client
+                logger.info(f"Created pooled Gemini client for {purpose}")
+            return client
+
+    def langchain_chat_model(
+        self,
+        *,
+        model: str | None = None,
+        temperature: float = 0.1,
+        max_output_tokens: int | None = None,
+        thinking_budget: int | None = None,
+    ):
+        """Shared `ChatGoogleGenerativeAI` backed by the pooled "langchain" client."""
+        # Imported lazily: only the ad agent needs LangChain.
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        model = model or self._settings.gemini_model
+        key = (model, temperature, max_output_tokens, thinking_budget)
+        llm = self._chat_models.get(key)
+        if llm is not None:
+            return llm
+
+        shared_client = self.client("langchain")
+        with self._lock:
+            llm = self._chat_models.get(key)
+            if llm is None:
+                llm = ChatGoogleGenerativeAI(
+                    model=model,
+                    temperature=temperature,
+                    max_output_tokens=max_output_tokens,
+                    thinking_budget=thinking_budget,
+                    api_key=self._settings.gemini_api_key,
+                )
+                # ChatGoogleGenerativeAI always builds its own genai.Client;
+                # swap in the pooled one so agent calls reuse connections.
+                llm.client = shared_client
+                self._chat_models[key] = llm
+        return llm
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "pool_size": self._settings.gemini_http_pool_size,
+            "keepalive_expiry": self._settings.gemini_http_keepalive_expiry,
+            "clients": {
+                purpose: stats.snapshot()
+                for purpose, stats in self._stats.items()
+            },
+        }
+
+    async def aclose(self) -> None:
+        for http_client in self._httpx_clients:
+            try:
+                if isinstance(http_client, httpx.AsyncClient):
+                    await http_client.aclose()
+                else:
+                    http_client.close()
+            except Exception:
+                logger.warning("Failed to close pooled Gemini HTTP client")
+        self._httpx_clients.clear()
+        self._clients.clear()
+        self._chat_models.clear()
+
+
+@lru_cache
+def get_gemini_client_registry() -> GeminiClientRegistry:
+    return GeminiClientRegistry(
+        settings=get_settings(), rate_limiter=get_gemini_rate_limiter()
+    )
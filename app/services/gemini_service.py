@@ -2,15 +2,51 @@ from __future__ import annotations
 
 import asyncio
 import logging
-import math
 import time
+from collections.abc import AsyncIterator
+from functools import lru_cache
+from typing import Any
 
-from google import genai
 from google.genai import types
-from tenacity import retry, stop_after_attempt, wait_exponential_jitter
+from tenacity import (
+    retry,
+    retry_if_not_exception_type,
+    stop_after_attempt,
+    wait_exponential_jitter,
+)
 
+from app.core import deadline
 from app.core.settings import Settings, get_settings
 from app.models.chat import ChatMessage
+from app.services.circuit_breaker import (
+    GEMINI_EMBEDDINGS,
+    GEMINI_GENERATION,
+    CircuitBreakers,
+    CircuitOpenError,
+    build_circuit_breakers,
+    get_circuit_breakers,
+)
+from app.services.conversation import HistoryBudget, build_conversation_assembler
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.embedding_cache import EmbeddingCache
+from app.services.gemini_clients import (
+    GeminiClientRegistry,
+    get_gemini_client_registry,
+)
+from app.services.hedging import build_hedger
+from app.services.model_router import (
+    ModelRouter,
+    ModelTier,
+    build_model_router,
+    get_model_router,
+)
+from app.services.rate_limiter import (
+    Priority,
+    RateLimitQueueFull,
+    is_queue_full,
+    request_priority,
+)
+from app.services.token_estimator import EmbeddingUsage, TokenEstimator
 
 logger = logging.getLogger(__name__)
 
@@ -19,17 +55,67 @@ _DEFAULT_CHAT_SYSTEM_PROMPT = (
     "that starts with '\n\n----------------\n' (sponsored separator block)."
 )
 
+# Upper bound on background count_tokens calls in "exact" accounting mode;
+# beyond it calibration samples are skipped rather than queued.
+_MAX_PENDING_EXACT_COUNTS = 16
+
 
 class GeminiService:
-    def __init__(self, settings: Settings | None = None):
+    def __init__(
+        self,
+        settings: Settings | None = None,
+        *,
+        clients: GeminiClientRegistry | None = None,
+        router: ModelRouter | None = None,
+        breakers: CircuitBreakers | None = None,
+    ):
         self._settings = settings or get_settings()
 
         if not self._settings.gemini_api_key:
             raise RuntimeError("GEMINI_API_KEY is not configured")
 
-        # Recommended google-genai usage: instantiate a client.
-        # Ref: https://pypi.org/project/google-genai/
-        self._client = genai.Client(api_key=self._settings.gemini_api_key)
+        # Pooled, long-lived clients; a private registry when none is shared.
+        self._clients = clients or GeminiClientRegistry(self._settings)
+        self._client = self._clients.client("chat")
+        self._embed_client = self._clients.client("embeddings")
+        self._router = router or build_model_router(self._settings)
+        breakers = breakers or build_circuit_breakers(self._settings)
+        self._generation_breaker = breakers.get(GEMINI_GENERATION)
+        self._embedding_breaker = breakers.get(GEMINI_EMBEDDINGS)
+
+        self._conversation = build_conversation_assembler(
+            self._settings, self._client
+        )
+        self._history_budget = HistoryBudget(
+            max_tokens=self._settings.history_token_budget_chat
+        )
+
+        self._token_estimator = TokenEstimator(
+            self._settings.embedding_chars_per_token
+        )
+        self._exact_count_tasks: set[asyncio.Task] = set()
+        self._exact_count_failures = 0
+
+        self._embedding_cache: EmbeddingCache | None = None
+        if self._settings.embedding_cache_size > 0:
+            self._embedding_cache = EmbeddingCache(
+                max_entries=self._settings.embedding_cache_size,
+                ttl=self._settings.embedding_cache_ttl,
+                disk_path=self._settings.embedding_cache_dir,
+                disk_size_limit=self._settings.embedding_cache_disk_size_limit,
+            )
+
+        # Duplicates slow chat generations (GEMINI_HEDGE_ENABLED).
+        self._hedger = build_hedger(self._settings)
+
+        # Coalesces concurrent single-query embeddings into one request.
+        self._embedding_batcher: EmbeddingBatcher | None = None
+        if not self._settings.embedding_batch_bypass:
+            self._embedding_batcher = EmbeddingBatcher(
+                self._embed_per_text,
+                max_batch_size=self._settings.embedding_batch_max_size,
+                max_wait=self._settings.embedding_batch_max_wait_ms / 1000,
+            )
 
     @staticmethod
     def _extract_total_tokens(usage: object | None) -> int:
@@ -37,13 +123,28 @@ class GeminiService:
             return 0
         return getattr(usage, "total_token_count", 0)
 
-    async def generate_chat_response(
+    @staticmethod
+    def _extract_embedding_tokens(embeddings: list[Any]) -> list[int] | None:
+        """Per-embedding `statistics.token_count`, if every item has one."""
+        counts: list[int] = []
+        for emb in embeddings:
+            statistics = getattr(emb, "statistics", None)
+            token_count = getattr(statistics, "token_count", None)
+            if token_count is None:
+                return None
+            counts.append(int(token_count))
+        return counts
+
+    async def _build_chat_contents(
             self,
             message: str,
             history: list[ChatMessage]
-            ):
+            ) -> list[types.Content]:
         contents: list[types.Content] = []
 
+        history = (
+            await self._conversation.assemble(history, self._history_budget)
+        ).messages
         for msg in history:
             role = msg.role
             if role not in {"user", "model"}:
@@ -60,40 +161,140 @@ class GeminiService:
                 parts=[types.Part.from_text(text=message)]
             )
         )
+        return contents
 
+    def _chat_config(self, tier: ModelTier) -> types.GenerateContentConfig:
         system_prompt = (
             self._settings.gemini_chat_system_prompt
             or _DEFAULT_CHAT_SYSTEM_PROMPT
         )
+        return types.GenerateContentConfig(
+            system_instruction=system_prompt, **tier.config_overrides()
+        )
 
-        def _send() -> tuple[str, float, int]:
-            start_time = time.perf_counter()
+    async def generate_chat_response(
+            self,
+            message: str,
+            history: list[ChatMessage],
+            *,
+            route: str = "chat",
+            ):
+        contents = await self._build_chat_contents(message, history)
 
-            response = self._client.models.generate_content(
-                model=self._settings.gemini_model,
-                contents=contents,
-                config=types.GenerateContentConfig(
-                    system_instruction=system_prompt,
+        async def _generate(tier: ModelTier):
+            config = self._chat_config(tier)
+
+            def _call():
+                # Native async SDK surface: no worker thread per in-flight call.
+                return self._client.aio.models.generate_content(
+                    model=tier.model,
+                    contents=contents,
+                    config=config,
+                )
+
+            if self._hedger is not None:
+                response, _ = await self._hedger.run(_call)
+                return response
+            return await _call()
+
+        start_time = time.perf_counter()
+        try:
+            response, _ = await deadline.bounded(
+                self._generation_breaker.call(
+                    lambda: self._router.run(route, _generate),
+                    is_cancel=is_queue_full,
                 ),
+                what="chat generation",
             )
+        except CircuitOpenError:
+            raise
+        except Exception:
+            logger.exception("Gemini request failed")
+            raise
+
+        end_time = time.perf_counter()
+        generation_time = end_time - start_time
 
-            end_time = time.perf_counter()
-            generation_time = end_time - start_time
+        usage = getattr(response, "usage_metadata", None)
+        used_tokens = self._extract_total_tokens(usage)
 
-            usage = getattr(response, "usage_metadata", None)
-            used_tokens = self._extract_total_tokens(usage)
+        text = getattr(response, "text", None)
+        if isinstance(text, str) and text.strip():
+            return (text, generation_time, used_tokens)
+        return (str(response), generation_time, used_tokens)
 
-            text = getattr(response, "text", None)
-            if isinstance(text, str) and text.strip():
-                return (text, generation_time, used_tokens)
-            return (str(response), generation_time, used_tokens)
+    async def stream_chat_response(
+            self,
+            message: str,
+            history: list[ChatMessage],
+            *,
+            route: str = "chat",
+            ) -> AsyncIterator[dict[str, Any]]:
+        """
+        Stream a chat generation as it is produced.
+
+        Yields `{"type": "token", "text": ...}` for every non-empty chunk and
+        finishes with `{"type": "done", "generation_time", "time_to_first_token",
+        "used_tokens", "model"}`. Usage metadata is cumulative, so the last
+        chunk that carries it holds the total. Streams do not fall back to
+        another tier once started.
+        """
+        contents = await self._build_chat_contents(message, history)
+        deadline.check("chat stream")
+        self._generation_breaker.before_call()
+        tier = self._router.select(route)[0]
 
+        start_time = time.perf_counter()
+        time_to_first_token: float | None = None
+        used_tokens = 0
         try:
-            return await asyncio.to_thread(_send)
-        except Exception:
-            logger.exception("Gemini request failed")
+            stream = await self._client.aio.models.generate_content_stream(
+                model=tier.model,
+                contents=contents,
+                config=self._chat_config(tier),
+            )
+            async for chunk in stream:
+                usage = getattr(chunk, "usage_metadata", None)
+                if usage is not None:
+                    used_tokens = self._extract_total_tokens(usage) or used_tokens
+
+                text = getattr(chunk, "text", None)
+                if not text:
+                    continue
+                if time_to_first_token is None:
+                    time_to_first_token = time.perf_counter() - start_time
+                yield {"type": "token", "text": text}
+        except RateLimitQueueFull:
+            # Local back-pressure: no verdict on Gemini or on the tier.
+            self._generation_breaker.on_cancel()
+            raise
+        except Exception as e:
+            self._generation_breaker.on_failure(e)
+            self._router.record(
+                route, tier.model, time.perf_counter() - start_time, ok=False
+            )
+            logger.exception("Gemini streaming request failed")
+            raise
+        except BaseException:
+            # Cancelled or closed by the consumer: no verdict on Gemini.
+            self._generation_breaker.on_cancel()
             raise
 
+        self._generation_breaker.on_success()
+        generation_time = time.perf_counter() - start_time
+        self._router.record(route, tier.model, generation_time, ok=True)
+        yield {
+            "type": "done",
+            "generation_time": generation_time,
+            "time_to_first_token": (
+                time_to_first_token
+                if time_to_first_token is not None
+                else generation_time
+            ),
+            "used_tokens": used_tokens,
+            "model": tier.model,
+        }
+
     async def embed_texts(self, texts: list[str]) -> list[list[float]]:
         vectors, _ = await self.embed_texts_with_usage(texts)
         return vectors
@@ -102,18 +303,43 @@ class GeminiService:
         self,
         texts: list[str],
     ) -> tuple[list[list[float]], int]:
+        vectors, usage = await self.embed_texts_with_usage_details(texts)
+        return vectors, usage.tokens
+
+    async def embed_texts_with_usage_details(
+        self,
+        texts: list[str],
+    ) -> tuple[list[list[float]], EmbeddingUsage]:
+        """
+        Embed `texts` and report token usage without a second round trip.
+
+        Usage comes from the embed response metadata when the API returns it,
+        otherwise from the calibrated local estimator (`usage.estimated`).
+        """
         if not texts:
-            return ([], 0)
+            return ([], EmbeddingUsage(tokens=0, estimated=False))
 
+        vectors, usages = await self._embed_per_text(texts)
+        return vectors, EmbeddingUsage(
+            tokens=sum(u.tokens for u in usages),
+            estimated=any(u.estimated for u in usages),
+        )
+
+    async def _embed_per_text(
+        self,
+        texts: list[str],
+    ) -> tuple[list[list[float]], list[EmbeddingUsage]]:
+        """One embed_content request for `texts`, with usage per text."""
         expected_dim = int(self._settings.gemini_embedding_dim)
 
         @retry(
             stop=stop_after_attempt(4),
             wait=wait_exponential_jitter(initial=1, max=20),
+            retry=retry_if_not_exception_type(RateLimitQueueFull),
             reraise=True,
         )
-        def _embed() -> tuple[list[list[float]], int]:
-            response = self._client.models.embed_content(
+        async def _embed() -> tuple[list[list[float]], list[int] | None]:
+            response = await self._embed_client.aio.models.embed_content(
                 model=self._settings.gemini_embedding_model,
                 contents=texts,
                 config=types.EmbedContentConfig(
@@ -147,24 +373,135 @@ class GeminiService:
                     expected {len(texts)}"
                 )
 
-            try:
-                count_response = self._client.models.count_tokens(
-                    model=self._settings.gemini_embedding_model,
-                    contents=texts,
-                )
-                used_tokens = getattr(count_response, "total_tokens", 0) or 0
-            except Exception as e:
-                logger.warning(f"Failed to count tokens for embeddings: {e}")
-                used_tokens = 0
-
-            return (vectors, used_tokens)
+            return (vectors, self._extract_embedding_tokens(embeddings))
 
         try:
-            return await asyncio.to_thread(_embed)
+            # An open breaker fails fast instead of waiting out the retries.
+            vectors, metadata_tokens = await self._embedding_breaker.call(
+                _embed, is_cancel=is_queue_full
+            )
+        except CircuitOpenError:
+            raise
         except Exception:
             logger.exception("Gemini embeddings request failed")
             raise
 
+        if metadata_tokens is not None:
+            self._token_estimator.observe(texts, sum(metadata_tokens))
+            return vectors, [
+                EmbeddingUsage(tokens=tokens, estimated=False)
+                for tokens in metadata_tokens
+            ]
+
+        if self._settings.embedding_token_accounting == "exact":
+            self._schedule_exact_count(texts)
+        return vectors, [
+            EmbeddingUsage(
+                tokens=self._token_estimator.estimate([text]), estimated=True
+            )
+            for text in texts
+        ]
+
+    def _schedule_exact_count(self, texts: list[str]) -> None:
+        """Run count_tokens off the request path to calibrate the estimator."""
+        if len(self._exact_count_tasks) >= _MAX_PENDING_EXACT_COUNTS:
+            return
+        # Calibration is never worth delaying interactive calls for.
+        with request_priority(Priority.BACKGROUND):
+            task = asyncio.create_task(self._count_exact(list(texts)))
+        self._exact_count_tasks.add(task)
+        task.add_done_callback(self._exact_count_tasks.discard)
+
+    async def _count_exact(self, texts: list[str]) -> None:
+        try:
+            count_response = await self._embed_client.aio.models.count_tokens(
+                model=self._settings.gemini_embedding_model,
+                contents=texts,
+            )
+            exact_tokens = getattr(count_response, "total_tokens", 0) or 0
+        except Exception as e:
+            self._exact_count_failures += 1
+            logger.warning(f"Failed to count tokens for embeddings: {e}")
+            return
+        self._token_estimator.observe(texts, exact_tokens)
+
+    def token_accounting_stats(self) -> dict[str, Any]:
+        return {
+            "mode": self._settings.embedding_token_accounting,
+            **self._token_estimator.stats(),
+            "exact_counts_pending": len(self._exact_count_tasks),
+            "exact_count_failures": self._exact_count_failures,
+        }
+
     async def embed_text_with_usage(self, text: str) -> tuple[list[float], int]:
-        vectors, used_tokens = await self.embed_texts_with_usage([text])
-        return vectors[0], used_tokens
+        vector, usage = await self.embed_text_with_usage_details(text)
+        return vector, usage.tokens
+
+    async def embed_text_with_usage_details(
+        self, text: str
+    ) -> tuple[list[float], EmbeddingUsage]:
+        """
+        Embed a single query, served from the embedding cache when possible.
+
+        Misses go through the micro-batcher (unless bypassed), which reports
+        each caller's own token usage.
+        """
+        cache = self._embedding_cache
+        if cache is None:
+            return await self._embed_one(text)
+
+        key = cache.key(
+            text,
+            model=self._settings.gemini_embedding_model,
+            dim=int(self._settings.gemini_embedding_dim),
+        )
+        vector = await cache.get(key)
+        if vector is not None:
+            return vector, EmbeddingUsage(tokens=0, estimated=False, cached=True)
+
+        vector, usage = await self._embed_one(text)
+        await cache.set(key, vector)
+        return vector, usage
+
+    async def _embed_one(self, text: str) -> tuple[list[float], EmbeddingUsage]:
+        # Query embeddings only feed optional steps (retrieval, cache
+        # lookups), so they leave the answer's share of the budget alone.
+        return await deadline.bounded(
+            self._embed_one_unbounded(text),
+            reserve=self._settings.deadline_reserve,
+            what="query embedding",
+        )
+
+    async def _embed_one_unbounded(
+        self, text: str
+    ) -> tuple[list[float], EmbeddingUsage]:
+        if self._embedding_batcher is not None:
+            return await self._embedding_batcher.embed(text)
+        vectors, usages = await self._embed_per_text([text])
+        return vectors[0], usages[0]
+
+    def embedding_cache_stats(self) -> dict[str, Any] | None:
+        if self._embedding_cache is None:
+            return None
+        return self._embedding_cache.stats()
+
+    def embedding_batcher_stats(self) -> dict[str, Any] | None:
+        if self._embedding_batcher is None:
+            return None
+        return self._embedding_batcher.stats()
+
+    def hedging_stats(self) -> dict[str, Any] | None:
+        if self._hedger is None:
+            return None
+        return self._hedger.stats()
+
+
+@lru_cache
+def get_gemini_service() -> GeminiService:
+    """Process-wide GeminiService shared by the API and in-process MCP tools."""
+    return GeminiService(
+        settings=get_settings(),
+        clients=get_gemini_client_registry(),
+        router=get_model_router(),
+        breakers=get_circuit_breakers(),
+    )
@@ -0,0 +1,153 @@
+"""Hedged requests for Gemini generations.
+
+A small share of generations is much slower than the rest, and those slow
+calls set the endpoint p99. When a call has not returned within a tracked
+percentile of recent latencies, the hedger sends one duplicate. It keeps
+whichever finishes first and cancels the other. The share of hedged calls
+is capped so that duplicates stay a bounded extra cost.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from typing import Any, TypeVar
+
+import numpy as np
+
+from app.core.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class Hedger:
+    """Runs a call and, past the latency percentile, one duplicate of it."""
+
+    def __init__(
+        self,
+        *,
+        percentile: float = 95.0,
+        min_samples: int = 20,
+        min_delay: float = 0.5,
+        max_hedge_rate: float = 0.05,
+        window: int = 200,
+        clock: Callable[[], float] = time.perf_counter,
+    ):
+        self._percentile = percentile
+        self._min_samples = min_samples
+        self._min_delay = min_delay
+        self._max_hedge_rate = max_hedge_rate
+        self._clock = clock
+        self._latencies: deque[float] = deque(maxlen=window)
+        # One flag per recent call (True = hedged) for the rate cap.
+        self._recent_hedges: deque[bool] = deque(maxlen=window)
+
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.suppressed = 0
+
+    def hedge_delay(self) -> float | None:
+        """Seconds to wait before hedging; None until enough samples exist."""
+        if len(self._latencies) < self._min_samples:
+            return None
+        threshold = float(np.percentile(self._latencies, self._percentile))
+        return max(threshold, self._min_delay)
+
+    def _hedge_allowed(self) -> bool:
+        calls = len(self._recent_hedges) + 1
+        return (sum(self._recent_hedges) + 1) / calls <= self._max_hedge_rate
+
+    async def _timed(self, fn: Callable[[], Awaitable[T]]) -> tuple[T, float]:
+        started = self._clock()
+        result = await fn()
+        return result, self._clock() - started
+
+    async def run(self, fn: Callable[[], Awaitable[T]]) -> tuple[T, bool]:
+        """Return `(result, won_by_hedge)`."""
+        self.requests += 1
+        delay = self.hedge_delay()
+        primary = asyncio.ensure_future(self._timed(fn))
+        try:
+            if delay is not None:
+                await asyncio.wait({primary}, timeout=delay)
+            if delay is None or primary.done():
+                self._recent_hedges.append(False)
+                result, latency = await primary
+                self._latencies.append(latency)
+                return result, False
+
+            if not self._hedge_allowed():
+                self.suppressed += 1
+                self._recent_hedges.append(False)
+                result, latency = await primary
+                self._latencies.append(latency)
+                return result, False
+
+            self.hedges += 1
+            self._recent_hedges.append(True)
+            hedge = asyncio.ensure_future(self._timed(fn))
+            return await self._first_success(primary, hedge)
+        finally:
+            if not primary.done():
+                primary.cancel()
+
+    async def _first_success(
+        self, primary: asyncio.Future, hedge: asyncio.Future
+    ) -> tuple[Any, bool]:
+        pending = {primary, hedge}
+        error: BaseException | None = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                # Prefer the primary when both finished in the same tick.
+                for future in sorted(done, key=lambda f: f is not primary):
+                    if future.exception() is not None:
+                        error = error or future.exception()
+                        continue
+                    result, latency = future.result()
+                    self._latencies.append(latency)
+                    won_by_hedge = future is hedge
+                    if won_by_hedge:
+                        self.hedge_wins += 1
+                    return result, won_by_hedge
+            assert error is not None
+            raise error
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "enabled": True,
+            "percentile": self._percentile,
+            "hedge_delay": self.hedge_delay(),
+            "max_hedge_rate": self._max_hedge_rate,
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "hedge_rate": self.hedges / self.requests if self.requests else 0.0,
+            "hedge_wins": self.hedge_wins,
+            "won_by_hedge_ratio": (
+                self.hedge_wins / self.hedges if self.hedges else 0.0
+            ),
+            "suppressed": self.suppressed,
+        }
+
+
+def build_hedger(settings: Settings) -> Hedger | None:
+    if not settings.gemini_hedge_enabled:
+        return None
+    return Hedger(
+        percentile=settings.gemini_hedge_percentile,
+        min_samples=settings.gemini_hedge_min_samples,
+        min_delay=settings.gemini_hedge_min_delay,
+        max_hedge_rate=settings.gemini_hedge_max_rate,
+        window=settings.gemini_hedge_window,
+    )
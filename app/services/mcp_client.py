@@ -1,17 +1,254 @@
+import asyncio
+import logging
 import os
 import sys
-from contextlib import asynccontextmanager
-from typing import Any, AsyncGenerator
+import time
+from contextlib import AbstractAsyncContextManager, asynccontextmanager
+from typing import Any, AsyncGenerator, Callable
 
+import anyio
 from mcp import ClientSession, StdioServerParameters
+from mcp import types as mcp_types
 from mcp.client.stdio import stdio_client
+from mcp.shared.exceptions import McpError
+from mcp.shared.memory import create_connected_server_and_client_session
+
+from app.core.settings import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+# Upper bound for subprocess start + MCP initialize handshake.
+_SPAWN_TIMEOUT = 30.0
+
+# Borrower errors that leave the session itself unusable. A cancelled
+# borrower returns the slot, which is pinged before its next checkout.
+# Anything else (model errors, deadlines, open circuits) returns the slot.
+_SESSION_ERRORS = (
+    anyio.ClosedResourceError,
+    anyio.BrokenResourceError,
+    anyio.EndOfStream,
+    McpError,
+)
+
+
+class _PooledSession:
+    """
+    One long-lived MCP session owned by a dedicated worker task.
+
+    anyio transports must be entered and exited by the same task, so the
+    worker keeps the session context open until `stop` is set while request
+    handlers only borrow the already-initialized `session`.
+    """
+    def __init__(self) -> None:
+        self.session: ClientSession | None = None
+        self.task: asyncio.Task | None = None
+        self.ready = asyncio.Event()
+        self.stop = asyncio.Event()
+        self.last_used = time.monotonic()
+        # Set when a borrower was cancelled, possibly with a call in flight.
+        self.needs_ping = False
+
+    @property
+    def alive(self) -> bool:
+        return (
+            self.session is not None
+            and self.task is not None
+            and not self.task.done()
+        )
+
+
+class McpSessionPool:
+    """
+    Pool of pre-initialized MCP client sessions.
+
+    Sessions are spawned up front by `start()`, handed out by `acquire()` and
+    returned afterwards. A session is replaced in the background when its
+    worker died, when it fails the idle ping, or when the borrower hit a
+    transport/MCP error. A session whose borrower was cancelled (possibly
+    mid tool call) is pinged before it is handed out again.
+    """
+    def __init__(
+        self,
+        open_session: Callable[[], AbstractAsyncContextManager[ClientSession]],
+        *,
+        size: int,
+        checkout_timeout: float,
+        health_check_interval: float,
+        on_recycle: Callable[[], None] | None = None,
+    ):
+        self._open_session = open_session
+        self._on_recycle = on_recycle
+        self._size = size
+        self._checkout_timeout = checkout_timeout
+        self._health_check_interval = health_check_interval
+        self._available: asyncio.Queue[_PooledSession] | None = None
+        self._slots: set[_PooledSession] = set()
+        self._background: set[asyncio.Task] = set()
+        self._closed = True
+
+    @property
+    def started(self) -> bool:
+        return not self._closed
+
+    async def start(self) -> None:
+        if self.started:
+            return
+        self._closed = False
+        self._available = asyncio.Queue()
+        results = await asyncio.gather(
+            *(self._spawn() for _ in range(self._size))
+        )
+        ready = sum(1 for ok in results if ok)
+        logger.info(f"MCP session pool started: {ready}/{self._size} ready")
+        for ok in results:
+            if not ok:
+                self._schedule(self._respawn())
+
+    async def close(self) -> None:
+        if not self.started:
+            return
+        self._closed = True
+        for task in list(self._background):
+            task.cancel()
+        slots = list(self._slots)
+        for slot in slots:
+            slot.stop.set()
+        tasks = [slot.task for slot in slots if slot.task is not None]
+        if tasks:
+            await asyncio.wait(tasks, timeout=5.0)
+        self._slots.clear()
+        self._available = None
+        logger.info("MCP session pool closed")
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncGenerator[ClientSession, None]:
+        if not self.started or self._available is None:
+            raise RuntimeError("MCP session pool is not started")
+
+        slot = await self._checkout()
+        failed = False
+        try:
+            yield slot.session
+        except _SESSION_ERRORS:
+            failed = True
+            raise
+        except asyncio.CancelledError:
+            slot.needs_ping = True
+            raise
+        finally:
+            slot.last_used = time.monotonic()
+            if failed or self._closed or not slot.alive:
+                self._recycle(slot)
+            else:
+                self._available.put_nowait(slot)
+
+    async def _checkout(self) -> _PooledSession:
+        deadline = time.monotonic() + self._checkout_timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError("Timed out waiting for a pooled MCP session")
+            try:
+                slot = await asyncio.wait_for(
+                    self._available.get(), timeout=remaining
+                )
+            except asyncio.TimeoutError:
+                raise TimeoutError(
+                    "Timed out waiting for a pooled MCP session"
+                ) from None
+
+            if await self._is_healthy(slot):
+                return slot
+            logger.warning("Discarding unhealthy pooled MCP session")
+            self._recycle(slot)
+
+    async def _is_healthy(self, slot: _PooledSession) -> bool:
+        if not slot.alive:
+            return False
+        idle = time.monotonic() - slot.last_used
+        if idle < self._health_check_interval and not slot.needs_ping:
+            return True
+        try:
+            await asyncio.wait_for(slot.session.send_ping(), timeout=2.0)
+        except Exception:
+            return False
+        slot.needs_ping = False
+        return True
+
+    def _recycle(self, slot: _PooledSession) -> None:
+        slot.stop.set()
+        self._slots.discard(slot)
+        if self._on_recycle is not None:
+            self._on_recycle()
+        if not self._closed:
+            self._schedule(self._respawn())
+
+    def _schedule(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _respawn(self) -> None:
+        delay = 0.5
+        while not self._closed:
+            if await self._spawn():
+                return
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+    async def _spawn(self) -> bool:
+        slot = _PooledSession()
+        slot.task = asyncio.create_task(self._run(slot))
+        try:
+            await asyncio.wait_for(slot.ready.wait(), timeout=_SPAWN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.error("Timed out spawning pooled MCP session")
+            slot.task.cancel()
+            return False
+        if not slot.alive:
+            return False
+        if self._closed or self._available is None:
+            slot.stop.set()
+            return False
+        self._slots.add(slot)
+        self._available.put_nowait(slot)
+        return True
+
+    async def _run(self, slot: _PooledSession) -> None:
+        try:
+            async with self._open_session() as session:
+                slot.session = session
+                slot.ready.set()
+                await slot.stop.wait()
+        except Exception:
+            logger.exception("Pooled MCP session terminated unexpectedly")
+        finally:
+            slot.session = None
+            slot.ready.set()
 
 
 class McpClient:
     """
-    Manages the connection to the local MCP server subprocess.
+    Manages the connection to the local MCP server.
+
+    With MCP_TRANSPORT=stdio (default) the server runs as an isolated
+    subprocess; with MCP_TRANSPORT=inprocess the FastMCP instance from
+    `app/mcp/server.py` is served over in-memory streams inside the API
+    process, sharing its DB engine and Gemini client. Both speak MCP, so
+    callers do not care which one is used.
+
+    When the session pool is started (see `start()`, called from the FastAPI
+    lifespan) `session()` borrows a long-lived session; otherwise it falls
+    back to spawning a short-lived subprocess per call.
     """
-    def __init__(self, server_script_path: str = "app/mcp/server.py"):
+    def __init__(
+        self,
+        server_script_path: str = "app/mcp/server.py",
+        *,
+        settings: Settings | None = None,
+    ):
+        self._settings = settings or get_settings()
+
         # Determine the absolute path to the server script
         self.server_script_path = os.path.abspath(server_script_path)
 
@@ -27,20 +264,99 @@ class McpClient:
             env=env
         )
 
+        self._pool = McpSessionPool(
+            self._open_session,
+            size=self._settings.mcp_pool_size,
+            checkout_timeout=self._settings.mcp_pool_checkout_timeout,
+            health_check_interval=self._settings.mcp_pool_health_check_interval,
+            on_recycle=self.invalidate_tools,
+        )
+
+        # Tool catalog cache, valid while `_tools_version` is unchanged.
+        self._tools_version = 0
+        self._tools_cache: tuple[int, list[mcp_types.Tool]] | None = None
+
+    async def start(self) -> None:
+        """Pre-spawn the pooled MCP sessions (no-op when MCP_POOL_SIZE=0)."""
+        if self._settings.mcp_pool_size > 0:
+            await self._pool.start()
+
+    async def close(self) -> None:
+        await self._pool.close()
+
+    @property
+    def transport(self) -> str:
+        return self._settings.mcp_transport
+
+    @property
+    def tools_version(self) -> int:
+        """Bumped whenever the cached tool catalog may be stale."""
+        return self._tools_version
+
+    def invalidate_tools(self) -> None:
+        self._tools_version += 1
+        self._tools_cache = None
+
+    async def list_tools(self, session: ClientSession) -> list[mcp_types.Tool]:
+        """
+        Return the server's tool catalog, calling `tools/list` only when the
+        cache is empty or was invalidated by a tools-changed notification or
+        a recycled session.
+        """
+        cached = self._tools_cache
+        if cached is not None and cached[0] == self._tools_version:
+            return cached[1]
+
+        version = self._tools_version
+        result = await session.list_tools()
+        tools = list(getattr(result, "tools", []))
+        if version == self._tools_version:
+            self._tools_cache = (version, tools)
+        return tools
+
+    async def _handle_message(self, message: Any) -> None:
+        if isinstance(message, mcp_types.ServerNotification) and isinstance(
+            message.root, mcp_types.ToolListChangedNotification
+        ):
+            logger.info("MCP server tool list changed; invalidating cache")
+            self.invalidate_tools()
+
+    @asynccontextmanager
+    async def _open_session(self) -> AsyncGenerator[ClientSession, None]:
+        if self.transport == "inprocess":
+            # Imported lazily: the subprocess mode must not pay for it.
+            from app.mcp.server import mcp as mcp_server
+
+            async with create_connected_server_and_client_session(
+                mcp_server, message_handler=self._handle_message
+            ) as session:
+                yield session
+            return
+
+        # stdio_client handles the process spawning and cleanup
+        async with stdio_client(self.server_params) as (read, write):
+            async with ClientSession(
+                read, write, message_handler=self._handle_message
+            ) as session:
+                # Initialize the connection
+                await session.initialize()
+                yield session
+
     @asynccontextmanager
     async def session(self) -> AsyncGenerator[ClientSession, None]:
         """
-        Context manager that spawns the subprocess and establishes the session.
+        Context manager that yields an initialized MCP session.
         Usage:
             async with client.session() as session:
                 result = await session.call_tool(...)
         """
-        # stdio_client handles the process spawning and cleanup
-        async with stdio_client(self.server_params) as (read, write):
-            async with ClientSession(read, write) as session:
-                # Initialize the connection
-                await session.initialize()
+        if self._pool.started:
+            async with self._pool.acquire() as session:
                 yield session
+            return
+
+        async with self._open_session() as session:
+            yield session
 
     @staticmethod
     def call_tool_result_to_dict(result: Any) -> dict:
@@ -5,17 +5,48 @@ import asyncio
 import json
 import logging
 import time
+import weakref
+from typing import Any
 
-from google import genai
 from google.genai import types
 
+from app.core import deadline
 from app.core.settings import Settings, get_settings
 from app.models.chat import ChatMessage
+from app.services.circuit_breaker import (
+    DB_RETRIEVAL,
+    GEMINI_GENERATION,
+    CircuitBreakers,
+    CircuitOpenError,
+    build_circuit_breakers,
+)
+from app.services.conversation import HistoryBudget, build_conversation_assembler
+from app.services.gemini_clients import GeminiClientRegistry
+from app.services.model_router import (
+    ModelRouter,
+    ModelTier,
+    build_model_router,
+)
 # We import the mcp_client interface, but we will likely inject the server direct connection
 from app.services.mcp_client import McpClient 
+from app.services.rate_limiter import is_queue_full
 
 logger = logging.getLogger(__name__)
 
+_TOOL_CONFIG = types.ToolConfig(
+    function_calling_config=types.FunctionCallingConfig(mode="AUTO")
+)
+# Used once the deadline leaves no room for more tool steps, or while the
+# retrieval circuit is open: the model answers with what it already has.
+_NO_TOOLS_CONFIG = types.ToolConfig(
+    function_calling_config=types.FunctionCallingConfig(mode="NONE")
+)
+
+# Converted Gemini tool per McpClient, tagged with the client's tools_version.
+_GEMINI_TOOL_CACHE: weakref.WeakKeyDictionary[McpClient, tuple[int, types.Tool]] = (
+    weakref.WeakKeyDictionary()
+)
+
 
 class McpService:
     def __init__(
@@ -24,6 +55,9 @@ class McpService:
         settings: Settings | None = None,
         mcp_client: McpClient,
         system_prompt: str | None = None,
+        clients: GeminiClientRegistry | None = None,
+        router: ModelRouter | None = None,
+        breakers: CircuitBreakers | None = None,
     ):
         self._settings = settings or get_settings()
         self._mcp = mcp_client
@@ -32,29 +66,143 @@ class McpService:
             if system_prompt is not None
             else getattr(self._settings, "mcp_system_prompt", None)
         )
-        self._client = genai.Client(api_key=self._settings.gemini_api_key)
+        clients = clients or GeminiClientRegistry(self._settings)
+        self._client = clients.client("chat")
+        self._router = router or build_model_router(self._settings)
+        breakers = breakers or build_circuit_breakers(self._settings)
+        self._generation_breaker = breakers.get(GEMINI_GENERATION)
+        # The ad tools are all backed by DB retrieval. With the inprocess
+        # transport they report to this same breaker; stdio tool servers run
+        # their own per-process breakers, which this process never sees.
+        self._tools_breaker = breakers.get(DB_RETRIEVAL)
+        self._conversation = build_conversation_assembler(
+            self._settings, self._client
+        )
+        self._history_budget = HistoryBudget(
+            max_tokens=self._settings.history_token_budget_mcp
+        )
 
     @staticmethod
     def _extract_total_tokens(usage: object) -> int:
         return getattr(usage, "total_token_count", 0)
 
+    async def _get_gemini_tool(self, mcp_session) -> types.Tool:
+        """Build (once per tools_version) the Gemini tool for the MCP catalog."""
+        version = self._mcp.tools_version
+        cached = _GEMINI_TOOL_CACHE.get(self._mcp)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        tools = await self._mcp.list_tools(mcp_session)
+        gemini_tool = types.Tool(function_declarations=[
+            types.FunctionDeclaration(
+                name=t.name,
+                description=t.description,
+                parameters=t.inputSchema or {"type": "object", "properties": {}}
+            )
+            for t in tools
+        ])
+        _GEMINI_TOOL_CACHE[self._mcp] = (version, gemini_tool)
+        return gemini_tool
+
+    async def _call_tool(
+        self,
+        mcp_session,
+        call: types.FunctionCall,
+    ) -> tuple[types.Part, int, float]:
+        """
+        Run one MCP tool call and convert it to a Gemini function response.
+
+        Returns (function_response_part, embedding_tokens, elapsed_seconds).
+        Errors and timeouts are reported back to the model, never raised.
+        """
+        call_start = time.perf_counter()
+        timeout = deadline.timeout_for(
+            self._settings.mcp_tool_timeout, self._settings.deadline_reserve
+        )
+        embedding_tokens = 0
+        try:
+            # Call the tool via MCP
+            result = await asyncio.wait_for(
+                mcp_session.call_tool(call.name, arguments=call.args),
+                timeout=timeout,
+            )
+            # Parse result content (MCP returns a list of text/image content)
+            # We flatten it to a single string for the LLM
+            content_text = ""
+            if hasattr(result, 'content') and isinstance(result.content, list):
+                for item in result.content:
+                    item_text = getattr(item, "text", None)
+                    if not isinstance(item_text, str):
+                        continue
+                    try:
+                        payload = json.loads(item_text)
+                    except json.JSONDecodeError:
+                        continue
+                    if isinstance(payload, dict):
+                        embedding_tokens += int(payload.get("embedding_tokens", 0) or 0)
+                content_text = "\n".join([c.text for c in result.content if hasattr(c, 'text')])
+            else:
+                content_text = str(result)
+
+            # Create the function response part
+            part = types.Part.from_function_response(
+                name=call.name,
+                response={"result": content_text}
+            )
+        except asyncio.TimeoutError:
+            logger.error(f"Tool {call.name} timed out after {timeout:.1f}s")
+            part = types.Part.from_function_response(
+                name=call.name,
+                response={"error": f"Tool timed out after {timeout:.1f}s"}
+            )
+        except Exception as e:
+            logger.error(f"Tool error: {e}")
+            part = types.Part.from_function_response(
+                name=call.name,
+                response={"error": str(e)}
+            )
+        return (part, embedding_tokens, time.perf_counter() - call_start)
+
     async def answer(
         self,
         *,
         message: str,
         history: list[ChatMessage],
         max_tool_steps: int = 6,
-    ) -> tuple[str, float, int, dict[str, float | int]]:
+    ) -> tuple[str, float, int, dict[str, Any]]:
 
         start_time = time.perf_counter()
         total_tokens = 0
         embedding_tokens = 0
         llm_call_count = 0
         tool_call_count = 0
+        tool_steps: list[dict[str, float | int]] = []
+        models: dict[str, str] = {}
+        deadline_degraded = False
+        circuit_degraded = not self._tools_breaker.available()
+        if circuit_degraded:
+            logger.warning("MCP: retrieval circuit open; answering without tools")
+
+        def _breakdown() -> dict[str, Any]:
+            return {
+                "deadline_degraded": deadline_degraded,
+                "circuit_degraded": circuit_degraded,
+                "models": dict(models),
+                "llm_call_count": llm_call_count,
+                "tool_call_count": tool_call_count,
+                "embedding_tokens": embedding_tokens,
+                "tool_wall_time": sum(s["wall_time"] for s in tool_steps),
+                "tool_summed_time": sum(s["summed_time"] for s in tool_steps),
+                "tool_steps": tool_steps,
+            }
 
         contents: list[types.Content] = []
+        history = (
+            await self._conversation.assemble(history, self._history_budget)
+        ).messages
         for msg in history:
-            role = "model" if msg.role == "assistant" else "user"
+            role = "model" if msg.role in {"assistant", "model"} else "user"
             contents.append(types.Content(role=role, parts=[types.Part.from_text(text=part) for part in msg.parts]))
 
         contents.append(types.Content(role="user", parts=[types.Part.from_text(text=message)]))
@@ -63,35 +211,43 @@ class McpService:
             # Connect to MCP Session
             async with self._mcp.session() as mcp_session:
 
-                tools_result = await mcp_session.list_tools()
-                gemini_tools = []
-
-                for t in getattr(tools_result, "tools", []):
-                    gemini_tools.append(types.FunctionDeclaration(
-                        name=t.name,
-                        description=t.description,
-                        parameters=t.inputSchema or {"type": "object", "properties": {}}
-                    ))
-
-                tool_config = types.ToolConfig(
-                    function_calling_config=types.FunctionCallingConfig(
-                        mode="AUTO"
-                    )
-                )
+                gemini_tool = await self._get_gemini_tool(mcp_session)
 
                 # 3. Execution Loop
                 for i in range(max_tool_steps):
-                    # Generate Content
-                    response = await asyncio.to_thread(
-                        self._client.models.generate_content,
-                        model=self._settings.gemini_model,
-                        contents=contents,
-                        config=types.GenerateContentConfig(
-                            system_instruction=self._system_prompt,
-                            tools=[types.Tool(function_declarations=gemini_tools)],
-                            tool_config=tool_config,
+                    # Steps before any tool result plan; later ones answer.
+                    stage = "mcp.answer" if tool_steps else "mcp.plan"
+                    out_of_budget = bool(tool_steps) and not deadline.has_budget(
+                        self._settings.deadline_reserve
+                    )
+                    if out_of_budget:
+                        deadline_degraded = True
+                        logger.warning("MCP: deadline close; answering without more tools")
+                    no_tools = out_of_budget or circuit_degraded
+
+                    async def _generate(tier: ModelTier):
+                        return await self._client.aio.models.generate_content(
+                            model=tier.model,
+                            contents=contents,
+                            config=types.GenerateContentConfig(
+                                system_instruction=self._system_prompt,
+                                tools=[gemini_tool],
+                                tool_config=(
+                                    _NO_TOOLS_CONFIG if no_tools else _TOOL_CONFIG
+                                ),
+                                **tier.config_overrides(),
+                            )
                         )
+
+                    # Generate Content
+                    response, tier = await deadline.bounded(
+                        self._generation_breaker.call(
+                            lambda: self._router.run(stage, _generate),
+                            is_cancel=is_queue_full,
+                        ),
+                        what="MCP step",
                     )
+                    models[stage] = tier.model
                     llm_call_count += 1
 
                     # Accumulate token usage across all loop iterations (including tool calls).
@@ -120,76 +276,50 @@ class McpService:
                         text_parts = [p.text for p in cand.content.parts if p.text]
                         final_text = " ".join(text_parts) if text_parts else "No response generated."
                         elapsed = time.perf_counter() - start_time
-                        breakdown: dict[str, float | int] = {
-                            "llm_call_count": llm_call_count,
-                            "tool_call_count": tool_call_count,
-                        }
                         logger.info(f"MCP chat completed: {i + 1} LLM call(s), {total_tokens} tokens, {elapsed:.3f}s")
-                        return (final_text, elapsed, total_tokens, breakdown)
+                        return (final_text, elapsed, total_tokens, _breakdown())
+
+                    # Execute Tools concurrently; gather keeps the call order,
+                    # which is the order Gemini expects the responses in.
+                    tool_call_count += len(function_calls)
+                    logger.info(
+                        f"Step {i+1}: Calling tools "
+                        f"{', '.join(call.name for call in function_calls)}"
+                    )
+                    step_start = time.perf_counter()
+                    results = await asyncio.gather(
+                        *(self._call_tool(mcp_session, call) for call in function_calls)
+                    )
+                    step_wall_time = time.perf_counter() - step_start
 
-                    # Execute Tools
                     parts_response = []
-                    for call in function_calls:
-                        tool_call_count += 1
-                        logger.info(f"Step {i+1}: Calling tool {call.name}")
-
-                        try:
-                            # Call the tool via MCP
-                            result = await mcp_session.call_tool(call.name, arguments=call.args)
-                            # Parse result content (MCP returns a list of text/image content)
-                            # We flatten it to a single string for the LLM
-                            content_text = ""
-                            if hasattr(result, 'content') and isinstance(result.content, list):
-                                for item in result.content:
-                                    item_text = getattr(item, "text", None)
-                                    if not isinstance(item_text, str):
-                                        continue
-                                    try:
-                                        payload = json.loads(item_text)
-                                    except json.JSONDecodeError:
-                                        continue
-                                    if isinstance(payload, dict):
-                                        embed_tokens = int(payload.get("embedding_tokens", 0) or 0)
-                                        if embed_tokens:
-                                            embedding_tokens += embed_tokens
-                                            total_tokens += embed_tokens
-                                content_text = "\n".join([c.text for c in result.content if hasattr(c, 'text')])
-                            else:
-                                content_text = str(result)
-
-                            # Create the function response part
-                            parts_response.append(types.Part.from_function_response(
-                                name=call.name,
-                                response={"result": content_text}
-                            ))
-                        except Exception as e:
-                            logger.error(f"Tool error: {e}")
-                            parts_response.append(types.Part.from_function_response(
-                                name=call.name,
-                                response={"error": str(e)}
-                            ))
+                    step_summed_time = 0.0
+                    for part, tool_embedding_tokens, tool_time in results:
+                        parts_response.append(part)
+                        embedding_tokens += tool_embedding_tokens
+                        total_tokens += tool_embedding_tokens
+                        step_summed_time += tool_time
+
+                    tool_steps.append({
+                        "step": i + 1,
+                        "tool_calls": len(function_calls),
+                        "wall_time": step_wall_time,
+                        "summed_time": step_summed_time,
+                    })
 
                     contents.append(types.Content(role="user", parts=parts_response))
 
                 elapsed = time.perf_counter() - start_time
-                breakdown: dict[str, float | int] = {
-                    "llm_call_count": llm_call_count,
-                    "tool_call_count": tool_call_count,
-                    "embedding_tokens": embedding_tokens,
-                }
                 return (
                     "Max tool steps reached. I could not find a final answer.",
                     elapsed,
                     total_tokens,
-                    breakdown,
+                    _breakdown(),
                 )
 
+        except (deadline.DeadlineExceeded, CircuitOpenError):
+            raise
         except Exception as e:
             logger.exception("Error in McpService")
             elapsed = time.perf_counter() - start_time
-            breakdown: dict[str, float | int] = {
-                "llm_call_count": llm_call_count,
-                "tool_call_count": tool_call_count,
-                "embedding_tokens": embedding_tokens,
-            }
-            return (f"System Error: {str(e)}", elapsed, total_tokens, breakdown)
+            return (f"System Error: {str(e)}", elapsed, total_tokens, _breakdown())
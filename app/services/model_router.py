@@ -0,0 +1,254 @@
+"""Per-endpoint/stage model routing with latency- and error-driven fallback.
+
+Every LLM call names a route such as "chat", "rag", "mcp.plan",
+"mcp.answer", "agent.plan" or "agent.answer". A ".plan" stage covers the
+calls made before any tool result exists, and ".answer" covers the calls
+that follow tool results. MODEL_ROUTES maps a route, or its prefix before
+the dot, to an ordered list of tiers. Each tier has a model and its own
+generation config. A route that is not configured uses GEMINI_MODEL.
+
+The router keeps rolling latency and error statistics per (route, model).
+When a tier's mean latency or error rate crosses the thresholds, calls go
+to the next tier. After a cooldown one call probes the tier again. A call
+that raises is retried once on each later tier.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, TypeVar
+
+from google.genai import types
+
+from app.core.settings import Settings, get_settings
+from app.services.rate_limiter import RateLimitQueueFull
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class ModelTier:
+    model: str
+    temperature: float | None = None
+    max_output_tokens: int | None = None
+    thinking_budget: int | None = None
+
+    @classmethod
+    def parse(cls, raw: str | dict[str, Any]) -> ModelTier:
+        if isinstance(raw, str):
+            return cls(model=raw)
+        return cls(**raw)
+
+    def config_overrides(self) -> dict[str, Any]:
+        """`GenerateContentConfig` fields this tier sets."""
+        overrides: dict[str, Any] = {}
+        if self.temperature is not None:
+            overrides["temperature"] = self.temperature
+        if self.max_output_tokens is not None:
+            overrides["max_output_tokens"] = self.max_output_tokens
+        if self.thinking_budget is not None:
+            overrides["thinking_config"] = types.ThinkingConfig(
+                thinking_budget=self.thinking_budget
+            )
+        return overrides
+
+
+# Models chosen by the calls of the current request: route -> model. A
+# mutable dict (not a value) so calls in child tasks report into it.
+_model_choices: ContextVar[dict[str, str] | None] = ContextVar(
+    "model_choices", default=None
+)
+
+
+@contextmanager
+def track_model_choices() -> Iterator[dict[str, str]]:
+    """Collect route -> model for the enclosed calls (joins an outer tracker)."""
+    current = _model_choices.get()
+    if current is not None:
+        yield current
+        return
+    choices: dict[str, str] = {}
+    token = _model_choices.set(choices)
+    try:
+        yield choices
+    finally:
+        _model_choices.reset(token)
+
+
+class _TierHealth:
+    def __init__(self, window: int):
+        # (latency seconds, succeeded) per recent call.
+        self.samples: deque[tuple[float, bool]] = deque(maxlen=window)
+        self.tripped_at: float | None = None
+        self.calls = 0
+        self.trips = 0
+
+    def error_rate(self) -> float:
+        if not self.samples:
+            return 0.0
+        return sum(1 for _, ok in self.samples if not ok) / len(self.samples)
+
+    def mean_latency(self) -> float | None:
+        latencies = [latency for latency, ok in self.samples if ok]
+        return sum(latencies) / len(latencies) if latencies else None
+
+
+class ModelRouter:
+    def __init__(
+        self,
+        *,
+        default_model: str,
+        routes: dict[str, list[ModelTier]] | None = None,
+        max_latency: float = 30.0,
+        max_error_rate: float = 0.5,
+        window: int = 20,
+        min_samples: int = 5,
+        cooldown: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._default_model = default_model
+        self._routes = {route: list(tiers) for route, tiers in (routes or {}).items() if tiers}
+        self._max_latency = max_latency
+        self._max_error_rate = max_error_rate
+        self._window = window
+        self._min_samples = min_samples
+        self._cooldown = cooldown
+        self._clock = clock
+        self._health: dict[tuple[str, str], _TierHealth] = {}
+
+    def tiers(self, route: str, default: ModelTier | None = None) -> list[ModelTier]:
+        """Configured tiers for `route`, its prefix, or the default model."""
+        tiers = self._routes.get(route) or self._routes.get(route.split(".", 1)[0])
+        if tiers:
+            return tiers
+        return [default or ModelTier(model=self._default_model)]
+
+    def _health_for(self, route: str, model: str) -> _TierHealth:
+        key = (route, model)
+        health = self._health.get(key)
+        if health is None:
+            health = self._health[key] = _TierHealth(self._window)
+        return health
+
+    def _unhealthy(self, health: _TierHealth) -> bool:
+        if len(health.samples) < self._min_samples:
+            return False
+        if health.error_rate() > self._max_error_rate:
+            return True
+        mean_latency = health.mean_latency()
+        return (
+            self._max_latency > 0
+            and mean_latency is not None
+            and mean_latency > self._max_latency
+        )
+
+    def _available(self, route: str, tier: ModelTier) -> bool:
+        health = self._health_for(route, tier.model)
+        if not self._unhealthy(health):
+            return True
+        now = self._clock()
+        if health.tripped_at is None:
+            health.tripped_at = now
+            health.trips += 1
+            logger.warning(f"Model {tier.model} degraded on route {route}; falling back")
+            return False
+        if now - health.tripped_at >= self._cooldown:
+            # Probe: forget the old samples and let calls through again.
+            health.samples.clear()
+            health.tripped_at = None
+            return True
+        return False
+
+    def select(self, route: str, default: ModelTier | None = None) -> list[ModelTier]:
+        """Tiers to try, in order: the first healthy one, then later fallbacks."""
+        tiers = self.tiers(route, default)
+        for index, tier in enumerate(tiers[:-1]):
+            if self._available(route, tier):
+                return tiers[index:]
+        return tiers[-1:]
+
+    def record(self, route: str, model: str, latency: float, ok: bool) -> None:
+        health = self._health_for(route, model)
+        health.calls += 1
+        health.samples.append((latency, ok))
+        choices = _model_choices.get()
+        if choices is not None and ok:
+            choices[route] = model
+
+    async def run(
+        self,
+        route: str,
+        fn: Callable[[ModelTier], Awaitable[T]],
+        *,
+        default: ModelTier | None = None,
+    ) -> tuple[T, ModelTier]:
+        """Call `fn(tier)` on the selected tier, falling back on errors."""
+        candidates = self.select(route, default)
+        for index, tier in enumerate(candidates):
+            started = self._clock()
+            try:
+                result = await fn(tier)
+            except RateLimitQueueFull:
+                # Local back-pressure: every tier shares the same queue, so
+                # neither a tier error nor a fallback makes sense.
+                raise
+            except Exception:
+                self.record(route, tier.model, self._clock() - started, ok=False)
+                if index == len(candidates) - 1:
+                    raise
+                logger.warning(
+                    f"Model {tier.model} failed on route {route}; "
+                    f"retrying on {candidates[index + 1].model}"
+                )
+                continue
+            self.record(route, tier.model, self._clock() - started, ok=True)
+            return result, tier
+        raise AssertionError("select() always returns at least one tier")
+
+    def stats(self) -> dict[str, Any]:
+        routes: dict[str, dict[str, Any]] = {}
+        for (route, model), health in self._health.items():
+            routes.setdefault(route, {})[model] = {
+                "calls": health.calls,
+                "error_rate": health.error_rate(),
+                "mean_latency": health.mean_latency(),
+                "degraded": health.tripped_at is not None,
+                "trips": health.trips,
+            }
+        return {
+            "configured_routes": {
+                route: [tier.model for tier in tiers]
+                for route, tiers in self._routes.items()
+            },
+            "routes": routes,
+        }
+
+
+def build_model_router(settings: Settings) -> ModelRouter:
+    return ModelRouter(
+        default_model=settings.gemini_model,
+        routes={
+            route: [ModelTier.parse(raw) for raw in tiers]
+            for route, tiers in settings.model_routes.items()
+        },
+        max_latency=settings.model_route_max_latency,
+        max_error_rate=settings.model_route_max_error_rate,
+        window=settings.model_route_window,
+        min_samples=settings.model_route_min_samples,
+        cooldown=settings.model_route_cooldown,
+    )
+
+
+@lru_cache
+def get_model_router() -> ModelRouter:
+    """Process-wide router so every service shares the health statistics."""
+    return build_model_router(get_settings())
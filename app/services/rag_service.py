@@ -2,15 +2,28 @@ from __future__ import annotations
 
 import logging
 import time
+from collections.abc import AsyncIterator
+from typing import Any
 
 from langchain_core.prompts import PromptTemplate
-from sqlalchemy.orm import Session
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core import deadline
 from app.core.settings import Settings, get_settings
-from app.db.retrieval import AdsVectorRepository
+from app.db.retrieval import AdMatch, AsyncAdsVectorRepository
+from app.db.session import is_query_canceled
 from app.models.chat import ChatMessage
 from app.models.rag import RagCitation, RagResponse
+from app.services.circuit_breaker import (
+    DB_RETRIEVAL,
+    CircuitBreakers,
+    CircuitOpenError,
+    build_circuit_breakers,
+)
 from app.services.gemini_service import GeminiService
+from app.services.model_router import track_model_choices
+from app.services.response_cache import SemanticResponseCache
 
 logger = logging.getLogger(__name__)
 
@@ -38,13 +51,92 @@ Write a helpful answer to the user.
 class RagService:
     def __init__(
         self,
-        db: Session,
+        db: AsyncSession,
         gemini_service: GeminiService,
         settings: Settings | None = None,
+        response_cache: SemanticResponseCache | None = None,
+        breakers: CircuitBreakers | None = None,
     ) -> None:
         self._db = db
         self._gemini = gemini_service
         self._settings = settings or get_settings()
+        self._response_cache = response_cache
+        breakers = breakers or build_circuit_breakers(self._settings)
+        self._retrieval_breaker = breakers.get(DB_RETRIEVAL)
+
+    async def _retrieve(
+        self, query_embedding: list[float], top_k: int
+    ) -> tuple[list[AdMatch], str | None]:
+        """Matching ads, and why retrieval was skipped ("deadline", "circuit")."""
+        if not deadline.has_budget(self._settings.deadline_reserve):
+            logger.warning("RAG: deadline too close; answering without retrieval")
+            return [], "deadline"
+        try:
+            self._retrieval_breaker.before_call()
+        except CircuitOpenError:
+            logger.warning("RAG: retrieval circuit open; answering without ads")
+            return [], "circuit"
+        repo = AsyncAdsVectorRepository(self._db)
+        try:
+            matches = await repo.search_ads_by_embedding(
+                query_embedding=query_embedding, top_k=top_k
+            )
+        except DBAPIError as e:
+            if not is_query_canceled(e):
+                self._retrieval_breaker.on_failure(e)
+                raise
+            self._retrieval_breaker.on_cancel()
+            await self._db.rollback()
+            logger.warning("RAG: retrieval hit the deadline; answering without ads")
+            return [], "deadline"
+        except Exception as e:
+            self._retrieval_breaker.on_failure(e)
+            raise
+        except BaseException:
+            # Cancelled (client gone, request deadline): no verdict on the DB.
+            self._retrieval_breaker.on_cancel()
+            raise
+        self._retrieval_breaker.on_success()
+        return matches, None
+
+    @staticmethod
+    def _log_embedding_failure(error: Exception) -> None:
+        if isinstance(error, CircuitOpenError):
+            logger.warning(f"RAG: {error}; falling back to generic answer")
+        else:
+            logger.exception("RAG: failed to embed query; falling back to generic answer")
+
+    @staticmethod
+    def _build_grounded_prompt(
+        message: str,
+        matches: list[AdMatch],
+    ) -> tuple[str, list[RagCitation]]:
+        context_lines: list[str] = []
+        citations: list[RagCitation] = []
+
+        for m in matches:
+            ad = m.ad
+
+            kw = ", ".join(ad.keywords) if ad.keywords else ""
+            cpc_str = str(ad.cpc)
+
+            context_lines.append(
+                "\n".join(
+                    [
+                        f"- ad_id: {ad.id}",
+                        f"  title: {ad.title}",
+                        f"  description: {ad.description}",
+                        f"  url: {ad.url}",
+                        f"  keywords: {kw}",
+                        f"  cpc: {cpc_str}",
+                    ]
+                )
+            )
+
+            citations.append(RagCitation(score=m.score, distance=m.distance, ad=ad))
+
+        context = "\n\n".join(context_lines)
+        return _RAG_PROMPT.format(question=message, context=context), citations
 
     async def answer(
         self,
@@ -57,110 +149,209 @@ class RagService:
         retrieval_time = 0.0
         llm_generation_time = 0.0
         embedding_tokens = 0
+        embedding_tokens_estimated = False
+        embedding_cache_hit = False
 
         # 1) Embed the query
         embed_start = time.perf_counter()
         try:
-            query_embedding, embedding_tokens = await self._gemini.embed_text_with_usage(
-                message
+            query_embedding, embedding_usage = (
+                await self._gemini.embed_text_with_usage_details(message)
             )
+            embedding_tokens = embedding_usage.tokens
+            embedding_tokens_estimated = embedding_usage.estimated
+            embedding_cache_hit = embedding_usage.cached
             embedding_time = time.perf_counter() - embed_start
-        except Exception:
-            logger.exception("RAG: failed to embed query; falling back to generic answer")
-            response_text, generation_time, used_tokens = await self._gemini.generate_chat_response(
-                message=message, history=history
-            )
+        except Exception as e:
+            self._log_embedding_failure(e)
+            with track_model_choices() as models:
+                response_text, generation_time, used_tokens = await self._gemini.generate_chat_response(
+                    message=message, history=history, route="rag"
+                )
             llm_generation_time = generation_time
             total_used_tokens = used_tokens + embedding_tokens
             total_elapsed = time.perf_counter() - total_start
+            breakdown: dict[str, Any] = {
+                "embedding_time": embedding_time,
+                "retrieval_time": retrieval_time,
+                "llm_generation_time": llm_generation_time,
+                "embedding_tokens": embedding_tokens,
+                "embedding_tokens_estimated": embedding_tokens_estimated,
+                "embedding_cache_hit": embedding_cache_hit,
+                "llm_generation_tokens": used_tokens,
+                "models": dict(models),
+            }
+            if isinstance(e, CircuitOpenError):
+                breakdown["circuit_degraded"] = True
             return RagResponse(
                 response=response_text,
                 generation_time=total_elapsed,
                 used_tokens=total_used_tokens,
                 citations=[],
-                breakdown={
-                    "embedding_time": embedding_time,
-                    "retrieval_time": retrieval_time,
-                    "llm_generation_time": llm_generation_time,
-                    "embedding_tokens": embedding_tokens,
-                    "llm_generation_tokens": used_tokens,
-                },
+                breakdown=breakdown,
             )
 
-        # 2) Retrieve similar ads
+        # 2) Semantic response cache (opt-in): near-paraphrases skip retrieval
+        #    and generation entirely.
+        cache = self._response_cache
+        cache_key: str | None = None
+        if cache is not None and cache.eligible(history):
+            cache_key = cache.context_key("rag", history, variant=f"top_k={top_k}")
+            cached = cache.lookup(cache_key, query_embedding)
+            if cached is not None:
+                cached_response, similarity = cached
+                return cached_response.model_copy(update={
+                    "generation_time": time.perf_counter() - total_start,
+                    "used_tokens": embedding_tokens,
+                    "breakdown": {
+                        "embedding_time": embedding_time,
+                        "retrieval_time": 0.0,
+                        "llm_generation_time": 0.0,
+                        "embedding_tokens": embedding_tokens,
+                        "embedding_tokens_estimated": embedding_tokens_estimated,
+                        "embedding_cache_hit": embedding_cache_hit,
+                        "llm_generation_tokens": 0,
+                        "semantic_cache_hit": True,
+                        "semantic_cache_similarity": similarity,
+                    },
+                })
+
+        # 3) Retrieve similar ads
         retrieval_start = time.perf_counter()
-        repo = AdsVectorRepository(self._db)
-        matches = repo.search_ads_by_embedding(query_embedding=query_embedding, top_k=top_k)
+        matches, degraded = await self._retrieve(query_embedding, top_k)
         retrieval_time = time.perf_counter() - retrieval_start
 
-        # 3) Fallback when nothing relevant is found
-        if not matches:
-            response_text, generation_time, used_tokens = await self._gemini.generate_chat_response(
-                message=message, history=history
-            )
-            llm_generation_time = generation_time
-            total_used_tokens = used_tokens + embedding_tokens
-            total_elapsed = time.perf_counter() - total_start
-            return RagResponse(
-                response=response_text,
-                generation_time=total_elapsed,
-                used_tokens=total_used_tokens,
-                citations=[],
-                breakdown={
-                    "embedding_time": embedding_time,
-                    "retrieval_time": retrieval_time,
-                    "llm_generation_time": llm_generation_time,
-                    "embedding_tokens": embedding_tokens,
-                    "llm_generation_tokens": used_tokens,
-                },
-            )
-
-        # 4) Build context + citations payload
-        context_lines: list[str] = []
-        citations: list[RagCitation] = []
-
-        for m in matches:
-            ad = m.ad
-
-            kw = ", ".join(ad.keywords) if ad.keywords else ""
-            cpc_str = str(ad.cpc)
+        if matches:
+            # 4) Build context + citations payload
+            rag_message, citations = self._build_grounded_prompt(message, matches)
+        else:
+            # Fallback when nothing relevant is found
+            rag_message, citations = message, []
 
-            context_lines.append(
-                "\n".join(
-                    [
-                        f"- ad_id: {ad.id}",
-                        f"  title: {ad.title}",
-                        f"  description: {ad.description}",
-                        f"  url: {ad.url}",
-                        f"  keywords: {kw}",
-                        f"  cpc: {cpc_str}",
-                    ]
-                )
+        # 5) Generate (grounded) answer
+        with track_model_choices() as models:
+            response_text, generation_time, used_tokens = await self._gemini.generate_chat_response(
+                message=rag_message, history=history, route="rag"
             )
-
-            citations.append(RagCitation(score=m.score, distance=m.distance, ad=ad))
-
-        context = "\n\n".join(context_lines)
-        rag_message = _RAG_PROMPT.format(question=message, context=context)
-
-        # 5) Generate grounded answer
-        response_text, generation_time, used_tokens = await self._gemini.generate_chat_response(
-            message=rag_message, history=history
-        )
         llm_generation_time = generation_time
         total_used_tokens = used_tokens + embedding_tokens
         total_elapsed = time.perf_counter() - total_start
 
-        return RagResponse(
+        breakdown = {
+            "embedding_time": embedding_time,
+            "retrieval_time": retrieval_time,
+            "llm_generation_time": llm_generation_time,
+            "embedding_tokens": embedding_tokens,
+            "embedding_tokens_estimated": embedding_tokens_estimated,
+            "embedding_cache_hit": embedding_cache_hit,
+            "llm_generation_tokens": used_tokens,
+            "models": dict(models),
+        }
+        if cache is not None:
+            breakdown["semantic_cache_hit"] = False
+        if degraded:
+            breakdown[f"{degraded}_degraded"] = True
+
+        response = RagResponse(
             response=response_text,
             generation_time=total_elapsed,
             used_tokens=total_used_tokens,
             citations=citations,
-            breakdown={
-                "embedding_time": embedding_time,
-                "retrieval_time": retrieval_time,
-                "llm_generation_time": llm_generation_time,
-                "embedding_tokens": embedding_tokens,
-                "llm_generation_tokens": used_tokens,
-            },
+            breakdown=breakdown,
         )
+        if cache_key is not None and not degraded:
+            cache.store(cache_key, query_embedding, response)
+        return response
+
+    async def stream_answer(
+        self,
+        message: str,
+        history: list[ChatMessage],
+        top_k: int,
+    ) -> AsyncIterator[dict[str, Any]]:
+        """
+        Streaming variant of `answer`.
+
+        Yields `{"type": "citations", "citations": [...]}` as soon as
+        retrieval returns (empty when embedding fails or nothing matched),
+        then `{"type": "token", "text": ...}` chunks of the answer, and a
+        final `{"type": "done", ...}` with the same breakdown as `answer`.
+        """
+        total_start = time.perf_counter()
+        embedding_time = 0.0
+        retrieval_time = 0.0
+        embedding_tokens = 0
+        embedding_tokens_estimated = False
+        embedding_cache_hit = False
+        matches: list[AdMatch] = []
+        embedding_error: Exception | None = None
+
+        # 1) Embed the query
+        embed_start = time.perf_counter()
+        try:
+            query_embedding, embedding_usage = (
+                await self._gemini.embed_text_with_usage_details(message)
+            )
+            embedding_tokens = embedding_usage.tokens
+            embedding_tokens_estimated = embedding_usage.estimated
+            embedding_cache_hit = embedding_usage.cached
+            embedding_time = time.perf_counter() - embed_start
+        except Exception as e:
+            self._log_embedding_failure(e)
+            query_embedding = None
+            embedding_error = e
+
+        # 2) Retrieve similar ads
+        degraded = None
+        if isinstance(embedding_error, CircuitOpenError):
+            degraded = "circuit"
+        if query_embedding is not None:
+            retrieval_start = time.perf_counter()
+            matches, degraded = await self._retrieve(query_embedding, top_k)
+            retrieval_time = time.perf_counter() - retrieval_start
+
+        # 3) Citations go out before any answer token
+        if matches:
+            prompt, citations = self._build_grounded_prompt(message, matches)
+        else:
+            prompt, citations = message, []
+        citations_time = time.perf_counter() - total_start
+        yield {"type": "citations", "citations": citations}
+
+        # 4) Stream the (grounded or plain) answer
+        llm_generation_time = 0.0
+        time_to_first_token = 0.0
+        used_tokens = 0
+        model = None
+        async for event in self._gemini.stream_chat_response(
+            message=prompt, history=history, route="rag"
+        ):
+            if event["type"] == "done":
+                model = event.get("model")
+                llm_generation_time = event["generation_time"]
+                time_to_first_token = event["time_to_first_token"]
+                used_tokens = event["used_tokens"]
+            else:
+                yield event
+
+        total_elapsed = time.perf_counter() - total_start
+        breakdown: dict[str, Any] = {
+            "embedding_time": embedding_time,
+            "retrieval_time": retrieval_time,
+            "citations_time": citations_time,
+            "llm_generation_time": llm_generation_time,
+            "embedding_tokens": embedding_tokens,
+            "embedding_tokens_estimated": embedding_tokens_estimated,
+            "embedding_cache_hit": embedding_cache_hit,
+            "llm_generation_tokens": used_tokens,
+            "models": {"rag": model},
+        }
+        if degraded:
+            breakdown[f"{degraded}_degraded"] = True
+        yield {
+            "type": "done",
+            "generation_time": total_elapsed,
+            "time_to_first_token": citations_time + time_to_first_token,
+            "used_tokens": used_tokens + embedding_tokens,
+            "breakdown": breakdown,
+        }
@@ -0,0 +1,404 @@
+"""Client-side RPM/TPM limiter shared by every Gemini call.
+
+Bursts used to run straight into Gemini 429s (`RESOURCE_EXHAUSTED`), and
+only embeddings had a retry. The limiter sits in the pooled HTTP transport
+of `GeminiClientRegistry`, so chat, embeddings, the MCP loop and the
+LangChain agent all draw from the same two token buckets (requests and
+tokens per minute). Calls that do not fit wait in a bounded priority queue,
+interactive chat ahead of background work and backfill jobs. A 429
+multiplicatively lowers the effective rate and pauses dispatch; successful
+calls raise it back additively.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from functools import lru_cache
+from typing import Any
+
+import httpx
+
+from app.core.errors import ServiceError
+from app.core.settings import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    BACKGROUND = 1
+    BATCH = 2
+
+
+_request_priority: ContextVar[Priority] = ContextVar(
+    "gemini_request_priority", default=Priority.INTERACTIVE
+)
+
+
+@contextmanager
+def request_priority(priority: Priority) -> Iterator[None]:
+    """Run the enclosed Gemini calls (and tasks created inside) at `priority`."""
+    token = _request_priority.set(priority)
+    try:
+        yield
+    finally:
+        _request_priority.reset(token)
+
+
+class RateLimitQueueFull(ServiceError, RuntimeError):
+    """The limiter queue is at capacity; the caller should retry later."""
+
+    def __init__(self, message: str = "Gemini rate limiter queue is full"):
+        super().__init__(message, 503)
+
+
+def is_queue_full(error: BaseException) -> bool:
+    """True for local back-pressure, which says nothing about Gemini health."""
+    return isinstance(error, RateLimitQueueFull)
+
+
+class GeminiRateLimiter:
+    """Token buckets for requests and tokens per minute, with AIMD backoff."""
+
+    _MIN_RATE_FACTOR = 0.1
+    _RECOVERY_STEP = 0.05
+
+    def __init__(
+        self,
+        *,
+        rpm: int,
+        tpm: int,
+        max_queue: int = 256,
+        default_backoff: float = 2.0,
+        clock=time.monotonic,
+    ):
+        self._rpm = rpm
+        self._tpm = tpm
+        self._max_queue = max_queue
+        self._default_backoff = default_backoff
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        now = clock()
+        self._request_tokens = float(rpm)
+        self._llm_tokens = float(tpm)
+        self._refilled_at = now
+        self._rate_factor = 1.0
+        self._paused_until = 0.0
+
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._queue: list[tuple[int, int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._pump_task: asyncio.Task | None = None
+
+        self.granted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.rate_limited = 0
+        self.max_queue_depth = 0
+        self._wait_count = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    # -- buckets ---------------------------------------------------------
+
+    def _refill(self, now: float) -> None:
+        elapsed = max(now - self._refilled_at, 0.0)
+        self._refilled_at = now
+        factor = self._rate_factor
+        self._request_tokens = min(
+            float(self._rpm), self._request_tokens + elapsed * self._rpm / 60 * factor
+        )
+        self._llm_tokens = min(
+            float(self._tpm), self._llm_tokens + elapsed * self._tpm / 60 * factor
+        )
+
+    def _clamp(self, tokens: int) -> int:
+        # A single call larger than the whole bucket would never be granted.
+        return max(0, min(tokens, self._tpm))
+
+    def _time_until_capacity(self, tokens: int, now: float) -> float:
+        """Seconds until one request of `tokens` fits (0 = now). Lock held."""
+        self._refill(now)
+        waits = [self._paused_until - now]
+        factor = self._rate_factor
+        if self._request_tokens < 1:
+            waits.append((1 - self._request_tokens) * 60 / (self._rpm * factor))
+        if self._llm_tokens < tokens:
+            waits.append((tokens - self._llm_tokens) * 60 / (self._tpm * factor))
+        return max(0.0, *waits)
+
+    def _debit(self, tokens: int) -> None:
+        self._request_tokens -= 1
+        self._llm_tokens -= tokens
+        self.granted += 1
+
+    def settle(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """Correct the token bucket once the real usage is known."""
+        with self._lock:
+            self._llm_tokens -= self._clamp(actual_tokens) - self._clamp(estimated_tokens)
+
+    # -- feedback --------------------------------------------------------
+
+    def report_rate_limited(self, retry_after: float | None = None) -> float:
+        """Back off after a 429; returns the pause applied (seconds)."""
+        with self._lock:
+            self.rate_limited += 1
+            self._rate_factor = max(self._MIN_RATE_FACTOR, self._rate_factor / 2)
+            pause = retry_after if retry_after is not None else self._default_backoff
+            self._paused_until = max(self._paused_until, self._clock() + pause)
+            logger.warning(
+                "Gemini rate limited; rate factor %.2f, pausing %.1fs",
+                self._rate_factor,
+                pause,
+            )
+            return pause
+
+    def report_success(self) -> None:
+        with self._lock:
+            if self._rate_factor < 1.0:
+                self._rate_factor = min(1.0, self._rate_factor + self._RECOVERY_STEP)
+
+    # -- acquisition -----------------------------------------------------
+
+    def _record_wait(self, waited: float) -> None:
+        self._wait_count += 1
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+
+    async def acquire(self, tokens: int, priority: Priority | None = None) -> None:
+        """Wait (in priority order) until a call of `tokens` may be sent."""
+        tokens = self._clamp(tokens)
+        priority = _request_priority.get() if priority is None else priority
+        loop = asyncio.get_running_loop()
+
+        with self._lock:
+            if self._loop is not loop:
+                # Never keep futures from a previous event loop.
+                self._loop = loop
+                self._queue = []
+                self._pump_task = None
+            if not self._queue and self._time_until_capacity(tokens, self._clock()) == 0:
+                self._debit(tokens)
+                self._record_wait(0.0)
+                return
+            if len(self._queue) >= self._max_queue:
+                self.rejected += 1
+                raise RateLimitQueueFull()
+
+            future: asyncio.Future = loop.create_future()
+            heapq.heappush(self._queue, (int(priority), next(self._seq), tokens, future))
+            self.queued += 1
+            self.max_queue_depth = max(self.max_queue_depth, len(self._queue))
+            if self._pump_task is None or self._pump_task.done():
+                self._pump_task = loop.create_task(self._pump())
+
+        started = self._clock()
+        await future
+        with self._lock:
+            self._record_wait(self._clock() - started)
+
+    async def _pump(self) -> None:
+        while True:
+            with self._lock:
+                while self._queue and self._queue[0][3].done():
+                    heapq.heappop(self._queue)  # caller gave up
+                if not self._queue:
+                    self._pump_task = None
+                    return
+                _, _, tokens, future = self._queue[0]
+                wait = self._time_until_capacity(tokens, self._clock())
+                if wait == 0:
+                    heapq.heappop(self._queue)
+                    self._debit(tokens)
+                    future.set_result(None)
+                    continue
+            await asyncio.sleep(min(wait, 1.0))
+
+    def acquire_blocking(self, tokens: int) -> None:
+        """Sync-client variant: polls the buckets without joining the queue."""
+        tokens = self._clamp(tokens)
+        started = self._clock()
+        while True:
+            with self._lock:
+                wait = self._time_until_capacity(tokens, self._clock())
+                if wait == 0:
+                    self._debit(tokens)
+                    self._record_wait(self._clock() - started)
+                    return
+            time.sleep(min(wait, 1.0))
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            self._refill(self._clock())
+            return {
+                "rpm": self._rpm,
+                "tpm": self._tpm,
+                "rate_factor": self._rate_factor,
+                "paused_for": max(0.0, self._paused_until - self._clock()),
+                "available_requests": self._request_tokens,
+                "available_tokens": self._llm_tokens,
+                "queue_depth": len(self._queue),
+                "max_queue_depth": self.max_queue_depth,
+                "max_queue": self._max_queue,
+                "granted": self.granted,
+                "queued": self.queued,
+                "rejected": self.rejected,
+                "rate_limited": self.rate_limited,
+                "wait_time_mean": (
+                    self._wait_total / self._wait_count if self._wait_count else 0.0
+                ),
+                "wait_time_max": self._wait_max,
+            }
+
+
+# -- httpx integration -------------------------------------------------------
+
+def estimate_request_tokens(request: httpx.Request, output_allowance: int) -> int:
+    """Prompt tokens from the body size (~4 bytes/token) plus an output allowance."""
+    try:
+        body_size = len(request.content)
+    except httpx.RequestNotRead:
+        body_size = 0
+    return body_size // 4 + output_allowance
+
+
+def _usage_tokens(response: httpx.Response) -> int | None:
+    try:
+        payload = json.loads(response.content)
+    except (ValueError, httpx.ResponseNotRead):
+        return None
+    usage = payload.get("usageMetadata") if isinstance(payload, dict) else None
+    total = usage.get("totalTokenCount") if isinstance(usage, dict) else None
+    return int(total) if isinstance(total, (int, float)) else None
+
+
+def _retry_after(response: httpx.Response) -> float | None:
+    """Server-suggested delay: Retry-After, else google.rpc.RetryInfo ("12s")."""
+    value = response.headers.get("retry-after")
+    if value is None:
+        try:
+            details = json.loads(response.content)["error"]["details"]
+            value = next(
+                d["retryDelay"].removesuffix("s")
+                for d in details
+                if isinstance(d, dict) and "retryDelay" in d
+            )
+        except (ValueError, KeyError, TypeError, StopIteration, httpx.ResponseNotRead):
+            return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def _is_streaming(request: httpx.Request) -> bool:
+    return "stream" in request.url.path.lower() or request.url.params.get("alt") == "sse"
+
+
+class RateLimitedAsyncTransport(httpx.AsyncBaseTransport):
+    """Acquires a limiter permit per request and retries 429s after backing off."""
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        limiter: GeminiRateLimiter,
+        *,
+        max_retries: int = 3,
+        output_allowance: int = 512,
+    ):
+        self._transport = transport
+        self._limiter = limiter
+        self._max_retries = max_retries
+        self._output_allowance = output_allowance
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        estimated = estimate_request_tokens(request, self._output_allowance)
+        for attempt in range(self._max_retries + 1):
+            await self._limiter.acquire(estimated)
+            response = await self._transport.handle_async_request(request)
+            if response.status_code != 429 or attempt == self._max_retries:
+                break
+            await response.aread()
+            await response.aclose()
+            self._limiter.report_rate_limited(_retry_after(response))
+
+        if response.status_code == 429:
+            await response.aread()
+            self._limiter.report_rate_limited(_retry_after(response))
+            return response
+        self._limiter.report_success()
+        if not _is_streaming(request) and response.status_code == 200:
+            await response.aread()
+            actual = _usage_tokens(response)
+            if actual is not None:
+                self._limiter.settle(estimated, actual)
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """Sync counterpart of `RateLimitedAsyncTransport` (no priority queue)."""
+
+    def __init__(
+        self,
+        transport: httpx.BaseTransport,
+        limiter: GeminiRateLimiter,
+        *,
+        max_retries: int = 3,
+        output_allowance: int = 512,
+    ):
+        self._transport = transport
+        self._limiter = limiter
+        self._max_retries = max_retries
+        self._output_allowance = output_allowance
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        estimated = estimate_request_tokens(request, self._output_allowance)
+        for attempt in range(self._max_retries + 1):
+            self._limiter.acquire_blocking(estimated)
+            response = self._transport.handle_request(request)
+            if response.status_code != 429 or attempt == self._max_retries:
+                break
+            response.read()
+            response.close()
+            self._limiter.report_rate_limited(_retry_after(response))
+
+        if response.status_code == 429:
+            response.read()
+            self._limiter.report_rate_limited(_retry_after(response))
+        else:
+            self._limiter.report_success()
+        return response
+
+    def close(self) -> None:
+        self._transport.close()
+
+
+def build_gemini_rate_limiter(settings: Settings) -> GeminiRateLimiter | None:
+    if not settings.gemini_rate_limit_enabled:
+        return None
+    return GeminiRateLimiter(
+        rpm=settings.gemini_rpm,
+        tpm=settings.gemini_tpm,
+        max_queue=settings.gemini_rate_limit_queue_size,
+        default_backoff=settings.gemini_rate_limit_backoff,
+    )
+
+
+@lru_cache
+def get_gemini_rate_limiter() -> GeminiRateLimiter | None:
+    """Process-wide limiter, or None when GEMINI_RATE_LIMIT_ENABLED is off."""
+    return build_gemini_rate_limiter(get_settings())
@@ -0,0 +1,276 @@
+"""Opt-in semantic cache of chat / RAG answers for near-duplicate prompts.
+
+Prompts are matched by cosine similarity of their embeddings, restricted
+to entries with the same context key (endpoint namespace plus an exact
+fingerprint of the short conversation history). The index is a fixed-size
+NumPy matrix of unit vectors, so a lookup is one masked matrix-vector
+product over all live entries.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+import time
+from collections.abc import Callable
+from functools import lru_cache
+from typing import Any
+
+import numpy as np
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.core.settings import Settings, get_settings
+from app.db.models import Ad, AdCampaign, Campaign
+from app.models.chat import ChatMessage
+from app.services.embedding_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+# Campaign columns that change which ads are eligible; click tracking only
+# bumps `spending` (handled separately) and AdCampaign.click_count.
+_CAMPAIGN_ELIGIBILITY_COLUMNS = ("is_enabled", "start_date", "end_date", "budget")
+
+
+def _context_id(context_key: str) -> np.int64:
+    digest = hashlib.blake2b(context_key.encode("utf-8"), digest_size=8).digest()
+    return np.frombuffer(digest, dtype=np.int64)[0]
+
+
+class SemanticResponseCache:
+    """Bounded, TTL'd cosine-similarity cache of prior answers."""
+
+    def __init__(
+        self,
+        *,
+        max_entries: int,
+        ttl: float,
+        threshold: float,
+        max_history: int = 2,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._threshold = threshold
+        self._max_history = max_history
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        # Allocated on the first store, once the embedding dimension is known.
+        self._vectors: np.ndarray | None = None
+        self._valid = np.zeros(max_entries, dtype=bool)
+        self._context_ids = np.zeros(max_entries, dtype=np.int64)
+        self._namespaces: list[str | None] = [None] * max_entries
+        self._expires_at = np.zeros(max_entries, dtype=np.float64)
+        self._last_used = np.zeros(max_entries, dtype=np.float64)
+        self._payloads: list[Any] = [None] * max_entries
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def eligible(self, history: list[ChatMessage]) -> bool:
+        """Only short conversations are cached; long ones rarely repeat."""
+        return len(history) <= self._max_history
+
+    @staticmethod
+    def context_key(
+        namespace: str, history: list[ChatMessage], *, variant: str = ""
+    ) -> str:
+        """Exact-match part of the key: namespace, variant and history hash."""
+        fingerprint = hashlib.sha256()
+        for msg in history:
+            fingerprint.update(msg.role.encode("utf-8") + b"\x00")
+            for part in msg.parts:
+                fingerprint.update(normalize_query(part).encode("utf-8") + b"\x01")
+        return f"{namespace}|{variant}|{fingerprint.hexdigest()}"
+
+    @staticmethod
+    def _unit(vector: list[float] | np.ndarray) -> np.ndarray | None:
+        q = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(q))
+        if norm == 0.0:
+            return None
+        return q / norm
+
+    def _live_mask(self, now: float) -> np.ndarray:
+        return self._valid & (self._expires_at > now)
+
+    def lookup(
+        self, context_key: str, vector: list[float]
+    ) -> tuple[Any, float] | None:
+        """Return (payload, similarity) of the best match above the threshold."""
+        q = self._unit(vector)
+        with self._lock:
+            if q is None or self._vectors is None or q.shape[0] != self._vectors.shape[1]:
+                self.misses += 1
+                return None
+
+            now = self._clock()
+            mask = self._live_mask(now) & (self._context_ids == _context_id(context_key))
+            candidates = np.flatnonzero(mask)
+            if candidates.size == 0:
+                self.misses += 1
+                return None
+
+            similarities = self._vectors[candidates] @ q
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < self._threshold:
+                self.misses += 1
+                return None
+
+            slot = int(candidates[best])
+            self._last_used[slot] = now
+            self.hits += 1
+            return self._payloads[slot], similarity
+
+    def store(self, context_key: str, vector: list[float], payload: Any) -> None:
+        q = self._unit(vector)
+        if q is None:
+            return
+        namespace = context_key.split("|", 1)[0]
+        context_id = _context_id(context_key)
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self._max_entries, q.shape[0]), dtype=np.float32)
+            elif q.shape[0] != self._vectors.shape[1]:
+                return
+
+            now = self._clock()
+            live = self._live_mask(now)
+            slot = self._duplicate_slot(live, context_id, q)
+            if slot is None:
+                free = np.flatnonzero(~live)
+                if free.size:
+                    slot = int(free[0])
+                else:
+                    slot = int(np.argmin(self._last_used))
+                    self.evictions += 1
+
+            self._vectors[slot] = q
+            self._valid[slot] = True
+            self._context_ids[slot] = context_id
+            self._namespaces[slot] = namespace
+            self._expires_at[slot] = now + self._ttl
+            self._last_used[slot] = now
+            self._payloads[slot] = payload
+            self.stores += 1
+
+    def _duplicate_slot(
+        self, live: np.ndarray, context_id: np.int64, q: np.ndarray
+    ) -> int | None:
+        """Slot of an existing near-identical entry, refreshed instead of duplicated."""
+        candidates = np.flatnonzero(live & (self._context_ids == context_id))
+        if candidates.size == 0:
+            return None
+        similarities = self._vectors[candidates] @ q
+        best = int(np.argmax(similarities))
+        if similarities[best] >= self._threshold:
+            return int(candidates[best])
+        return None
+
+    def invalidate(self, namespace: str | None = None) -> int:
+        """Drop all entries, or only those of `namespace`; returns the count."""
+        with self._lock:
+            if namespace is None:
+                mask = self._valid.copy()
+            else:
+                mask = self._valid & np.array(
+                    [ns == namespace for ns in self._namespaces], dtype=bool
+                )
+            dropped = int(mask.sum())
+            self._valid[mask] = False
+            for slot in np.flatnonzero(mask):
+                self._payloads[slot] = None
+            if dropped:
+                self.invalidations += 1
+            return dropped
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": int(self._live_mask(self._clock()).sum()),
+                "max_entries": self._max_entries,
+                "ttl": self._ttl,
+                "threshold": self._threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+def _changes_ad_catalog(session: Session) -> bool:
+    """Whether a flush touched ads, ad/campaign links or campaign eligibility."""
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, (Ad, AdCampaign, Campaign)):
+            return True
+
+    for obj in session.dirty:
+        state = inspect(obj)
+        if isinstance(obj, Ad):
+            if any(attr.history.has_changes() for attr in state.attrs):
+                return True
+        elif isinstance(obj, Campaign):
+            if any(
+                state.attrs[name].history.has_changes()
+                for name in _CAMPAIGN_ELIGIBILITY_COLUMNS
+            ):
+                return True
+            # Spending only matters once it exhausts the budget.
+            if state.attrs.spending.history.has_changes() and not obj.is_running:
+                return True
+    return False
+
+
+def install_catalog_invalidation(cache: SemanticResponseCache) -> None:
+    """Invalidate cached RAG answers when this process commits catalog changes.
+
+    Date-driven eligibility changes are covered by `ServingAdsScheduler`.
+    Writes committed by other processes (other workers, admin scripts, SQL)
+    are not observed; SEMANTIC_CACHE_TTL bounds how long such answers can
+    stay stale.
+    """
+    @event.listens_for(Session, "after_flush")
+    def _mark_catalog_change(session: Session, flush_context) -> None:
+        if _changes_ad_catalog(session):
+            session.info["ad_catalog_changed"] = True
+
+    @event.listens_for(Session, "after_commit")
+    def _invalidate_on_commit(session: Session) -> None:
+        if session.info.pop("ad_catalog_changed", False):
+            dropped = cache.invalidate("rag")
+            logger.info(f"Ad catalog changed; dropped {dropped} cached RAG answers")
+
+    @event.listens_for(Session, "after_rollback")
+    def _forget_on_rollback(session: Session) -> None:
+        session.info.pop("ad_catalog_changed", None)
+
+
+def build_semantic_response_cache(settings: Settings) -> SemanticResponseCache | None:
+    if not settings.semantic_cache_enabled:
+        return None
+    return SemanticResponseCache(
+        max_entries=settings.semantic_cache_max_entries,
+        ttl=settings.semantic_cache_ttl,
+        threshold=settings.semantic_cache_threshold,
+        max_history=settings.semantic_cache_max_history,
+    )
+
+
+@lru_cache
+def get_semantic_response_cache() -> SemanticResponseCache | None:
+    """Process-wide semantic cache, or None when SEMANTIC_CACHE_ENABLED is off."""
+    cache = build_semantic_response_cache(get_settings())
+    if cache is not None:
+        install_catalog_invalidation(cache)
+    return cache
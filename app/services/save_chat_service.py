@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import logging
 
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.db.models import ChatSession
@@ -10,6 +11,40 @@ from app.models.chat import ChatMessageWithMetadata, SaveChatResponse
 logger = logging.getLogger(__name__)
 
 
+def _new_session(
+    mode: str,
+    history: list[ChatMessageWithMetadata],
+    version: float | None,
+    helpful: bool,
+) -> ChatSession:
+    # Convert Pydantic models to dict for JSONB storage
+    history_data = [msg.model_dump() for msg in history]
+
+    # Create new chat session record
+    return ChatSession(
+        mode=mode,
+        history=history_data,
+        version=version,
+        helpful=helpful,
+    )
+
+
+def _saved(chat_session: ChatSession, message_count: int) -> SaveChatResponse:
+    logger.info(
+        f"Saved chat session {chat_session.id} "
+        f"(mode={chat_session.mode}, messages={message_count}, "
+        f"version={chat_session.version})"
+    )
+
+    return SaveChatResponse(
+        id=chat_session.id,
+        created_at=chat_session.created_at,
+        mode=chat_session.mode,
+        version=chat_session.version,
+        helpful=chat_session.helpful,
+    )
+
+
 class SaveChatService:
     """Service for persisting chat session snapshots."""
 
@@ -36,33 +71,13 @@ class SaveChatService:
             SaveChatResponse with session details
         """
         try:
-            # Convert Pydantic models to dict for JSONB storage
-            history_data = [msg.model_dump() for msg in history]
-            
-            # Create new chat session record
-            chat_session = ChatSession(
-                mode=mode,
-                history=history_data,
-                version=version,
-                helpful=helpful,
-            )
-            
+            chat_session = _new_session(mode, history, version, helpful)
+
             self._db.add(chat_session)
             self._db.commit()
             self._db.refresh(chat_session)
-            
-            logger.info(
-                f"Saved chat session {chat_session.id} "
-                f"(mode={mode}, messages={len(history)}, version={version})"
-            )
-            
-            return SaveChatResponse(
-                id=chat_session.id,
-                created_at=chat_session.created_at,
-                mode=chat_session.mode,
-                version=chat_session.version,
-                helpful=chat_session.helpful,
-            )
+
+            return _saved(chat_session, len(history))
             
         except Exception as e:
             self._db.rollback()
@@ -114,3 +129,32 @@ class SaveChatService:
             query = query.filter(ChatSession.version == version)
             
         return query.limit(limit).offset(offset).all()
+
+
+class AsyncSaveChatService:
+    """`SaveChatService.save_session` on an `AsyncSession`, for the request path."""
+
+    def __init__(self, db: AsyncSession):
+        self._db = db
+
+    async def save_session(
+        self,
+        mode: str,
+        history: list[ChatMessageWithMetadata],
+        version: float | None = None,
+        helpful: bool = False,
+    ) -> SaveChatResponse:
+        """Async variant of `SaveChatService.save_session`."""
+        try:
+            chat_session = _new_session(mode, history, version, helpful)
+
+            self._db.add(chat_session)
+            await self._db.commit()
+            await self._db.refresh(chat_session)
+
+            return _saved(chat_session, len(history))
+
+        except Exception as e:
+            await self._db.rollback()
+            logger.exception(f"Failed to save chat session: {e}")
+            raise
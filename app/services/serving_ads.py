@@ -0,0 +1,133 @@
+"""Periodic refresh of `serving_ads` for date-driven eligibility changes.
+
+Triggers keep `serving_ads` in step with writes, but a campaign also starts
+or stops running when the clock passes its start_date or end_date, which no
+write announces. The scheduler refreshes the ads of campaigns whose window
+opened or closed since its previous run. On start, and every
+`reconcile_interval` seconds, it re-derives the whole table instead, which
+also repairs drift from concurrent writes whose triggers did not see each
+other's changes.
+
+Every API worker runs one; the refresh is idempotent. Changed rows also
+drop that worker's cached RAG answers, since no ORM commit announces them.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections.abc import Callable
+from contextlib import suppress
+from datetime import datetime
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.settings import Settings
+from app.db.serving import refresh_due_stmt
+from app.db.session import get_async_sessionmaker
+from app.services.response_cache import SemanticResponseCache
+
+logger = logging.getLogger(__name__)
+
+
+class ServingAdsScheduler:
+    def __init__(
+        self,
+        sessionmaker: async_sessionmaker[AsyncSession],
+        *,
+        interval: float,
+        reconcile_interval: float,
+        response_cache: SemanticResponseCache | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._sessionmaker = sessionmaker
+        self._response_cache = response_cache
+        self._interval = interval
+        self._reconcile_interval = reconcile_interval
+        self._clock = clock
+
+        # Database time of the previous run; None until a full pass succeeds.
+        self._since: datetime | None = None
+        self._last_reconcile = 0.0
+        self._task: asyncio.Task | None = None
+
+        self.runs = 0
+        self.reconciles = 0
+        self.refreshed = 0
+        self.failures = 0
+
+    async def run_once(self) -> int:
+        """Apply due transitions (or reconcile); returns the changed rows."""
+        full = (
+            self._since is None
+            or self._clock() - self._last_reconcile >= self._reconcile_interval
+        )
+        async with self._sessionmaker() as session:
+            async with session.begin():
+                result = await session.execute(
+                    refresh_due_stmt(None if full else self._since)
+                )
+                now, refreshed = result.one()
+
+        self._since = now
+        self.runs += 1
+        self.refreshed += refreshed
+        if full:
+            self._last_reconcile = self._clock()
+            self.reconciles += 1
+        if refreshed:
+            logger.info(
+                f"serving_ads: {refreshed} rows refreshed"
+                f"{' (full reconcile)' if full else ''}"
+            )
+            if self._response_cache is not None:
+                self._response_cache.invalidate("rag")
+        return refreshed
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                self.failures += 1
+                logger.exception("serving_ads refresh failed")
+            await asyncio.sleep(self._interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def aclose(self) -> None:
+        task, self._task = self._task, None
+        if task is None:
+            return
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "interval": self._interval,
+            "reconcile_interval": self._reconcile_interval,
+            "runs": self.runs,
+            "reconciles": self.reconciles,
+            "refreshed": self.refreshed,
+            "failures": self.failures,
+        }
+
+
+def build_serving_ads_scheduler(
+    settings: Settings,
+    sessionmaker: async_sessionmaker[AsyncSession] | None = None,
+    *,
+    response_cache: SemanticResponseCache | None = None,
+) -> ServingAdsScheduler | None:
+    if not settings.serving_ads_refresh_interval:
+        return None
+    return ServingAdsScheduler(
+        sessionmaker or get_async_sessionmaker(),
+        interval=settings.serving_ads_refresh_interval,
+        reconcile_interval=settings.serving_ads_reconcile_interval,
+        response_cache=response_cache,
+    )
@@ -0,0 +1,165 @@
+"""Coalescing of identical in-flight requests.
+
+Frontend retry storms and double submits send the same `ChatRequest` to
+Gemini several times at once. Requests are keyed by a hash of endpoint and
+payload (message, history, options); while one is running, identical ones
+await its result, and a short result window absorbs immediate retries.
+
+The shared call belongs to no single request. It runs as its own task in a
+fresh context under its own deadline (the path's default budget, not the
+leader's X-Request-Timeout), and must open whatever request-scoped
+resources it needs (DB sessions) itself. Each caller waits for it within
+its own deadline only.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from functools import partial
+from typing import Any, TypeVar
+
+from pydantic import BaseModel
+
+from app.core import deadline
+from app.core.settings import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def request_key(endpoint: str, request: BaseModel) -> str:
+    """Stable key for an endpoint + request payload."""
+    payload = request.model_dump_json()
+    return hashlib.sha256(f"{endpoint}\x00{payload}".encode("utf-8")).hexdigest()
+
+
+def mark_coalesced(response: T) -> T:
+    """Copy of a response model with `breakdown["coalesced"] = True`."""
+    breakdown = getattr(response, "breakdown", None)
+    if isinstance(response, BaseModel) and isinstance(breakdown, dict):
+        return response.model_copy(
+            update={"breakdown": {**breakdown, "coalesced": True}}
+        )
+    return response
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time and shares its result."""
+
+    def __init__(
+        self,
+        *,
+        enabled: bool = True,
+        result_ttl: float = 2.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.enabled = enabled
+        self._result_ttl = result_ttl
+        self._clock = clock
+        self._in_flight: dict[str, asyncio.Future] = {}
+        # Insertion order == expiry order, since the TTL is constant.
+        self._recent: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+        self.leaders = 0
+        self.coalesced = 0
+        self.window_hits = 0
+        self.failures = 0
+
+    def _expire_recent(self) -> None:
+        now = self._clock()
+        while self._recent:
+            key, (expires_at, _) = next(iter(self._recent.items()))
+            if expires_at > now:
+                break
+            del self._recent[key]
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[T]],
+        *,
+        timeout: float | None = None,
+    ) -> tuple[T, bool]:
+        """
+        Return `(result, shared)`; `shared` is True when the result came from
+        another identical request (in flight or within the result window).
+
+        `fn` runs detached from the calling request with `timeout` seconds
+        of its own; it must not use the caller's request-scoped resources.
+        """
+        if not self.enabled:
+            return await fn(), False
+
+        self._expire_recent()
+        recent = self._recent.get(key)
+        if recent is not None:
+            self.window_hits += 1
+            return recent[1], True
+
+        loop = asyncio.get_running_loop()
+        future = self._in_flight.get(key)
+        if future is not None and future.get_loop() is loop:
+            self.coalesced += 1
+            return await self._wait(future), True
+
+        # Its own task, so a disconnecting leader does not cancel the work the
+        # followers wait for, and an empty context, so it does not inherit the
+        # leader's deadline (or anything else request-scoped).
+        future = loop.create_task(
+            _run_detached(fn, timeout), context=contextvars.Context()
+        )
+        self._in_flight[key] = future
+        future.add_done_callback(partial(self._finish, key))
+        self.leaders += 1
+        return await self._wait(future), False
+
+    @staticmethod
+    async def _wait(future: asyncio.Future[T]) -> T:
+        # Bounded by the caller's own deadline; the shared call keeps going.
+        return await deadline.bounded(
+            asyncio.shield(future), what="coalesced request"
+        )
+
+    def _finish(self, key: str, future: asyncio.Future) -> None:
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            # Failures are never replayed; the next retry starts a new call.
+            self.failures += 1
+            return
+        if self._result_ttl > 0:
+            self._recent[key] = (self._clock() + self._result_ttl, future.result())
+            self._recent.move_to_end(key)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "result_ttl": self._result_ttl,
+            "in_flight": len(self._in_flight),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "window_hits": self.window_hits,
+            "failures": self.failures,
+        }
+
+
+async def _run_detached(fn: Callable[[], Awaitable[T]], timeout: float | None) -> T:
+    with deadline.deadline_scope(timeout):
+        return await fn()
+
+
+def build_single_flight(settings: Settings | None = None) -> SingleFlight:
+    settings = settings or get_settings()
+    return SingleFlight(
+        enabled=settings.single_flight_enabled,
+        result_ttl=settings.single_flight_result_ttl,
+    )
@@ -0,0 +1,88 @@
+"""Local token estimation for embedding requests.
+
+`count_tokens` is a full network round trip; paying it after every
+`embed_content` call doubles query-embedding latency only to report usage.
+The estimator approximates tokens from character counts and is calibrated
+from exact counts (usage metadata, or background `count_tokens` calls).
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass(frozen=True)
+class EmbeddingUsage:
+    """Token usage of one embed call; `estimated` is False only for real counts."""
+
+    tokens: int
+    estimated: bool
+    # Served from the query-embedding cache (no API call, zero tokens).
+    cached: bool = False
+
+
+class TokenEstimator:
+    """Chars-per-token estimator with an exponentially weighted calibration."""
+
+    def __init__(self, chars_per_token: float = 4.0, *, smoothing: float = 0.2):
+        if chars_per_token <= 0:
+            raise ValueError("chars_per_token must be positive")
+        self._chars_per_token = chars_per_token
+        self._smoothing = smoothing
+        self._lock = threading.Lock()
+        self.samples = 0
+        self.estimated_texts = 0
+        self._abs_error_sum = 0.0
+        self._exact_sum = 0
+
+    @property
+    def chars_per_token(self) -> float:
+        return self._chars_per_token
+
+    @staticmethod
+    def _chars(texts: list[str]) -> int:
+        return sum(len(text) for text in texts)
+
+    def estimate(self, texts: list[str]) -> int:
+        """Estimated tokens for `texts` (at least one per non-empty text)."""
+        total = 0
+        for text in texts:
+            if text:
+                total += max(1, math.ceil(len(text) / self._chars_per_token))
+        with self._lock:
+            self.estimated_texts += len(texts)
+        return total
+
+    def observe(self, texts: list[str], exact_tokens: int) -> None:
+        """Calibrate against an exact token count for the same texts."""
+        chars = self._chars(texts)
+        if chars <= 0 or exact_tokens <= 0:
+            return
+        estimate = sum(
+            max(1, math.ceil(len(text) / self._chars_per_token))
+            for text in texts
+            if text
+        )
+        with self._lock:
+            self.samples += 1
+            self._abs_error_sum += abs(estimate - exact_tokens)
+            self._exact_sum += exact_tokens
+            observed = chars / exact_tokens
+            self._chars_per_token += self._smoothing * (
+                observed - self._chars_per_token
+            )
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "chars_per_token": self._chars_per_token,
+                "calibration_samples": self.samples,
+                "estimated_texts": self.estimated_texts,
+                # Relative error of the estimate *before* each calibration step.
+                "mean_relative_error": (
+                    self._abs_error_sum / self._exact_sum if self._exact_sum else None
+                ),
+            }
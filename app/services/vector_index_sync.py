@@ -0,0 +1,168 @@
+"""Keeps the in-process vector index in step with `serving_ads`.
+
+The first run loads every row. Later runs fetch only rows whose
+`refreshed_at` moved past the watermark, plus the id column to detect
+removals, and apply them in place. `refreshed_at` is the writing
+transaction's start time, so a transaction that commits after a refresh
+can carry an older timestamp; the watermark therefore trails the newest
+row seen by `overlap`, and re-applied rows are harmless. Transactions open
+longer than that are caught by the full reload every `reconcile_interval`.
+
+Rows are applied in a worker thread: a full load of a large catalog would
+otherwise hold the event loop for as long as it takes.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections.abc import Callable
+from contextlib import suppress
+from datetime import datetime, timedelta
+from typing import Any
+
+import anyio
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.settings import Settings
+from app.db.session import get_async_sessionmaker
+from app.db.vector_index import (
+    IndexedAd,
+    InMemoryVectorIndex,
+    changed_rows_stmt,
+    get_vector_index,
+    live_ids_stmt,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class VectorIndexSync:
+    def __init__(
+        self,
+        index: InMemoryVectorIndex,
+        sessionmaker: async_sessionmaker[AsyncSession],
+        *,
+        interval: float,
+        overlap: timedelta = timedelta(seconds=60),
+        reconcile_interval: float = 3600.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._index = index
+        self._sessionmaker = sessionmaker
+        self._interval = interval
+        self._overlap = overlap
+        self._reconcile_interval = reconcile_interval
+        self._clock = clock
+
+        # Newest refreshed_at applied; None until the first full load.
+        self._watermark: datetime | None = None
+        self._last_reconcile = 0.0
+        self._task: asyncio.Task | None = None
+
+        self.refreshes = 0
+        self.reconciles = 0
+        self.upserted = 0
+        self.removed = 0
+        self.failures = 0
+
+    async def refresh_once(self) -> tuple[int, int]:
+        """Apply changes since the previous run (or reload); returns (upserted, removed)."""
+        full = (
+            self._watermark is None
+            or self._clock() - self._last_reconcile >= self._reconcile_interval
+        )
+        since = None if full else self._watermark - self._overlap
+        async with self._sessionmaker() as session:
+            rows = (await session.execute(changed_rows_stmt(since))).all()
+            live_ids = set((await session.execute(live_ids_stmt())).scalars())
+
+        upserted, removed = await anyio.to_thread.run_sync(
+            self._apply, rows, live_ids
+        )
+
+        self._index.mark_ready()
+        self.refreshes += 1
+        self.upserted += upserted
+        self.removed += removed
+        if full:
+            self._last_reconcile = self._clock()
+            self.reconciles += 1
+        return upserted, removed
+
+    def _apply(self, rows: list[Any], live_ids: set[int]) -> tuple[int, int]:
+        upserted = 0
+        watermark = self._watermark
+        for row in rows:
+            ad = IndexedAd(
+                id=row.id,
+                title=row.title,
+                description=row.description,
+                keywords=row.keywords,
+                url=row.url,
+                image_url=row.image_url,
+                cpc=row.cpc,
+            )
+            if row.embedding is not None and self._index.upsert(ad, row.embedding):
+                upserted += 1
+            else:
+                self._index.remove(row.id)
+            if watermark is None or row.refreshed_at > watermark:
+                watermark = row.refreshed_at
+
+        removed = 0
+        for ad_id in self._index.ids() - live_ids:
+            removed += self._index.remove(ad_id)
+
+        self._watermark = watermark
+        return upserted, removed
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh_once()
+            except Exception:
+                self.failures += 1
+                logger.exception("Vector index refresh failed")
+            await asyncio.sleep(self._interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def aclose(self) -> None:
+        task, self._task = self._task, None
+        if task is None:
+            return
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+
+    def stats(self) -> dict[str, object]:
+        return {
+            **self._index.stats(),
+            "interval": self._interval,
+            "refreshes": self.refreshes,
+            "reconciles": self.reconciles,
+            "upserted": self.upserted,
+            "removed": self.removed,
+            "failures": self.failures,
+        }
+
+
+def build_vector_index_sync(
+    settings: Settings,
+    sessionmaker: async_sessionmaker[AsyncSession] | None = None,
+) -> VectorIndexSync | None:
+    index = get_vector_index()
+    # Snapshot indexes are refreshed by the exporter, not per process.
+    if not isinstance(index, InMemoryVectorIndex):
+        return None
+    return VectorIndexSync(
+        index,
+        sessionmaker or get_async_sessionmaker(),
+        interval=settings.vector_index_refresh_interval,
+        overlap=timedelta(seconds=settings.vector_index_watermark_overlap),
+        reconcile_interval=settings.vector_index_reconcile_interval,
+    )
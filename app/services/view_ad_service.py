@@ -1,5 +1,6 @@
 import logging
 from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, joinedload
 from app.db.models import Ad, AdCampaign
 from app.db.session import get_sessionmaker
@@ -88,3 +89,16 @@ class ViewAdService:
         finally:
             # Always close the session
             db.close()
+
+
+class AsyncViewAdService:
+    """`ViewAdService.get_ad` on an `AsyncSession`, for the request path."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_ad(self, ad_id: int) -> Optional[Ad]:
+        """
+        Retrieve an ad by ID.
+        """
+        return await self.db.get(Ad, ad_id)
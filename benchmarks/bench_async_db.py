@@ -0,0 +1,137 @@
+"""Benchmark: concurrent requests against a slow DB, sync vs. async sessions.
+
+Runs N concurrent request handlers, each doing one DB round trip that takes
+LATENCY seconds, and compares:
+
+- `sync`: the previous request path (a blocking `Session` call inside an
+  `async def` endpoint, which stalls the event loop for the round trip)
+- `async`: the current request path (`AsyncSession` on asyncpg)
+
+Besides throughput it reports the worst event-loop stall, measured by a
+ticker task that should wake every 10ms.
+
+With BACKEND=fake (default) the DB is simulated by a session that sleeps.
+With BACKEND=postgres each round trip is a real `SELECT pg_sleep(LATENCY)`
+on DATABASE_URL through the app's engines.
+
+Run:
+  python -m benchmarks.bench_async_db
+  REQUESTS=200 LATENCY=0.05 python -m benchmarks.bench_async_db
+  BACKEND=postgres DATABASE_URL=postgresql://... python -m benchmarks.bench_async_db
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import statistics
+import time
+from types import SimpleNamespace
+
+from sqlalchemy import text
+
+from app.db.session import get_async_sessionmaker, get_sessionmaker
+from app.services.view_ad_service import AsyncViewAdService, ViewAdService
+
+_AD = SimpleNamespace(id=1, title="Tent", description="2-person tent")
+
+
+class _SlowQuery:
+    def __init__(self, latency: float):
+        self._latency = latency
+
+    def filter(self, *args):
+        return self
+
+    def first(self):
+        time.sleep(self._latency)
+        return _AD
+
+
+class _SlowSession:
+    def __init__(self, latency: float):
+        self._latency = latency
+
+    def query(self, *args):
+        return _SlowQuery(self._latency)
+
+
+class _SlowAsyncSession:
+    def __init__(self, latency: float):
+        self._latency = latency
+
+    async def get(self, model, ident):
+        await asyncio.sleep(self._latency)
+        return _AD
+
+
+async def _fake_handler(mode: str, latency: float) -> None:
+    if mode == "sync":
+        ViewAdService(_SlowSession(latency)).get_ad(1)
+    else:
+        await AsyncViewAdService(_SlowAsyncSession(latency)).get_ad(1)
+
+
+async def _postgres_handler(mode: str, latency: float) -> None:
+    stmt = text("SELECT pg_sleep(:latency)").bindparams(latency=latency)
+    if mode == "sync":
+        with get_sessionmaker()() as db:
+            db.execute(stmt)
+    else:
+        async with get_async_sessionmaker()() as db:
+            await db.execute(stmt)
+
+
+async def _run(mode: str, backend: str, requests: int, latency: float) -> dict[str, float]:
+    handler = _postgres_handler if backend == "postgres" else _fake_handler
+    stalls: list[float] = []
+    done = asyncio.Event()
+
+    async def _ticker() -> None:
+        interval = 0.01
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            stalls.append(time.perf_counter() - start - interval)
+
+    # All requests arrive at `start`; latency includes time spent queued
+    # behind a blocked event loop.
+    async def _one() -> float:
+        await handler(mode, latency)
+        return time.perf_counter() - start
+
+    ticker = asyncio.create_task(_ticker())
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(_one() for _ in range(requests)))
+    wall = time.perf_counter() - start
+    done.set()
+    await ticker
+
+    latencies = sorted(latencies)
+    return {
+        "p50": statistics.median(latencies),
+        "p99": latencies[max(0, int(len(latencies) * 0.99) - 1)],
+        "wall": wall,
+        "throughput": requests / wall,
+        "max_stall": max(stalls, default=0.0),
+    }
+
+
+def main() -> None:
+    backend = os.getenv("BACKEND", "fake")
+    requests = int(os.getenv("REQUESTS", "100"))
+    latency = float(os.getenv("LATENCY", "0.05"))
+
+    print(f"backend={backend} requests={requests} db_latency={latency:.3f}s")
+    print(f"{'mode':<6} {'p50':>8} {'p99':>8} {'wall':>8} {'req/s':>8} {'max stall':>10}")
+    for mode in ("sync", "async"):
+        r = asyncio.run(_run(mode, backend, requests, latency))
+        print(
+            f"{mode:<6} {r['p50']:>8.3f} {r['p99']:>8.3f} {r['wall']:>8.3f} "
+            f"{r['throughput']:>8.1f} {r['max_stall']:>10.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Benchmark: in-flight Gemini capacity, worker threads vs. native async.
+
+Runs N concurrent `GeminiService.generate_chat_response` calls against a
+mocked backend that takes LATENCY seconds per generation, and compares:
+
+- `to_thread`: the previous implementation (blocking SDK call wrapped in
+  `asyncio.to_thread`, bounded by the default executor's worker count)
+- `aio`: the current implementation (`client.aio`, one event loop)
+
+Run:
+  GEMINI_API_KEY=dummy python -m benchmarks.bench_gemini_concurrency
+  GEMINI_API_KEY=dummy REQUESTS=500 LATENCY=0.5 python -m benchmarks.bench_gemini_concurrency
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import statistics
+import time
+from types import SimpleNamespace
+
+from app.core.settings import get_settings
+from app.services.gemini_service import GeminiService
+
+
+class _InFlight:
+    def __init__(self) -> None:
+        self.current = 0
+        self.peak = 0
+
+    def enter(self) -> None:
+        self.current += 1
+        self.peak = max(self.peak, self.current)
+
+    def exit(self) -> None:
+        self.current -= 1
+
+
+def _response() -> SimpleNamespace:
+    return SimpleNamespace(
+        text="ok", usage_metadata=SimpleNamespace(total_token_count=1)
+    )
+
+
+class _SlowBackend:
+    """Fake genai.Client exposing both the sync and the aio surface."""
+
+    def __init__(self, latency: float, in_flight: _InFlight):
+        backend = self
+
+        class _SyncModels:
+            def generate_content(self, **kwargs):
+                in_flight.enter()
+                try:
+                    time.sleep(backend.latency)
+                    return _response()
+                finally:
+                    in_flight.exit()
+
+        class _AsyncModels:
+            async def generate_content(self, **kwargs):
+                in_flight.enter()
+                try:
+                    await asyncio.sleep(backend.latency)
+                    return _response()
+                finally:
+                    in_flight.exit()
+
+        self.latency = latency
+        self.models = _SyncModels()
+        self.aio = SimpleNamespace(models=_AsyncModels())
+
+
+class _FakeRegistry:
+    def __init__(self, backend: _SlowBackend):
+        self._backend = backend
+
+    def client(self, purpose: str = "chat") -> _SlowBackend:
+        return self._backend
+
+
+async def _run(mode: str, requests: int, latency: float) -> dict[str, float]:
+    in_flight = _InFlight()
+    backend = _SlowBackend(latency, in_flight)
+    service = GeminiService(settings=get_settings(), clients=_FakeRegistry(backend))
+
+    async def _one() -> float:
+        start = time.perf_counter()
+        if mode == "to_thread":
+            await asyncio.to_thread(
+                backend.models.generate_content, model="m", contents=[]
+            )
+        else:
+            await service.generate_chat_response(message="hi", history=[])
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(_one() for _ in range(requests)))
+    wall = time.perf_counter() - start
+
+    latencies = sorted(latencies)
+    return {
+        "peak_in_flight": in_flight.peak,
+        "p50": statistics.median(latencies),
+        "p99": latencies[max(0, int(len(latencies) * 0.99) - 1)],
+        "wall": wall,
+        "throughput": requests / wall,
+    }
+
+
+def main() -> None:
+    requests = int(os.getenv("REQUESTS", "300"))
+    latency = float(os.getenv("LATENCY", "0.2"))
+
+    print(f"requests={requests} backend_latency={latency:.3f}s")
+    print(f"{'mode':<10} {'in-flight':>9} {'p50':>8} {'p99':>8} {'wall':>8} {'req/s':>8}")
+    for mode in ("to_thread", "aio"):
+        r = asyncio.run(_run(mode, requests, latency))
+        print(
+            f"{mode:<10} {r['peak_in_flight']:>9} {r['p50']:>8.3f} "
+            f"{r['p99']:>8.3f} {r['wall']:>8.3f} {r['throughput']:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
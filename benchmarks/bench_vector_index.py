@@ -0,0 +1,135 @@
+"""Benchmark: top-k ad retrieval, in-process NumPy index vs. pgvector.
+
+- `memory`: `InMemoryVectorIndex.search` (one matrix-vector product plus
+  `argpartition`, exact) over SIZES random 768-d ads
+- `pgvector`: the current `search_stmt` (HNSW scan of `serving_ads`) on
+  DATABASE_URL, including the network round trip; only with
+  BACKEND=postgres. The memory index is then loaded from the same
+  `serving_ads` through `VectorIndexSync`, and pgvector's recall is
+  measured against its exact results.
+
+Also reports the memory index's load time and matrix size.
+
+Run:
+  python -m benchmarks.bench_vector_index
+  SIZES=1000,10000 QUERIES=500 python -m benchmarks.bench_vector_index
+  BACKEND=postgres DATABASE_URL=postgresql://... python -m benchmarks.bench_vector_index
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import statistics
+import time
+from decimal import Decimal
+
+import numpy as np
+
+from app.core.settings import get_settings
+from app.db.retrieval import AsyncAdsVectorRepository
+from app.db.session import get_async_sessionmaker
+from app.db.vector_index import IndexedAd, InMemoryVectorIndex
+from app.services.vector_index_sync import VectorIndexSync
+
+_DIM = 768
+
+
+def _percentiles(latencies: list[float]) -> tuple[float, float]:
+    latencies = sorted(latencies)
+    p99 = latencies[max(0, int(len(latencies) * 0.99) - 1)]
+    return statistics.median(latencies) * 1000, p99 * 1000
+
+
+def _time_memory(index: InMemoryVectorIndex, queries: np.ndarray, top_k: int):
+    latencies: list[float] = []
+    results: list[list[int]] = []
+    for query in queries:
+        start = time.perf_counter()
+        matches = index.search(query, top_k)
+        latencies.append(time.perf_counter() - start)
+        results.append([ad.id for ad, _, _ in matches])
+    return latencies, results
+
+
+def _synthetic(size: int, rng: np.random.Generator) -> tuple[InMemoryVectorIndex, float]:
+    vectors = rng.random((size, _DIM), dtype=np.float32)
+    index = InMemoryVectorIndex(dim=_DIM)
+    start = time.perf_counter()
+    for i, vector in enumerate(vectors):
+        ad = IndexedAd(
+            id=i + 1,
+            title=f"ad {i + 1}",
+            description="d",
+            keywords=None,
+            url="https://example.com",
+            image_url=None,
+            cpc=Decimal("0.50"),
+        )
+        index.upsert(ad, vector)
+    return index, time.perf_counter() - start
+
+
+async def _postgres(queries: np.ndarray, top_k: int) -> None:
+    sessionmaker = get_async_sessionmaker()
+    index = InMemoryVectorIndex(dim=_DIM)
+    start = time.perf_counter()
+    await VectorIndexSync(index, sessionmaker, interval=60).refresh_once()
+    load = time.perf_counter() - start
+
+    settings = get_settings()
+    latencies: list[float] = []
+    results: list[list[int]] = []
+    async with sessionmaker() as session:
+        for query in queries:
+            # A repository with an unloaded index always goes to Postgres.
+            repo = AsyncAdsVectorRepository(
+                session, settings, index=InMemoryVectorIndex(dim=_DIM)
+            )
+            start = time.perf_counter()
+            async with session.begin():
+                matches = await repo.search_ads_by_embedding(query.tolist(), top_k)
+            latencies.append(time.perf_counter() - start)
+            results.append([m.ad.id for m in matches])
+
+    memory_latencies, exact = _time_memory(index, queries, top_k)
+    recall = statistics.mean(
+        len(set(got) & set(want)) / max(len(want), 1)
+        for got, want in zip(results, exact)
+    )
+    _report(len(index), "pgvector", latencies, recall)
+    _report(len(index), "memory", memory_latencies, 1.0)
+    print(f"memory index loaded {len(index)} ads from serving_ads in {load:.2f}s")
+
+
+def _report(size: int, name: str, latencies: list[float], recall: float) -> None:
+    p50, p99 = _percentiles(latencies)
+    print(f"{size:>8} {name:<9} {p50:>9.3f} {p99:>9.3f} {recall:>7.2f}")
+
+
+def main() -> None:
+    backend = os.getenv("BACKEND", "memory")
+    sizes = [int(s) for s in os.getenv("SIZES", "1000,10000,100000").split(",")]
+    n_queries = int(os.getenv("QUERIES", "200"))
+    top_k = int(os.getenv("TOP_K", "5"))
+
+    rng = np.random.default_rng(0)
+    queries = rng.random((n_queries, _DIM), dtype=np.float32)
+
+    print(f"backend={backend} queries={n_queries} top_k={top_k}")
+    print(f"{'ads':>8} {'index':<9} {'p50 ms':>9} {'p99 ms':>9} {'recall':>7}")
+    if backend == "postgres":
+        asyncio.run(_postgres(queries, top_k))
+        return
+    for size in sizes:
+        index, load = _synthetic(size, rng)
+        latencies, _ = _time_memory(index, queries, top_k)
+        _report(size, "memory", latencies, 1.0)
+        print(
+            f"{'':>8} loaded in {load:.2f}s, "
+            f"{index.stats()['bytes'] / 2**20:.0f} MiB matrix"
+        )
+
+
+if __name__ == "__main__":
+    main()
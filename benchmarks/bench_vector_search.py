@@ -0,0 +1,157 @@
+"""Benchmark: vector retrieval latency, join + DISTINCT vs. the serving table.
+
+Seeds SIZES ads (random 768-d embeddings, half of the campaigns running)
+into a scratch schema, builds the HNSW indexes, and times QUERIES searches
+with:
+
+- `join_distinct`: the original query (ads -> ad_campaigns -> campaigns,
+  DISTINCT, ORDER BY CAST(<=> AS FLOAT)), which the planner answers with
+  an exact scan and sort
+- `serving_ads`: the current `search_stmt`, an HNSW scan of the
+  trigger-maintained table of eligible ads, with VECTOR_ITERATIVE_SCAN /
+  VECTOR_EF_SEARCH applied
+
+Recall is measured against the exact top-k. Needs Postgres with pgvector
+(>= 0.8 for iterative scans); the scratch schema is dropped at the end.
+Seeding 1M ads takes a while and several GB.
+
+Run:
+  DATABASE_URL=postgresql://... python -m benchmarks.bench_vector_search
+  DATABASE_URL=postgresql://... SIZES=10000,100000,1000000 QUERIES=50 python -m benchmarks.bench_vector_search
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import statistics
+import time
+
+import sqlalchemy as sa
+
+from app.core.settings import get_settings
+from app.db.base import Base
+from app.db.models import Ad, AdCampaign, Campaign
+from app.db.retrieval import search_settings, search_stmt
+from app.db.serving import install_serving_ads
+
+_SCHEMA = "bench_vector_search"
+_DIM = 768
+
+
+def _join_distinct_stmt(query_embedding: list[float], top_k: int) -> sa.Select:
+    distance_expr = sa.cast(Ad.embedding.op("<=>")(query_embedding), sa.Float)
+    return (
+        sa.select(Ad.id, distance_expr.label("distance"))
+        .join(AdCampaign, Ad.id == AdCampaign.ad_id)
+        .join(Campaign, AdCampaign.campaign_id == Campaign.id)
+        .where(Ad.embedding.is_not(None), Campaign.is_running)
+        .distinct()
+        .order_by(distance_expr.asc())
+        .limit(top_k)
+    )
+
+
+def _seed(engine: sa.Engine, size: int) -> None:
+    with engine.begin() as conn:
+        conn.execute(sa.text(f"DROP SCHEMA IF EXISTS {_SCHEMA} CASCADE"))
+        conn.execute(sa.text(f"CREATE SCHEMA {_SCHEMA}"))
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(sa.text(
+            "INSERT INTO campaigns (title, company, budget, spending, start_date) "
+            "SELECT 'c' || g, 'co', 100, CASE WHEN g % 2 = 0 THEN 0 ELSE 200 END, "
+            "now() - interval '1 day' FROM generate_series(1, 1000) g"
+        ))
+        conn.execute(sa.text(
+            "INSERT INTO ads (title, description, url, embedding) "
+            "SELECT 'ad ' || g, 'd', 'https://example.com', "
+            f"(SELECT array_agg(random())::vector FROM generate_series(1, {_DIM}) d WHERE g > 0) "
+            "FROM generate_series(1, :size) g"
+        ), {"size": size})
+        conn.execute(sa.text(
+            "INSERT INTO ad_campaigns (ad_id, campaign_id) "
+            "SELECT id, 1 + id % 1000 FROM ads"
+        ))
+    with engine.begin() as conn:
+        # Backfill serving_ads first, then build its HNSW index in one go.
+        conn.execute(sa.text("DROP INDEX ix_serving_ads_embedding_hnsw"))
+        install_serving_ads(conn)
+    with engine.begin() as conn:
+        conn.execute(sa.text("SET maintenance_work_mem = '2GB'"))
+        for table in ("ads", "serving_ads"):
+            conn.execute(sa.text(
+                f"CREATE INDEX ix_{table}_embedding_hnsw ON {table} "
+                "USING hnsw (embedding vector_cosine_ops)"
+            ))
+        conn.execute(sa.text("ANALYZE"))
+
+
+def _time(engine: sa.Engine, build, queries: list[list[float]], top_k: int, settings=()):
+    latencies: list[float] = []
+    results: list[list[int]] = []
+    for query in queries:
+        with engine.begin() as conn:
+            for statement in settings:
+                conn.execute(statement)
+            start = time.perf_counter()
+            rows = conn.execute(build(query, top_k)).all()
+            latencies.append(time.perf_counter() - start)
+        results.append([row[0] if isinstance(row[0], int) else row[0].id for row in rows])
+    return latencies, results
+
+
+def _exact_ids(engine: sa.Engine, queries: list[list[float]], top_k: int) -> list[list[int]]:
+    with engine.begin() as conn:
+        conn.execute(sa.text("SET LOCAL enable_indexscan = off"))
+        return [
+            [row[0] for row in conn.execute(_join_distinct_stmt(q, top_k)).all()]
+            for q in queries
+        ]
+
+
+def main() -> None:
+    url = os.getenv("DATABASE_URL") or get_settings().database_url
+    sizes = [int(s) for s in os.getenv("SIZES", "10000,100000,1000000").split(",")]
+    n_queries = int(os.getenv("QUERIES", "50"))
+    top_k = int(os.getenv("TOP_K", "5"))
+
+    engine = sa.create_engine(
+        url, connect_args={"options": f"-csearch_path={_SCHEMA},public"}
+    )
+    with engine.begin() as conn:
+        conn.execute(sa.text("CREATE EXTENSION IF NOT EXISTS vector"))
+
+    rng = random.Random(0)
+    queries = [[rng.random() for _ in range(_DIM)] for _ in range(n_queries)]
+    settings = search_settings(get_settings())
+
+    print(f"queries={n_queries} top_k={top_k} settings={[str(s) for s in settings]}")
+    print(f"{'ads':>8} {'query':<14} {'p50 ms':>8} {'p99 ms':>8} {'recall':>7}")
+    try:
+        for size in sizes:
+            _seed(engine, size)
+            exact = _exact_ids(engine, queries, top_k)
+            for name, build, extra in (
+                ("join_distinct", _join_distinct_stmt, ()),
+                ("serving_ads", search_stmt, settings),
+            ):
+                latencies, results = _time(engine, build, queries, top_k, extra)
+                latencies.sort()
+                recall = statistics.mean(
+                    len(set(got) & set(want)) / max(len(want), 1)
+                    for got, want in zip(results, exact)
+                )
+                print(
+                    f"{size:>8} {name:<14} {statistics.median(latencies) * 1000:>8.1f} "
+                    f"{latencies[max(0, int(len(latencies) * 0.99) - 1)] * 1000:>8.1f} "
+                    f"{recall:>7.2f}"
+                )
+    finally:
+        with engine.begin() as conn:
+            conn.execute(sa.text(f"DROP SCHEMA IF EXISTS {_SCHEMA} CASCADE"))
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
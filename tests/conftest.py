@@ -0,0 +1,37 @@
+"""Shared test helpers."""
+
+import json
+
+import pytest
+
+
+class FakeClock:
+    """Stands in for `time.monotonic`/`time.time`; tests move `now` by hand."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def fake_clock() -> FakeClock:
+    return FakeClock()
+
+
+def _parse_sse(body: str) -> list[tuple[str, dict]]:
+    events = []
+    for frame in body.replace("\r\n", "\n").split("\n\n"):
+        fields = dict(
+            line.split(": ", 1) for line in frame.splitlines() if ": " in line
+        )
+        if "event" in fields:
+            events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+@pytest.fixture
+def parse_sse():
+    """`(event, data)` pairs of a `text/event-stream` body."""
+    return _parse_sse
@@ -1,5 +1,9 @@
+import asyncio
+import gc
+
 from fastapi.testclient import TestClient
 
+from app.core.settings import Settings
 from app.main import create_app
 
 
@@ -88,3 +92,128 @@ def test_agentic_chat_keeps_legacy_ad_response_compatibility():
     assert payload["breakdown"]["ad_llm_tokens"] == 30
     assert payload["breakdown"]["ad_embedding_tokens"] == 0
     assert payload["breakdown"]["ad_total_tokens"] == 30
+
+
+class _FakeStreamingGeminiService:
+    async def stream_chat_response(self, message: str, history):
+        for chunk in ("Pack ", "a tent."):
+            yield {"type": "token", "text": chunk}
+        yield {
+            "type": "done",
+            "generation_time": 0.3,
+            "time_to_first_token": 0.05,
+            "used_tokens": 40,
+        }
+
+
+class _SlowAdAgentService:
+    def __init__(self, delay: float):
+        self._delay = delay
+        self.cancelled = False
+
+    async def analyze_and_get_ad(self, history, latest_message: str):
+        try:
+            await asyncio.sleep(self._delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return {
+            "ad_text": "[Tent](https://example.com/tent)",
+            "generation_time": self._delay,
+            "ad_llm_tokens": 70,
+            "ad_embedding_tokens": 20,
+        }
+
+
+class _FailingStreamingGeminiService:
+    async def stream_chat_response(self, message: str, history):
+        yield {"type": "token", "text": "Pack "}
+        # Let the ad agent finish (and fail) before the chat stream does.
+        await asyncio.sleep(0.05)
+        raise RuntimeError("chat stream broke")
+
+
+class _FailingAdAgentService:
+    async def analyze_and_get_ad(self, history, latest_message: str):
+        raise RuntimeError("ad agent broke")
+
+
+def _stream_client(
+    ad_agent, grace_period: float, gemini_service=None
+) -> TestClient:
+    app = create_app()
+
+    import app.api.agentic as agentic_api
+
+    app.dependency_overrides[agentic_api.get_gemini_service] = (
+        lambda: gemini_service or _FakeStreamingGeminiService()
+    )
+    app.dependency_overrides[agentic_api.get_agentic_service] = lambda: ad_agent
+    app.dependency_overrides[agentic_api.get_settings] = lambda: Settings(
+        AGENTIC_AD_GRACE_PERIOD=grace_period
+    )
+    return TestClient(app)
+
+
+def test_agentic_stream_appends_ad_after_chat_tokens(parse_sse):
+    client = _stream_client(_SlowAdAgentService(delay=0.05), grace_period=1.0)
+
+    r = client.post(
+        "/api/v1/agentic-chat/stream",
+        json={"message": "I plan to go camping", "history": []},
+    )
+
+    assert r.status_code == 200
+    events = parse_sse(r.text)
+    assert [name for name, _ in events] == ["token", "token", "ad", "done"]
+    assert events[2][1]["ad_text"] == "[Tent](https://example.com/tent)"
+
+    done = events[-1][1]
+    assert done["used_tokens"] == 40 + 90
+    assert done["time_to_first_token"] == 0.05
+    assert done["breakdown"]["ad_total_tokens"] == 90
+    assert done["breakdown"]["ad_injected"] is True
+    assert done["breakdown"]["ad_dropped"] is False
+
+
+def test_agentic_stream_drops_ad_after_grace_period(parse_sse):
+    ad_agent = _SlowAdAgentService(delay=5.0)
+    client = _stream_client(ad_agent, grace_period=0.05)
+
+    r = client.post(
+        "/api/v1/agentic-chat/stream",
+        json={"message": "I plan to go camping", "history": []},
+    )
+
+    events = parse_sse(r.text)
+    assert [name for name, _ in events] == ["token", "token", "done"]
+
+    done = events[-1][1]
+    assert done["used_tokens"] == 40
+    assert done["breakdown"]["ad_dropped"] is True
+    assert done["breakdown"]["ad_injected"] is False
+    assert ad_agent.cancelled
+
+
+def test_agentic_stream_retrieves_failed_ad_agent_exception(
+    parse_sse, caplog, monkeypatch
+):
+    import app.api.agentic as agentic_api
+
+    # A logged traceback would keep the stream's frame, and the task, alive.
+    monkeypatch.setattr(agentic_api.logger, "disabled", True)
+    client = _stream_client(
+        _FailingAdAgentService(),
+        grace_period=1.0,
+        gemini_service=_FailingStreamingGeminiService(),
+    )
+
+    r = client.post(
+        "/api/v1/agentic-chat/stream",
+        json={"message": "I plan to go camping", "history": []},
+    )
+    gc.collect()
+
+    events = parse_sse(r.text)
+    assert [name for name, _ in events] == ["token", "error"]
+    assert "never retrieved" not in caplog.text
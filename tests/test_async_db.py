@@ -0,0 +1,155 @@
+"""Async DB path: URL handling, endpoints on AsyncSession, and one real query.
+
+The vector query test needs a disposable Postgres with pgvector:
+  TEST_DATABASE_URL=postgresql://... python -m pytest tests/test_async_db.py
+It creates its tables in a scratch schema and drops it afterwards.
+"""
+
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+import sqlalchemy as sa
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.base import Base
+from app.db.engine import get_async_engine, to_async_url
+from app.db.retrieval import search_stmt
+from app.db.serving import install_serving_ads
+from app.dependencies import get_async_db
+from app.main import create_app
+from app.services.view_ad_service import ViewAdService
+
+_SCHEMA = "test_async_db"
+
+
+class _FakeAsyncSession:
+    """Records calls; every DB method is a coroutine like on AsyncSession."""
+
+    def __init__(self, ads=None):
+        self._ads = ads or {}
+        self.added = []
+        self.commits = 0
+
+    async def get(self, model, ident):
+        return self._ads.get(ident)
+
+    def add(self, obj):
+        self.added.append(obj)
+
+    async def commit(self):
+        self.commits += 1
+
+    async def refresh(self, obj):
+        obj.id = 41
+        obj.created_at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    async def rollback(self):
+        pass
+
+
+def _client(session: _FakeAsyncSession) -> TestClient:
+    app = create_app()
+    app.dependency_overrides[get_async_db] = lambda: session
+    return TestClient(app)
+
+
+def test_async_url_uses_asyncpg_and_its_ssl_option():
+    url = to_async_url(
+        "postgresql://user:pw@db.example/ads?sslmode=require&channel_binding=require"
+    )
+
+    assert url.drivername == "postgresql+asyncpg"
+    assert dict(url.query) == {"ssl": "require"}
+    assert url.database == "ads"
+
+
+def test_view_ad_reads_through_async_session(monkeypatch):
+    monkeypatch.setattr(ViewAdService, "track_ad_click", staticmethod(lambda ad_id: None))
+    ad = SimpleNamespace(
+        id=7, title="Tent", description="2-person tent", keywords=["camping"], image_url=None
+    )
+    client = _client(_FakeAsyncSession(ads={7: ad}))
+
+    r = client.get("/api/v1/view-ad/7")
+    assert r.status_code == 200
+    assert r.json()["title"] == "Tent"
+
+    assert client.get("/api/v1/view-ad/8").status_code == 404
+
+
+def test_save_chat_history_commits_through_async_session():
+    session = _FakeAsyncSession()
+    client = _client(session)
+
+    r = client.post(
+        "/api/v1/save-chat-history",
+        json={
+            "mode": "rag",
+            "history": [{"role": "user", "parts": ["hi"]}],
+            "helpful": True,
+        },
+    )
+
+    assert r.status_code == 200
+    assert r.json()["id"] == 41
+    assert session.commits == 1
+    assert session.added[0].history[0]["parts"] == ["hi"]
+
+
+def test_vector_search_runs_through_the_async_engine():
+    url = os.getenv("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    engine = sa.create_engine(
+        url, connect_args={"options": f"-csearch_path={_SCHEMA},public"}
+    )
+    with engine.begin() as conn:
+        conn.execute(sa.text("CREATE EXTENSION IF NOT EXISTS vector"))
+        conn.execute(sa.text(f"DROP SCHEMA IF EXISTS {_SCHEMA} CASCADE"))
+        conn.execute(sa.text(f"CREATE SCHEMA {_SCHEMA}"))
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        install_serving_ads(conn)
+        conn.execute(
+            sa.text(
+                "INSERT INTO campaigns (title, company, budget, spending, start_date) "
+                "VALUES ('c', 'co', 100, 0, :start)"
+            ),
+            {"start": datetime.now(timezone.utc) - timedelta(days=1)},
+        )
+        conn.execute(sa.text(
+            "INSERT INTO ads (title, description, url, embedding) "
+            "VALUES ('Tent', 'd', 'https://example.com', "
+            "(SELECT array_fill(0.5, ARRAY[768])::vector))"
+        ))
+        conn.execute(sa.text(
+            "INSERT INTO ad_campaigns (ad_id, campaign_id) SELECT id, 1 FROM ads"
+        ))
+
+    async def search():
+        async_engine = get_async_engine(url)
+        try:
+            async with AsyncSession(async_engine) as session, session.begin():
+                await session.execute(
+                    sa.text(f"SET LOCAL search_path = {_SCHEMA}, public")
+                )
+                return (await session.execute(search_stmt([0.5] * 768, 5))).all()
+        finally:
+            await async_engine.dispose()
+
+    try:
+        rows = asyncio.run(search())
+    finally:
+        get_async_engine.cache_clear()
+        with engine.begin() as conn:
+            conn.execute(sa.text(f"DROP SCHEMA {_SCHEMA} CASCADE"))
+        engine.dispose()
+
+    ad, _, distance = rows[0]
+    assert ad.title == "Tent"
+    assert len(ad.embedding) == 768  # parsed back from asyncpg's text form
+    assert distance < 1e-6
@@ -1,11 +1,21 @@
 from fastapi.testclient import TestClient
 
 from app.main import create_app
+from app.services.model_router import ModelRouter
+from app.services.response_cache import SemanticResponseCache
+from app.services.token_estimator import EmbeddingUsage
 
 
 class _FakeGeminiService:
+    def __init__(self):
+        self._router = ModelRouter(default_model="test-model")
+
     async def generate_chat_response(self, message: str, history):
-        return (f"echo:{message}", 0.123, 42)
+        async def _generate(tier):
+            return (f"echo:{message}", 0.123, 42)
+
+        result, _ = await self._router.run("chat", _generate)
+        return result
 
 
 def test_chat_happy_path(monkeypatch):
@@ -23,7 +33,7 @@ def test_chat_happy_path(monkeypatch):
         "response": "echo:hi",
         "generation_time": 0.123,
         "used_tokens": 42,
-        "breakdown": {"llm_call_count": 1},
+        "breakdown": {"llm_call_count": 1, "models": {"chat": "test-model"}},
     }
 
 
@@ -41,5 +51,114 @@ def test_chat_schema_defaults(monkeypatch):
         "response": "echo:hi",
         "generation_time": 0.123,
         "used_tokens": 42,
-        "breakdown": {"llm_call_count": 1},
+        "breakdown": {"llm_call_count": 1, "models": {"chat": "test-model"}},
     }
+
+
+class _FakeStreamingGeminiService:
+    async def stream_chat_response(self, message: str, history):
+        for text in ("Hel", "lo ", message):
+            yield {"type": "token", "text": text}
+        yield {
+            "type": "done",
+            "generation_time": 0.5,
+            "time_to_first_token": 0.1,
+            "used_tokens": 17,
+        }
+
+
+class _FailingStreamingGeminiService:
+    async def stream_chat_response(self, message: str, history):
+        yield {"type": "token", "text": "partial"}
+        raise RuntimeError("backend went away")
+
+
+def test_chat_stream_emits_tokens_then_done(parse_sse):
+    app = create_app()
+
+    import app.api.chat as chat_api
+
+    app.dependency_overrides[chat_api.get_gemini_service] = (
+        lambda: _FakeStreamingGeminiService()
+    )
+
+    client = TestClient(app)
+    r = client.post("/api/v1/chat/stream", json={"message": "world"})
+
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/event-stream")
+
+    events = parse_sse(r.text)
+    tokens = [data["text"] for name, data in events if name == "token"]
+    assert "".join(tokens) == "Hello world"
+
+    name, done = events[-1]
+    assert name == "done"
+    assert done["generation_time"] == 0.5
+    assert done["time_to_first_token"] == 0.1
+    assert done["used_tokens"] == 17
+
+
+def test_chat_stream_reports_errors_as_event(parse_sse):
+    app = create_app()
+
+    import app.api.chat as chat_api
+
+    app.dependency_overrides[chat_api.get_gemini_service] = (
+        lambda: _FailingStreamingGeminiService()
+    )
+
+    client = TestClient(app)
+    r = client.post("/api/v1/chat/stream", json={"message": "hi"})
+
+    events = parse_sse(r.text)
+    assert events[0] == ("token", {"text": "partial"})
+    assert events[-1][0] == "error"
+    assert "backend went away" in events[-1][1]["detail"]
+
+
+class _FakeCachingGeminiService:
+    _VECTORS = {
+        "running shoes": [1.0, 0.0],
+        "running shoes please": [0.99, 0.05],
+        "laptop for gaming": [0.0, 1.0],
+    }
+
+    def __init__(self):
+        self.llm_calls = 0
+
+    async def embed_text_with_usage_details(self, text: str):
+        return self._VECTORS[text], EmbeddingUsage(tokens=3, estimated=True)
+
+    async def generate_chat_response(self, message: str, history):
+        self.llm_calls += 1
+        return (f"echo:{message}", 0.2, 40)
+
+
+def test_chat_serves_paraphrases_from_semantic_cache():
+    app = create_app()
+
+    import app.api.chat as chat_api
+
+    gemini = _FakeCachingGeminiService()
+    cache = SemanticResponseCache(max_entries=8, ttl=60, threshold=0.95)
+    app.dependency_overrides[chat_api.get_gemini_service] = lambda: gemini
+    app.dependency_overrides[chat_api.get_semantic_response_cache] = lambda: cache
+
+    client = TestClient(app)
+    first = client.post("/api/v1/chat", json={"message": "running shoes"}).json()
+    second = client.post(
+        "/api/v1/chat", json={"message": "running shoes please"}
+    ).json()
+    other = client.post("/api/v1/chat", json={"message": "laptop for gaming"}).json()
+
+    assert first["breakdown"]["semantic_cache_hit"] is False
+    assert first["used_tokens"] == 43
+
+    assert second["response"] == "echo:running shoes"
+    assert second["used_tokens"] == 3
+    assert second["breakdown"]["semantic_cache_hit"] is True
+    assert second["breakdown"]["llm_call_count"] == 0
+
+    assert other["breakdown"]["semantic_cache_hit"] is False
+    assert gemini.llm_calls == 2
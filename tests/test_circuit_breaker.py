@@ -0,0 +1,171 @@
+import asyncio
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app.core.settings import Settings
+from app.db.session import is_query_canceled
+from app.services.circuit_breaker import (
+    DB_RETRIEVAL,
+    CircuitBreaker,
+    CircuitBreakers,
+    CircuitOpenError,
+)
+
+
+async def _ok():
+    return "ok"
+
+
+async def _boom():
+    raise ConnectionError("down")
+
+
+def _breaker(clock, **kwargs) -> CircuitBreaker:
+    return CircuitBreaker(
+        "gemini_generation",
+        failure_threshold=kwargs.pop("failure_threshold", 2),
+        recovery_timeout=kwargs.pop("recovery_timeout", 10.0),
+        clock=clock,
+        **kwargs,
+    )
+
+
+def test_breaker_opens_after_consecutive_failures_and_fails_fast(fake_clock):
+    breaker = _breaker(fake_clock)
+
+    async def _run():
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                await breaker.call(_boom)
+        with pytest.raises(CircuitOpenError) as exc_info:
+            await breaker.call(_ok)
+        return exc_info.value
+
+    error = asyncio.run(_run())
+
+    assert breaker.state == "open"
+    assert error.code == 503
+    stats = breaker.stats()
+    assert stats["opened"] == 1
+    assert stats["rejected"] == 1
+    assert stats["retry_in"] == 10.0
+    assert "ConnectionError: down" in stats["last_error"]
+
+
+def test_success_resets_the_failure_count(fake_clock):
+    breaker = _breaker(fake_clock)
+
+    async def _run():
+        with pytest.raises(ConnectionError):
+            await breaker.call(_boom)
+        await breaker.call(_ok)
+        with pytest.raises(ConnectionError):
+            await breaker.call(_boom)
+
+    asyncio.run(_run())
+
+    assert breaker.state == "closed"
+
+
+def test_half_open_probe_closes_or_reopens_the_breaker(fake_clock):
+    breaker = _breaker(fake_clock, failure_threshold=1)
+
+    async def _run():
+        with pytest.raises(ConnectionError):
+            await breaker.call(_boom)
+        assert not breaker.available()
+
+        fake_clock.now = 10.0
+        assert breaker.available()
+        assert breaker.stats()["state"] == "half_open"
+        with pytest.raises(ConnectionError):
+            await breaker.call(_boom)
+        assert breaker.state == "open"
+
+        fake_clock.now = 20.0
+        assert await breaker.call(_ok) == "ok"
+
+    asyncio.run(_run())
+
+    assert breaker.state == "closed"
+    assert breaker.opened == 2
+
+
+def test_half_open_admits_only_the_probe_calls(fake_clock):
+    breaker = _breaker(fake_clock, failure_threshold=1)
+
+    async def _run():
+        with pytest.raises(ConnectionError):
+            await breaker.call(_boom)
+        fake_clock.now = 10.0
+
+        release = asyncio.Event()
+
+        async def _slow_probe():
+            await release.wait()
+            return "ok"
+
+        probe = asyncio.create_task(breaker.call(_slow_probe))
+        await asyncio.sleep(0)
+        with pytest.raises(CircuitOpenError):
+            await breaker.call(_ok)
+        release.set()
+        return await probe
+
+    assert asyncio.run(_run()) == "ok"
+    assert breaker.state == "closed"
+
+
+def test_cancelled_probe_releases_its_slot_without_a_verdict(fake_clock):
+    breaker = _breaker(fake_clock, failure_threshold=1)
+
+    async def _run():
+        with pytest.raises(ConnectionError):
+            await breaker.call(_boom)
+        fake_clock.now = 10.0
+
+        probe = asyncio.create_task(breaker.call(lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+        assert breaker.state == "half_open"
+        assert breaker.available()
+
+    asyncio.run(_run())
+
+
+def test_statement_timeouts_count_as_cancellations(fake_clock):
+    breaker = _breaker(fake_clock, failure_threshold=1)
+
+    class _PgError(Exception):
+        def __init__(self, pgcode):
+            self.pgcode = pgcode
+
+    async def _timed_out():
+        raise OperationalError("SELECT ...", {}, _PgError("57014"))
+
+    async def _run():
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                await breaker.call(_timed_out, is_cancel=is_query_canceled)
+        assert breaker.state == "closed"
+        with pytest.raises(ConnectionError):
+            await breaker.call(_boom, is_cancel=is_query_canceled)
+        assert breaker.state == "open"
+
+    asyncio.run(_run())
+
+
+def test_disabled_breakers_never_open():
+    breakers = CircuitBreakers(Settings(CIRCUIT_BREAKER_ENABLED=False))
+    breaker = breakers.get(DB_RETRIEVAL)
+
+    for _ in range(10):
+        breaker.on_failure(ConnectionError("down"))
+
+    assert breaker.available()
+    assert breakers.open_circuits() == []
+    assert breakers.states()[DB_RETRIEVAL] == "disabled"
@@ -0,0 +1,143 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.models.chat import ChatMessage
+from app.services import conversation as conversation_module
+from app.services.conversation import (
+    SUMMARY_PREFIX,
+    ConversationAssembler,
+    HistoryBudget,
+)
+from app.services.token_estimator import TokenEstimator
+
+
+@pytest.fixture(autouse=True)
+def _clear_summary_cache():
+    conversation_module._SUMMARY_CACHE.clear()
+    conversation_module._PENDING_SUMMARIES.clear()
+    yield
+    conversation_module._SUMMARY_CACHE.clear()
+
+
+class _FakeSummaryModels:
+    def __init__(self):
+        self.prompts: list[str] = []
+
+    async def generate_content(self, **kwargs):
+        self.prompts.append(kwargs["contents"])
+        return SimpleNamespace(text=f"summary #{len(self.prompts)}")
+
+
+def _client(models):
+    return SimpleNamespace(aio=SimpleNamespace(models=models))
+
+
+def _history(n: int) -> list[ChatMessage]:
+    # 40 chars each -> 10 estimated tokens at 4 chars/token.
+    return [
+        ChatMessage(role="user" if i % 2 == 0 else "model", parts=[f"{i:02d}" * 20])
+        for i in range(n)
+    ]
+
+
+def _assembler(client=None, **options) -> ConversationAssembler:
+    return ConversationAssembler(
+        client, model="test-model", estimator=TokenEstimator(4.0), **options
+    )
+
+
+def test_short_history_is_sent_verbatim():
+    assembled = asyncio.run(_assembler().assemble(_history(3), HistoryBudget(max_tokens=100)))
+
+    assert assembled.messages == _history(3)
+    assert assembled.dropped_turns == 0
+
+
+def test_latest_turns_are_kept_within_budget():
+    assembled = asyncio.run(_assembler().assemble(_history(10), HistoryBudget(max_tokens=35)))
+
+    assert assembled.messages == _history(10)[-3:]
+    assert assembled.dropped_turns == 7
+    assert assembled.history_tokens == 30
+
+
+def test_max_turns_caps_the_window():
+    budget = HistoryBudget(max_tokens=0, max_turns=2, summarize=False)
+
+    assembled = asyncio.run(_assembler().assemble(_history(10), budget))
+
+    assert assembled.messages == _history(10)[-2:]
+
+
+def test_rolling_summary_is_computed_in_background_and_incrementally():
+    models = _FakeSummaryModels()
+    assembler = _assembler(_client(models))
+    budget = HistoryBudget(max_tokens=25)
+
+    async def _run():
+        # First long request: no summary yet, it is computed off the path.
+        first = await assembler.assemble(_history(6), budget)
+        await asyncio.gather(*conversation_module._SUMMARY_TASKS)
+
+        # Same conversation, next request: summary replaces older turns.
+        second = await assembler.assemble(_history(6), budget)
+
+        # Two more turns: only the new older turns are summarized.
+        await assembler.assemble(_history(8), budget)
+        await asyncio.gather(*conversation_module._SUMMARY_TASKS)
+        third = await assembler.assemble(_history(8), budget)
+        return first, second, third
+
+    first, second, third = asyncio.run(_run())
+
+    assert first.messages == _history(6)[-2:]
+    assert first.dropped_turns == 4
+
+    assert second.messages[0].parts[0] == f"{SUMMARY_PREFIX}summary #1"
+    assert second.messages[2:] == _history(6)[-2:]
+    assert second.summarized_turns == 4
+
+    assert third.messages[0].parts[0] == f"{SUMMARY_PREFIX}summary #2"
+    assert len(models.prompts) == 2
+    incremental_prompt = models.prompts[1]
+    assert "summary #1" in incremental_prompt
+    assert "04" * 20 in incremental_prompt
+    assert "00" * 20 not in incremental_prompt
+
+
+def test_first_trimmed_request_waits_for_its_summary():
+    models = _FakeSummaryModels()
+    assembler = _assembler(_client(models), summary_wait=1.0)
+
+    assembled = asyncio.run(
+        assembler.assemble(_history(6), HistoryBudget(max_tokens=25))
+    )
+
+    assert assembled.messages[0].parts[0] == f"{SUMMARY_PREFIX}summary #1"
+    assert assembled.messages[2:] == _history(6)[-2:]
+    assert assembled.summarized_turns == 4
+    assert assembled.dropped_turns == 0
+
+
+def test_slow_first_summary_drops_older_turns_on_cache_miss():
+    class _SlowSummaryModels(_FakeSummaryModels):
+        async def generate_content(self, **kwargs):
+            await asyncio.sleep(0.2)
+            return await super().generate_content(**kwargs)
+
+    assembler = _assembler(_client(_SlowSummaryModels()), summary_wait=0.01)
+
+    async def _run():
+        assembled = await assembler.assemble(
+            _history(6), HistoryBudget(max_tokens=25)
+        )
+        await asyncio.gather(*conversation_module._SUMMARY_TASKS)
+        return assembled
+
+    assembled = asyncio.run(_run())
+
+    assert assembled.messages == _history(6)[-2:]
+    assert assembled.summarized_turns == 0
+    assert assembled.dropped_turns == 4
@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import deadline
+from app.core.settings import Settings
+from app.main import create_app
+
+
+def _settings(**overrides) -> Settings:
+    return Settings(
+        REQUEST_TIMEOUT=30,
+        REQUEST_TIMEOUTS={"/api/v1/mcp-chat": 60},
+        REQUEST_TIMEOUT_MAX=90,
+        **overrides,
+    )
+
+
+def test_request_timeout_uses_header_then_path_default():
+    settings = _settings()
+
+    assert deadline.request_timeout(settings, "/api/v1/chat", None) == 30
+    assert deadline.request_timeout(settings, "/api/v1/mcp-chat", None) == 60
+    assert deadline.request_timeout(settings, "/api/v1/chat", "5") == 5
+    assert deadline.request_timeout(settings, "/api/v1/chat", "600") == 90
+    assert deadline.request_timeout(settings, "/api/v1/chat", "soon") == 30
+
+
+def test_request_timeout_zero_disables_the_deadline():
+    settings = Settings(REQUEST_TIMEOUT=0)
+
+    assert deadline.request_timeout(settings, "/api/v1/chat", None) is None
+
+
+def test_deadline_scope_never_extends_an_outer_deadline():
+    with deadline.deadline_scope(1.0):
+        with deadline.deadline_scope(60.0):
+            assert deadline.remaining() <= 1.0
+    assert deadline.remaining() is None
+
+
+def test_bounded_raises_when_budget_runs_out():
+    async def _slow():
+        await asyncio.sleep(1)
+        return "late"
+
+    async def _run():
+        with deadline.deadline_scope(0.05):
+            return await deadline.bounded(_slow(), what="slow call")
+
+    with pytest.raises(deadline.DeadlineExceeded, match="slow call"):
+        asyncio.run(_run())
+
+
+def test_bounded_keeps_reserve_and_passes_through_without_deadline():
+    async def _fast():
+        return "ok"
+
+    async def _reserved():
+        with deadline.deadline_scope(1.0):
+            return await deadline.bounded(_fast(), reserve=2.0)
+
+    assert asyncio.run(deadline.bounded(_fast())) == "ok"
+    with pytest.raises(deadline.DeadlineExceeded):
+        asyncio.run(_reserved())
+
+
+def test_timeout_for_caps_default_at_remaining_budget():
+    assert deadline.timeout_for(10.0) == 10.0
+    with deadline.deadline_scope(2.0):
+        assert deadline.timeout_for(10.0, reserve=1.0) <= 1.0
+        assert deadline.timeout_for(0.5) == 0.5
+
+
+def test_middleware_exposes_request_budget():
+    app = FastAPI()
+    app.add_middleware(deadline.DeadlineMiddleware, settings=_settings())
+
+    @app.get("/budget")
+    async def _budget():
+        return {"remaining": deadline.remaining()}
+
+    client = TestClient(app)
+    default = client.get("/budget").json()["remaining"]
+    tight = client.get("/budget", headers={"X-Request-Timeout": "2"}).json()["remaining"]
+
+    assert 29 < default <= 30
+    assert 1 < tight <= 2
+
+
+class _ExpiredGeminiService:
+    async def generate_chat_response(self, message: str, history):
+        raise deadline.DeadlineExceeded("chat generation")
+
+
+def test_chat_returns_504_when_deadline_is_exceeded():
+    app = create_app()
+
+    import app.api.chat as chat_api
+
+    app.dependency_overrides[chat_api.get_gemini_service] = lambda: _ExpiredGeminiService()
+
+    client = TestClient(app)
+    r = client.post("/api/v1/chat", json={"message": "hi"})
+
+    assert r.status_code == 504
+    assert "chat generation" in r.json()["detail"]
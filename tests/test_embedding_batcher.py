@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.token_estimator import EmbeddingUsage
+
+
+class _RecordingEmbedder:
+    def __init__(self, fail: bool = False):
+        self.batches: list[list[str]] = []
+        self._fail = fail
+
+    async def __call__(self, texts: list[str]):
+        self.batches.append(list(texts))
+        await asyncio.sleep(0)
+        if self._fail:
+            raise RuntimeError("boom")
+        vectors = [[float(len(text))] for text in texts]
+        usages = [EmbeddingUsage(tokens=len(text), estimated=False) for text in texts]
+        return vectors, usages
+
+
+def test_concurrent_calls_share_one_request_with_per_caller_usage():
+    embedder = _RecordingEmbedder()
+    batcher = EmbeddingBatcher(embedder, max_batch_size=8, max_wait=0.01)
+
+    async def _run():
+        return await asyncio.gather(
+            batcher.embed("tent"), batcher.embed("running shoes")
+        )
+
+    (tent_vec, tent_usage), (shoes_vec, shoes_usage) = asyncio.run(_run())
+
+    assert embedder.batches == [["tent", "running shoes"]]
+    assert tent_vec == [4.0] and tent_usage.tokens == 4
+    assert shoes_vec == [13.0] and shoes_usage.tokens == 13
+    assert batcher.stats()["batches"] == 1
+
+
+def test_full_batch_is_sent_without_waiting():
+    embedder = _RecordingEmbedder()
+    batcher = EmbeddingBatcher(embedder, max_batch_size=2, max_wait=10.0)
+
+    async def _run():
+        return await asyncio.wait_for(
+            asyncio.gather(*(batcher.embed(t) for t in ("a", "b", "c", "d"))),
+            timeout=1.0,
+        )
+
+    asyncio.run(_run())
+
+    assert embedder.batches == [["a", "b"], ["c", "d"]]
+
+
+def test_batch_failure_reaches_every_caller():
+    batcher = EmbeddingBatcher(
+        _RecordingEmbedder(fail=True), max_batch_size=8, max_wait=0.01
+    )
+
+    async def _run():
+        return await asyncio.gather(
+            batcher.embed("a"), batcher.embed("b"), return_exceptions=True
+        )
+
+    results = asyncio.run(_run())
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert batcher.stats()["failed_batches"] == 1
+
+
+def test_invalid_batch_size_is_rejected():
+    with pytest.raises(ValueError):
+        EmbeddingBatcher(_RecordingEmbedder(), max_batch_size=0, max_wait=0.01)
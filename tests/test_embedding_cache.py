@@ -0,0 +1,63 @@
+import asyncio
+
+from app.services.embedding_cache import EmbeddingCache
+
+
+def _key(text: str, **overrides) -> str:
+    params = {"model": "gemini-embedding-001", "dim": 768, **overrides}
+    return EmbeddingCache.key(text, **params)
+
+
+def test_key_normalizes_text_and_includes_model_and_dim():
+    assert _key("Running   Shoes ") == _key("running shoes")
+    assert _key("running shoes") != _key("running shoes", dim=256)
+    assert _key("running shoes") != _key("running shoes", model="other")
+
+
+def test_lru_eviction_and_counters():
+    cache = EmbeddingCache(max_entries=2, ttl=60)
+
+    async def _run():
+        await cache.set("a", [1.0])
+        await cache.set("b", [2.0])
+        assert await cache.get("a") == [1.0]
+        await cache.set("c", [3.0])  # evicts "b", the least recently used
+
+        assert await cache.get("b") is None
+        assert await cache.get("c") == [3.0]
+
+    asyncio.run(_run())
+
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["evictions"] == 1
+
+
+def test_entries_expire_after_ttl():
+    cache = EmbeddingCache(max_entries=8, ttl=0.05)
+
+    async def _run():
+        await cache.set("a", [1.0])
+        await asyncio.sleep(0.1)
+        return await cache.get("a")
+
+    assert asyncio.run(_run()) is None
+
+
+def test_disk_tier_survives_a_new_instance(tmp_path):
+    first = EmbeddingCache(max_entries=8, ttl=60, disk_path=str(tmp_path))
+    asyncio.run(first.set("a", [0.25, 0.5]))
+    first.close()
+
+    second = EmbeddingCache(max_entries=8, ttl=60, disk_path=str(tmp_path))
+
+    async def _run():
+        return [await second.get("a"), await second.get("a")]
+
+    assert asyncio.run(_run()) == [[0.25, 0.5], [0.25, 0.5]]
+
+    stats = second.stats()
+    assert stats["disk_hits"] == 1
+    assert stats["memory_hits"] == 1
+    second.close()
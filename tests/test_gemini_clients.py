@@ -0,0 +1,74 @@
+import httpx
+from fastapi.testclient import TestClient
+
+from app.core.settings import Settings
+from app.main import create_app
+from app.services.gemini_clients import ConnectionStats, GeminiClientRegistry
+
+
+def _settings(**overrides) -> Settings:
+    return Settings(GEMINI_API_KEY="test-key", **overrides)
+
+
+def test_registry_reuses_one_client_per_purpose():
+    registry = GeminiClientRegistry(_settings())
+
+    chat = registry.client("chat")
+    assert registry.client("chat") is chat
+    assert registry.client("embeddings") is not chat
+
+    assert set(registry.stats()["clients"]) == {"chat", "embeddings"}
+
+
+def test_registry_applies_pool_settings():
+    registry = GeminiClientRegistry(
+        _settings(GEMINI_HTTP_POOL_SIZE=7, GEMINI_HTTP_KEEPALIVE_EXPIRY=12)
+    )
+
+    limits = registry._limits()
+    assert limits.max_connections == 7
+    assert limits.max_keepalive_connections == 7
+    assert limits.keepalive_expiry == 12
+
+    stats = registry.stats()
+    assert stats["pool_size"] == 7
+    assert stats["keepalive_expiry"] == 12
+
+
+def test_langchain_model_is_shared_and_uses_pooled_client():
+    registry = GeminiClientRegistry(_settings())
+
+    llm = registry.langchain_chat_model(model="test-model", temperature=0.1)
+
+    assert registry.langchain_chat_model(model="test-model", temperature=0.1) is llm
+    assert llm.client is registry.client("langchain")
+
+
+def test_connection_stats_count_reused_connections():
+    stats = ConnectionStats()
+
+    for new_connection in (True, False, False):
+        request = httpx.Request("POST", "https://example.com")
+        stats.on_request(request)
+        if new_connection:
+            request.extensions["trace"]("connection.connect_tcp.complete", {})
+        stats.on_response(httpx.Response(200, request=request))
+
+    # A request that never got a response is not counted as reused.
+    stats.on_request(httpx.Request("POST", "https://example.com"))
+
+    assert stats.snapshot() == {
+        "requests": 3,
+        "new_connections": 1,
+        "reused_connections": 2,
+        "reuse_ratio": 2 / 3,
+    }
+
+
+def test_metrics_endpoint_exposes_gemini_client_stats():
+    client = TestClient(create_app())
+
+    r = client.get("/metrics")
+
+    assert r.status_code == 200
+    assert "clients" in r.json()["gemini_clients"]
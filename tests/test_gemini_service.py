@@ -1,17 +1,19 @@
 import asyncio
 from types import SimpleNamespace
 
+import pytest
+
 from app.core.settings import Settings
 from app.models.chat import ChatMessage
-from app.services import gemini_service as gemini_service_module
 from app.services.gemini_service import GeminiService
+from app.services.rate_limiter import RateLimitQueueFull
 
 
-class _FakeModels:
+class _FakeAsyncModels:
     def __init__(self, sink: dict):
         self._sink = sink
 
-    def generate_content(self, **kwargs):
+    async def generate_content(self, **kwargs):
         self._sink["kwargs"] = kwargs
         return SimpleNamespace(
             text="model-answer",
@@ -21,22 +23,28 @@ class _FakeModels:
 
 class _FakeClient:
     def __init__(self, sink: dict):
-        self.models = _FakeModels(sink)
+        self.aio = SimpleNamespace(models=_FakeAsyncModels(sink))
 
 
-def test_generate_chat_response_passes_default_system_instruction(monkeypatch):
-    sink: dict = {}
+class _FakeClients:
+    """Stands in for GeminiClientRegistry: one client for every purpose."""
+
+    def __init__(self, client):
+        self._client = client
 
-    def _fake_client_factory(*args, **kwargs):
-        return _FakeClient(sink)
+    def client(self, purpose: str = "chat"):
+        return self._client
 
-    monkeypatch.setattr(gemini_service_module.genai, "Client", _fake_client_factory)
+
+def test_generate_chat_response_passes_default_system_instruction():
+    sink: dict = {}
 
     service = GeminiService(
         settings=Settings(
             gemini_api_key="test-key",
             gemini_model="test-model",
-        )
+        ),
+        clients=_FakeClients(_FakeClient(sink)),
     )
 
     text, generation_time, used_tokens = asyncio.run(
@@ -57,20 +65,16 @@ def test_generate_chat_response_passes_default_system_instruction(monkeypatch):
     )
 
 
-def test_generate_chat_response_uses_custom_system_instruction(monkeypatch):
+def test_generate_chat_response_uses_custom_system_instruction():
     sink: dict = {}
 
-    def _fake_client_factory(*args, **kwargs):
-        return _FakeClient(sink)
-
-    monkeypatch.setattr(gemini_service_module.genai, "Client", _fake_client_factory)
-
     service = GeminiService(
         settings=Settings(
             gemini_api_key="test-key",
             gemini_model="test-model",
             GEMINI_CHAT_SYSTEM_PROMPT="custom-system-prompt",
-        )
+        ),
+        clients=_FakeClients(_FakeClient(sink)),
     )
 
     asyncio.run(
@@ -82,3 +86,224 @@ def test_generate_chat_response_uses_custom_system_instruction(monkeypatch):
 
     config = sink["kwargs"]["config"]
     assert config.system_instruction == "custom-system-prompt"
+
+
+class _FakeEmbedModels:
+    def __init__(self, token_counts: list[int] | None = None):
+        self._token_counts = token_counts
+        self.count_tokens_calls = 0
+
+    async def embed_content(self, **kwargs):
+        embeddings = []
+        for i, _ in enumerate(kwargs["contents"]):
+            statistics = (
+                SimpleNamespace(token_count=self._token_counts[i])
+                if self._token_counts
+                else None
+            )
+            embeddings.append(
+                SimpleNamespace(values=[0.5] * 768, statistics=statistics)
+            )
+        return SimpleNamespace(embeddings=embeddings)
+
+    async def count_tokens(self, **kwargs):
+        self.count_tokens_calls += 1
+        return SimpleNamespace(total_tokens=9)
+
+
+def _embed_service(models: _FakeEmbedModels, **settings) -> GeminiService:
+    client = SimpleNamespace(aio=SimpleNamespace(models=models))
+    return GeminiService(
+        settings=Settings(GEMINI_API_KEY="test-key", **settings),
+        clients=_FakeClients(client),
+    )
+
+
+def test_embed_texts_estimates_tokens_without_count_tokens_call():
+    models = _FakeEmbedModels()
+    service = _embed_service(models)
+
+    vectors, usage = asyncio.run(
+        service.embed_texts_with_usage_details(["running shoes", "tent"])
+    )
+
+    assert len(vectors) == 2
+    assert len(vectors[0]) == 768
+    # ceil(13 / 4) + ceil(4 / 4) with the default 4 chars per token
+    assert usage.tokens == 5
+    assert usage.estimated is True
+    assert models.count_tokens_calls == 0
+
+
+def test_embed_texts_prefers_usage_metadata():
+    models = _FakeEmbedModels(token_counts=[3, 1])
+    service = _embed_service(models)
+
+    _, used_tokens = asyncio.run(
+        service.embed_texts_with_usage(["running shoes", "tent"])
+    )
+
+    assert used_tokens == 4
+    assert models.count_tokens_calls == 0
+    assert service.token_accounting_stats()["calibration_samples"] == 1
+
+
+def test_full_rate_limit_queue_is_not_retried_or_counted_as_failure():
+    class _QueueFullModels(_FakeEmbedModels):
+        def __init__(self):
+            super().__init__()
+            self.calls = 0
+
+        async def embed_content(self, **kwargs):
+            self.calls += 1
+            raise RateLimitQueueFull()
+
+    models = _QueueFullModels()
+    service = _embed_service(models)
+
+    with pytest.raises(RateLimitQueueFull):
+        asyncio.run(service.embed_texts_with_usage(["tent"]))
+
+    assert models.calls == 1
+    assert service._embedding_breaker.stats()["consecutive_failures"] == 0
+
+
+def test_exact_accounting_counts_in_background_and_calibrates():
+    models = _FakeEmbedModels()
+    service = _embed_service(
+        models, EMBEDDING_TOKEN_ACCOUNTING="exact"
+    )
+
+    async def _run():
+        _, usage = await service.embed_texts_with_usage_details(
+            ["running shoes", "tent"]
+        )
+        # The request returns the estimate; the exact count lands later.
+        assert usage.estimated is True
+        await asyncio.gather(*service._exact_count_tasks)
+
+    asyncio.run(_run())
+
+    stats = service.token_accounting_stats()
+    assert models.count_tokens_calls == 1
+    assert stats["calibration_samples"] == 1
+    # 17 chars / 9 exact tokens pulls the ratio below the 4.0 default.
+    assert stats["chars_per_token"] < 4.0
+
+
+def test_stream_chat_response_reports_time_to_first_token():
+    chunks = [
+        SimpleNamespace(text="Hel", usage_metadata=None),
+        SimpleNamespace(text="lo", usage_metadata=None),
+        SimpleNamespace(
+            text="",
+            usage_metadata=SimpleNamespace(total_token_count=21),
+        ),
+    ]
+
+    class _FakeStreamModels:
+        async def generate_content_stream(self, **kwargs):
+            async def _iterate():
+                for chunk in chunks:
+                    yield chunk
+            return _iterate()
+
+    client = SimpleNamespace(aio=SimpleNamespace(models=_FakeStreamModels()))
+    service = GeminiService(
+        settings=Settings(GEMINI_API_KEY="test-key"),
+        clients=_FakeClients(client),
+    )
+
+    async def _collect():
+        return [
+            event
+            async for event in service.stream_chat_response(
+                message="hi", history=[]
+            )
+        ]
+
+    events = asyncio.run(_collect())
+
+    assert [e["text"] for e in events if e["type"] == "token"] == ["Hel", "lo"]
+    done = events[-1]
+    assert done["type"] == "done"
+    assert done["used_tokens"] == 21
+    assert 0 <= done["time_to_first_token"] <= done["generation_time"]
+
+
+def test_repeated_query_embedding_is_served_from_cache():
+    models = _FakeEmbedModels()
+    calls = 0
+    original = models.embed_content
+
+    async def _counting_embed_content(**kwargs):
+        nonlocal calls
+        calls += 1
+        return await original(**kwargs)
+
+    models.embed_content = _counting_embed_content
+    service = _embed_service(models)
+
+    async def _run():
+        first = await service.embed_text_with_usage_details("Running shoes")
+        second = await service.embed_text_with_usage_details("running  shoes")
+        return first, second
+
+    (vector, usage), (cached_vector, cached_usage) = asyncio.run(_run())
+
+    assert calls == 1
+    assert cached_vector == vector
+    assert usage.cached is False and usage.tokens > 0
+    assert cached_usage.cached is True
+    assert cached_usage.tokens == 0
+    assert service.embedding_cache_stats()["hits"] == 1
+
+
+def test_concurrent_query_embeddings_are_batched():
+    models = _FakeEmbedModels(token_counts=[2, 5])
+    requests: list[list[str]] = []
+    original = models.embed_content
+
+    async def _recording_embed_content(**kwargs):
+        requests.append(list(kwargs["contents"]))
+        return await original(**kwargs)
+
+    models.embed_content = _recording_embed_content
+    service = _embed_service(models, EMBEDDING_CACHE_SIZE=0)
+
+    async def _run():
+        return await asyncio.gather(
+            service.embed_text_with_usage("tent"),
+            service.embed_text_with_usage("running shoes"),
+        )
+
+    (_, tent_tokens), (_, shoes_tokens) = asyncio.run(_run())
+
+    assert requests == [["tent", "running shoes"]]
+    assert (tent_tokens, shoes_tokens) == (2, 5)
+
+
+def test_batching_can_be_bypassed():
+    models = _FakeEmbedModels()
+    requests: list[list[str]] = []
+    original = models.embed_content
+
+    async def _recording_embed_content(**kwargs):
+        requests.append(list(kwargs["contents"]))
+        return await original(**kwargs)
+
+    models.embed_content = _recording_embed_content
+    service = _embed_service(
+        models, EMBEDDING_CACHE_SIZE=0, EMBEDDING_BATCH_BYPASS=True
+    )
+
+    async def _run():
+        await asyncio.gather(
+            service.embed_text_with_usage("tent"),
+            service.embed_text_with_usage("running shoes"),
+        )
+
+    asyncio.run(_run())
+
+    assert sorted(requests) == [["running shoes"], ["tent"]]
+    assert service.embedding_batcher_stats() is None
@@ -12,3 +12,14 @@ def test_health_endpoints():
     r = client.get("/health")
     assert r.status_code == 200
     assert r.json()["status"] == "ok"
+
+
+def test_health_reports_circuit_states():
+    client = TestClient(create_app())
+
+    circuits = client.get("/health").json()["circuits"]
+    assert set(circuits) == {"gemini_embeddings", "gemini_generation", "db_retrieval"}
+
+    r = client.get("/metrics")
+    assert r.status_code == 200
+    assert r.json()["circuit_breakers"]["db_retrieval"]["consecutive_failures"] == 0
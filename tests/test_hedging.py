@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from app.services.hedging import Hedger
+
+
+def _warm_hedger(**overrides) -> Hedger:
+    options = {"min_samples": 5, "min_delay": 0.0, "max_hedge_rate": 1.0}
+    hedger = Hedger(**{**options, **overrides})
+    for _ in range(5):
+        hedger._latencies.append(0.01)
+    return hedger
+
+
+def _calls(*behaviours):
+    """fn whose n-th call sleeps behaviours[n] seconds (or raises if an exception)."""
+    started: list[int] = []
+
+    async def _fn():
+        index = len(started)
+        started.append(index)
+        behaviour = behaviours[index]
+        if isinstance(behaviour, Exception):
+            await asyncio.sleep(0.02)
+            raise behaviour
+        await asyncio.sleep(behaviour)
+        return f"call-{index}"
+
+    return _fn, started
+
+
+def test_no_hedge_until_enough_latency_samples():
+    hedger = Hedger(min_samples=5, min_delay=0.0, max_hedge_rate=1.0)
+    fn, started = _calls(0.05)
+
+    result, won_by_hedge = asyncio.run(hedger.run(fn))
+
+    assert (result, won_by_hedge) == ("call-0", False)
+    assert started == [0]
+    assert hedger.hedge_delay() is None
+
+
+def test_slow_primary_is_hedged_and_loser_cancelled():
+    hedger = _warm_hedger()
+    fn, started = _calls(1.0, 0.0)
+
+    result, won_by_hedge = asyncio.run(hedger.run(fn))
+
+    assert (result, won_by_hedge) == ("call-1", True)
+    assert started == [0, 1]
+    stats = hedger.stats()
+    assert stats["hedges"] == 1
+    assert stats["won_by_hedge_ratio"] == 1.0
+
+
+def test_hedge_rate_cap_suppresses_duplicates():
+    hedger = _warm_hedger(max_hedge_rate=0.0)
+    fn, started = _calls(0.05)
+
+    result, won_by_hedge = asyncio.run(hedger.run(fn))
+
+    assert (result, won_by_hedge) == ("call-0", False)
+    assert started == [0]
+    assert hedger.stats()["suppressed"] == 1
+
+
+def test_failed_attempt_falls_back_to_the_other():
+    hedger = _warm_hedger()
+    fn, _ = _calls(RuntimeError("boom"), 0.05)
+
+    result, won_by_hedge = asyncio.run(hedger.run(fn))
+
+    assert (result, won_by_hedge) == ("call-1", True)
+
+
+def test_error_is_raised_when_both_attempts_fail():
+    hedger = _warm_hedger()
+    fn, _ = _calls(RuntimeError("first"), RuntimeError("second"))
+
+    with pytest.raises(RuntimeError, match="first"):
+        asyncio.run(hedger.run(fn))
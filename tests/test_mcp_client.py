@@ -0,0 +1,221 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import anyio
+import pytest
+
+from app.core.settings import Settings
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.mcp_client import McpClient, McpSessionPool
+
+
+class _FakeSession:
+    def __init__(self, index: int):
+        self.index = index
+        self.ping_ok = True
+
+    async def send_ping(self):
+        if not self.ping_ok:
+            raise RuntimeError("connection closed")
+
+
+class _FakeFactory:
+    def __init__(self):
+        self.opened = 0
+        self.closed = 0
+
+    @asynccontextmanager
+    async def __call__(self):
+        self.opened += 1
+        session = _FakeSession(self.opened)
+        try:
+            yield session
+        finally:
+            self.closed += 1
+
+
+def _make_pool(factory, **overrides):
+    options = {
+        "size": 2,
+        "checkout_timeout": 0.2,
+        "health_check_interval": 30.0,
+    }
+    options.update(overrides)
+    return McpSessionPool(factory, **options)
+
+
+def test_pool_prespawns_and_reuses_sessions():
+    async def _run():
+        factory = _FakeFactory()
+        pool = _make_pool(factory)
+        await pool.start()
+        assert factory.opened == 2
+
+        seen = set()
+        for _ in range(5):
+            async with pool.acquire() as session:
+                seen.add(session.index)
+
+        # No new subprocesses were spawned for the borrowed sessions.
+        assert factory.opened == 2
+        assert seen <= {1, 2}
+
+        await pool.close()
+        assert factory.closed == 2
+
+    asyncio.run(_run())
+
+
+def test_pool_checkout_times_out_when_exhausted():
+    async def _run():
+        pool = _make_pool(_FakeFactory(), size=1)
+        await pool.start()
+
+        async with pool.acquire():
+            with pytest.raises(TimeoutError):
+                async with pool.acquire():
+                    pass
+
+        await pool.close()
+
+    asyncio.run(_run())
+
+
+def test_pool_replaces_session_after_transport_error():
+    async def _run():
+        factory = _FakeFactory()
+        pool = _make_pool(factory, size=1)
+        await pool.start()
+
+        with pytest.raises(anyio.ClosedResourceError):
+            async with pool.acquire():
+                raise anyio.ClosedResourceError
+
+        async with pool.acquire() as session:
+            assert session.index == 2
+        assert factory.opened == 2
+
+        await pool.close()
+
+    asyncio.run(_run())
+
+
+def test_pool_keeps_session_after_ordinary_borrower_errors():
+    async def _run():
+        factory = _FakeFactory()
+        pool = _make_pool(factory, size=1)
+        await pool.start()
+
+        for _ in range(3):
+            with pytest.raises(CircuitOpenError):
+                async with pool.acquire():
+                    raise CircuitOpenError("gemini", 1.0)
+        with pytest.raises(RuntimeError):
+            async with pool.acquire():
+                raise RuntimeError("429 RESOURCE_EXHAUSTED")
+
+        async with pool.acquire() as session:
+            assert session.index == 1
+        assert (factory.opened, factory.closed) == (1, 0)
+
+        await pool.close()
+
+    asyncio.run(_run())
+
+
+def _cancel_while_borrowed(pool, on_borrow=lambda session: None):
+    async def _run():
+        borrowed = asyncio.Event()
+
+        async def _borrow():
+            async with pool.acquire() as session:
+                on_borrow(session)
+                borrowed.set()
+                await asyncio.sleep(10)
+
+        task = asyncio.create_task(_borrow())
+        await borrowed.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    return _run()
+
+
+def test_pool_reuses_session_after_cancelled_borrower():
+    async def _run():
+        factory = _FakeFactory()
+        pool = _make_pool(factory, size=1)
+        await pool.start()
+        pings = []
+
+        def _track_pings(session):
+            async def _ping():
+                pings.append(session.index)
+            session.send_ping = _ping
+
+        await _cancel_while_borrowed(pool, _track_pings)
+
+        async with pool.acquire() as session:
+            assert session.index == 1
+        # Pinged once despite the long health-check interval, then trusted.
+        assert pings == [1]
+        assert factory.opened == 1
+
+        await pool.close()
+
+    asyncio.run(_run())
+
+
+def test_pool_replaces_session_cancelled_mid_call_that_fails_ping():
+    async def _run():
+        factory = _FakeFactory()
+        pool = _make_pool(factory, size=1)
+        await pool.start()
+
+        def _break(session):
+            session.ping_ok = False
+
+        await _cancel_while_borrowed(pool, _break)
+
+        async with pool.acquire() as session:
+            assert session.index == 2
+
+        await pool.close()
+
+    asyncio.run(_run())
+
+
+def test_pool_replaces_session_failing_health_check():
+    async def _run():
+        factory = _FakeFactory()
+        pool = _make_pool(factory, size=1, health_check_interval=0.0)
+        await pool.start()
+
+        async with pool.acquire() as session:
+            session.ping_ok = False
+
+        async with pool.acquire() as session:
+            assert session.index == 2
+
+        await pool.close()
+
+    asyncio.run(_run())
+
+
+def test_inprocess_transport_speaks_mcp_without_subprocess():
+    async def _run():
+        client = McpClient(
+            settings=Settings(MCP_TRANSPORT="inprocess", MCP_POOL_SIZE=1)
+        )
+        await client.start()
+        try:
+            async with client.session() as session:
+                tools = await session.list_tools()
+        finally:
+            await client.close()
+
+        names = {t.name for t in tools.tools}
+        assert names == {"get_ads_by_keyword", "get_ads_semantic"}
+
+    asyncio.run(_run())
@@ -0,0 +1,232 @@
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+from mcp import types as mcp_types
+
+from app.core.settings import Settings
+from app.services.circuit_breaker import DB_RETRIEVAL, CircuitBreakers
+from app.services.mcp_client import McpClient
+from app.services.mcp_service import McpService
+
+
+def _text_response(text: str, tokens: int = 10):
+    part = SimpleNamespace(text=text, function_call=None)
+    return SimpleNamespace(
+        candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))],
+        usage_metadata=SimpleNamespace(total_token_count=tokens),
+    )
+
+
+class _FakeAsyncModels:
+    def __init__(self, responses):
+        self._responses = list(responses)
+        self.calls: list[dict] = []
+
+    async def generate_content(self, **kwargs):
+        self.calls.append(kwargs)
+        return self._responses.pop(0)
+
+
+class _FakeGenaiClient:
+    def __init__(self, responses):
+        self.models = _FakeAsyncModels(responses)
+        self.aio = SimpleNamespace(models=self.models)
+
+
+class _FakeClients:
+    """Stands in for GeminiClientRegistry: one client for every purpose."""
+
+    def __init__(self, client):
+        self._client = client
+
+    def client(self, purpose: str = "chat"):
+        return self._client
+
+
+class _FakeMcpSession:
+    def __init__(self):
+        self.list_tools_calls = 0
+
+    async def list_tools(self):
+        self.list_tools_calls += 1
+        return SimpleNamespace(tools=[
+            SimpleNamespace(
+                name="get_ads_by_keyword",
+                description="keyword search",
+                inputSchema={
+                    "type": "object",
+                    "properties": {"keyword": {"type": "string"}},
+                },
+            )
+        ])
+
+
+class _FakeMcpClient(McpClient):
+    def __init__(self):
+        super().__init__(settings=Settings(MCP_POOL_SIZE=0))
+        self.fake_session = _FakeMcpSession()
+
+    @asynccontextmanager
+    async def session(self):
+        yield self.fake_session
+
+
+def _make_service(mcp_client, responses):
+    fake_genai = _FakeGenaiClient(responses)
+    service = McpService(
+        settings=Settings(GEMINI_API_KEY="test-key"),
+        mcp_client=mcp_client,
+        clients=_FakeClients(fake_genai),
+    )
+    return service, fake_genai
+
+
+def test_tool_catalog_is_discovered_once_per_version():
+    mcp_client = _FakeMcpClient()
+    service, fake_genai = _make_service(
+        mcp_client,
+        [_text_response("a"), _text_response("b"), _text_response("c")],
+    )
+
+    async def _run():
+        await service.answer(message="hi", history=[])
+        await service.answer(message="hi again", history=[])
+        assert mcp_client.fake_session.list_tools_calls == 1
+
+        mcp_client.invalidate_tools()
+        await service.answer(message="tools changed", history=[])
+        assert mcp_client.fake_session.list_tools_calls == 2
+
+    asyncio.run(_run())
+
+    tool = fake_genai.models.calls[0]["config"].tools[0]
+    assert tool.function_declarations[0].name == "get_ads_by_keyword"
+    assert fake_genai.models.calls[1]["config"].tools[0] is tool
+
+
+def test_tools_changed_notification_invalidates_cache():
+    mcp_client = _FakeMcpClient()
+    before = mcp_client.tools_version
+
+    notification = mcp_types.ServerNotification(
+        mcp_types.ToolListChangedNotification(
+            method="notifications/tools/list_changed"
+        )
+    )
+    asyncio.run(mcp_client._handle_message(notification))
+
+    assert mcp_client.tools_version == before + 1
+
+
+def _function_call_response(*calls):
+    parts = [
+        SimpleNamespace(
+            text=None,
+            function_call=SimpleNamespace(name=name, args=args),
+        )
+        for name, args in calls
+    ]
+    return SimpleNamespace(
+        candidates=[SimpleNamespace(content=SimpleNamespace(parts=parts))],
+        usage_metadata=SimpleNamespace(total_token_count=5),
+    )
+
+
+class _SlowToolSession(_FakeMcpSession):
+    def __init__(self, delays: dict[str, float]):
+        super().__init__()
+        self._delays = delays
+
+    async def call_tool(self, name, arguments=None):
+        await asyncio.sleep(self._delays[name])
+        text = '{"embedding_tokens": 7}' if name == "get_ads_semantic" else "{}"
+        return SimpleNamespace(content=[SimpleNamespace(text=text)])
+
+
+def test_parallel_function_calls_run_concurrently_in_order():
+    mcp_client = _FakeMcpClient()
+    mcp_client.fake_session = _SlowToolSession(
+        {"get_ads_by_keyword": 0.2, "get_ads_semantic": 0.2}
+    )
+    service, fake_genai = _make_service(
+        mcp_client,
+        [
+            _function_call_response(
+                ("get_ads_by_keyword", {"keyword": "tent"}),
+                ("get_ads_semantic", {"search_query": "camping tent"}),
+            ),
+            _text_response("done"),
+        ],
+    )
+
+    text, _, used_tokens, breakdown = asyncio.run(
+        service.answer(message="camping", history=[])
+    )
+
+    assert text == "done"
+    assert breakdown["tool_call_count"] == 2
+    assert breakdown["embedding_tokens"] == 7
+    assert used_tokens == 5 + 10 + 7
+
+    step = breakdown["tool_steps"][0]
+    assert step["tool_calls"] == 2
+    assert step["wall_time"] < 0.35
+    assert step["summed_time"] >= 0.4
+
+    # Function responses are sent back in the order Gemini requested them.
+    # (The recorded contents list keeps growing; [-1] is the final answer.)
+    tool_turn = fake_genai.models.calls[1]["contents"][-2]
+    names = [p.function_response.name for p in tool_turn.parts]
+    assert names == ["get_ads_by_keyword", "get_ads_semantic"]
+
+
+def test_slow_tool_call_times_out_without_failing_the_step():
+    mcp_client = _FakeMcpClient()
+    mcp_client.fake_session = _SlowToolSession(
+        {"get_ads_by_keyword": 0.0, "get_ads_semantic": 5.0}
+    )
+    fake_genai = _FakeGenaiClient([
+        _function_call_response(
+            ("get_ads_by_keyword", {"keyword": "tent"}),
+            ("get_ads_semantic", {"search_query": "camping tent"}),
+        ),
+        _text_response("done"),
+    ])
+    service = McpService(
+        settings=Settings(GEMINI_API_KEY="test-key", MCP_TOOL_TIMEOUT=0.1),
+        mcp_client=mcp_client,
+        clients=_FakeClients(fake_genai),
+    )
+
+    text, _, _, breakdown = asyncio.run(
+        service.answer(message="camping", history=[])
+    )
+
+    assert text == "done"
+    assert breakdown["tool_steps"][0]["wall_time"] < 1.0
+    tool_turn = fake_genai.models.calls[1]["contents"][-2]
+    assert "error" in tool_turn.parts[1].function_response.response
+    assert "result" in tool_turn.parts[0].function_response.response
+
+
+def test_open_retrieval_circuit_answers_without_tools():
+    fake_genai = _FakeGenaiClient([_text_response("plain answer")])
+    settings = Settings(GEMINI_API_KEY="test-key", CIRCUIT_BREAKER_FAILURE_THRESHOLD=1)
+    breakers = CircuitBreakers(settings)
+    breakers.get(DB_RETRIEVAL).on_failure(ConnectionError("database is down"))
+    service = McpService(
+        settings=settings,
+        mcp_client=_FakeMcpClient(),
+        clients=_FakeClients(fake_genai),
+        breakers=breakers,
+    )
+
+    text, _, _, breakdown = asyncio.run(
+        service.answer(message="find me a tent", history=[])
+    )
+
+    assert text == "plain answer"
+    assert breakdown["circuit_degraded"] is True
+    config = fake_genai.models.calls[0]["config"]
+    assert config.tool_config.function_calling_config.mode == "NONE"
@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+
+from app.core.settings import Settings
+from app.services.model_router import (
+    ModelRouter,
+    ModelTier,
+    build_model_router,
+    track_model_choices,
+)
+from app.services.rate_limiter import RateLimitQueueFull
+
+
+def _router(clock=None, **overrides) -> ModelRouter:
+    options = {
+        "default_model": "default",
+        "routes": {
+            "mcp": [ModelTier("primary"), ModelTier("fallback")],
+            "mcp.answer": [ModelTier("answer")],
+        },
+        "min_samples": 2,
+        "max_latency": 1.0,
+        "cooldown": 10.0,
+    }
+    if clock is not None:
+        options["clock"] = clock
+    return ModelRouter(**{**options, **overrides})
+
+
+def test_routes_resolve_by_stage_then_prefix_then_default():
+    router = _router()
+
+    assert [t.model for t in router.tiers("mcp.answer")] == ["answer"]
+    assert [t.model for t in router.tiers("mcp.plan")] == ["primary", "fallback"]
+    assert [t.model for t in router.tiers("chat")] == ["default"]
+    assert router.tiers("agent.plan", ModelTier("agent", temperature=0.1)) == [
+        ModelTier("agent", temperature=0.1)
+    ]
+
+
+def test_failing_primary_falls_back_and_is_probed_after_cooldown(fake_clock):
+    router = _router(fake_clock)
+    for _ in range(2):
+        router.record("mcp.plan", "primary", 0.1, ok=False)
+
+    assert [t.model for t in router.select("mcp.plan")] == ["fallback"]
+    assert router.stats()["routes"]["mcp.plan"]["primary"]["degraded"] is True
+
+    fake_clock.now += 10.0
+    assert [t.model for t in router.select("mcp.plan")] == ["primary", "fallback"]
+
+
+def test_slow_primary_falls_back():
+    router = _router()
+    for _ in range(2):
+        router.record("mcp.plan", "primary", 5.0, ok=True)
+
+    assert router.select("mcp.plan")[0].model == "fallback"
+
+
+def test_run_retries_on_next_tier_and_reports_choice():
+    router = _router()
+    attempts: list[str] = []
+
+    async def _call(tier: ModelTier):
+        attempts.append(tier.model)
+        if tier.model == "primary":
+            raise RuntimeError("overloaded")
+        return "ok"
+
+    async def _run():
+        with track_model_choices() as models:
+            result, tier = await router.run("mcp.plan", _call)
+        return result, tier, models
+
+    result, tier, models = asyncio.run(_run())
+
+    assert (result, tier.model) == ("ok", "fallback")
+    assert attempts == ["primary", "fallback"]
+    assert models == {"mcp.plan": "fallback"}
+
+
+def test_run_raises_when_last_tier_fails():
+    router = _router()
+
+    async def _call(tier: ModelTier):
+        raise RuntimeError(tier.model)
+
+    with pytest.raises(RuntimeError, match="fallback"):
+        asyncio.run(router.run("mcp.plan", _call))
+
+
+def test_run_does_not_fall_back_or_record_on_full_rate_limit_queue():
+    router = _router()
+    attempts: list[str] = []
+
+    async def _call(tier: ModelTier):
+        attempts.append(tier.model)
+        raise RateLimitQueueFull()
+
+    with pytest.raises(RateLimitQueueFull):
+        asyncio.run(router.run("mcp.plan", _call))
+
+    assert attempts == ["primary"]
+    assert router.stats()["routes"]["mcp.plan"]["primary"]["calls"] == 0
+
+
+def test_tiers_parse_from_settings_with_generation_config():
+    router = build_model_router(Settings(
+        MODEL_ROUTES={
+            "agent.plan": [
+                {"model": "fast", "thinking_budget": 0, "max_output_tokens": 256},
+                "slow",
+            ]
+        }
+    ))
+
+    fast, slow = router.tiers("agent.plan")
+    assert slow == ModelTier("slow")
+    overrides = fast.config_overrides()
+    assert overrides["max_output_tokens"] == 256
+    assert overrides["thinking_config"].thinking_budget == 0
+    assert "temperature" not in overrides
@@ -1,6 +1,20 @@
+import asyncio
+from contextlib import asynccontextmanager
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
 from fastapi.testclient import TestClient
 
+from app.core import deadline
+from app.core.settings import Settings
+from app.db.retrieval import AdMatch
 from app.main import create_app
+from app.services import rag_service as rag_service_module
+from app.services.circuit_breaker import DB_RETRIEVAL, CircuitBreakers
+from app.services.rag_service import RagService
+from app.services.response_cache import SemanticResponseCache
+from app.services.token_estimator import EmbeddingUsage
 
 
 class _FakeRagService:
@@ -26,12 +40,20 @@ class _FakeRagService:
         }
 
 
+def _fake_rag_services():
+    @asynccontextmanager
+    async def _open():
+        yield _FakeRagService()
+
+    return _open
+
+
 def test_rag_happy_path_with_citations():
     app = create_app()
 
     import app.api.rag as rag_api
 
-    app.dependency_overrides[rag_api.get_rag_service] = lambda: _FakeRagService()
+    app.dependency_overrides[rag_api.get_rag_service_factory] = _fake_rag_services
 
     client = TestClient(app)
     r = client.post(
@@ -53,7 +75,7 @@ def test_rag_schema_defaults():
 
     import app.api.rag as rag_api
 
-    app.dependency_overrides[rag_api.get_rag_service] = lambda: _FakeRagService()
+    app.dependency_overrides[rag_api.get_rag_service_factory] = _fake_rag_services
 
     client = TestClient(app)
     r = client.post("/api/v1/rag-chat", json={"message": "hi"})
@@ -65,8 +87,226 @@ def test_rag_top_k_validation():
 
     import app.api.rag as rag_api
 
-    app.dependency_overrides[rag_api.get_rag_service] = lambda: _FakeRagService()
+    app.dependency_overrides[rag_api.get_rag_service_factory] = _fake_rag_services
 
     client = TestClient(app)
     r = client.post("/api/v1/rag-chat", json={"message": "hi", "top_k": 0})
     assert r.status_code == 422
+
+
+_CITATION = {
+    "score": 0.9,
+    "distance": 0.1,
+    "ad": {
+        "id": 7,
+        "title": "Tent",
+        "description": "2-person tent",
+        "keywords": ["camping"],
+        "url": "https://example.com/tent",
+        "image_url": None,
+        "cpc": "0.50",
+    },
+}
+
+
+class _FakeStreamingRagService:
+    async def stream_answer(self, message: str, history, top_k: int):
+        yield {"type": "citations", "citations": [_CITATION]}
+        yield {"type": "token", "text": "Try "}
+        yield {"type": "token", "text": "this tent."}
+        yield {
+            "type": "done",
+            "generation_time": 0.9,
+            "time_to_first_token": 0.4,
+            "used_tokens": 55,
+            "breakdown": {"embedding_time": 0.1, "retrieval_time": 0.05},
+        }
+
+
+def test_rag_stream_sends_citations_before_answer_tokens(parse_sse):
+    app = create_app()
+
+    import app.api.rag as rag_api
+
+    app.dependency_overrides[rag_api.get_rag_service] = (
+        lambda: _FakeStreamingRagService()
+    )
+
+    client = TestClient(app)
+    r = client.post("/api/v1/rag-chat/stream", json={"message": "camping"})
+
+    assert r.status_code == 200
+    events = parse_sse(r.text)
+    names = [name for name, _ in events]
+    assert names == ["citations", "token", "token", "done"]
+
+    citations = events[0][1]["citations"]
+    assert citations[0]["ad"]["id"] == 7
+    assert citations[0]["score"] == 0.9
+
+    done = events[-1][1]
+    assert done["used_tokens"] == 55
+    assert done["breakdown"]["retrieval_time"] == 0.05
+
+
+class _FakeGemini:
+    def __init__(self):
+        self.prompts: list[str] = []
+
+    async def embed_text_with_usage_details(self, text: str):
+        return ([0.1] * 768, EmbeddingUsage(tokens=4, estimated=True))
+
+    async def stream_chat_response(self, message: str, history, route: str = "chat"):
+        self.prompts.append(message)
+        yield {"type": "token", "text": "answer"}
+        yield {
+            "type": "done",
+            "generation_time": 0.2,
+            "time_to_first_token": 0.05,
+            "used_tokens": 30,
+            "model": f"{route}-model",
+        }
+
+
+def test_rag_service_stream_answer_emits_citations_first(monkeypatch):
+    ad = SimpleNamespace(**{**_CITATION["ad"], "cpc": Decimal("0.50")})
+
+    class _FakeRepo:
+        def __init__(self, db):
+            pass
+
+        async def search_ads_by_embedding(self, query_embedding, top_k):
+            return [AdMatch(ad=ad, score=0.9, distance=0.1)]
+
+    monkeypatch.setattr(rag_service_module, "AsyncAdsVectorRepository", _FakeRepo)
+
+    gemini = _FakeGemini()
+    service = RagService(db=None, gemini_service=gemini)
+
+    async def _collect():
+        return [
+            e async for e in service.stream_answer(
+                message="camping", history=[], top_k=3
+            )
+        ]
+
+    events = asyncio.run(_collect())
+
+    assert [e["type"] for e in events] == ["citations", "token", "done"]
+    assert events[0]["citations"][0].ad.id == 7
+    assert "https://example.com/tent" in gemini.prompts[0]
+
+    done = events[-1]
+    assert done["used_tokens"] == 34
+    assert done["breakdown"]["embedding_tokens"] == 4
+    assert done["breakdown"]["embedding_tokens_estimated"] is True
+    assert done["breakdown"]["llm_generation_tokens"] == 30
+    assert done["breakdown"]["models"] == {"rag": "rag-model"}
+
+
+class _FakeGeminiWithAnswers(_FakeGemini):
+    def __init__(self):
+        super().__init__()
+        self.llm_calls = 0
+
+    async def generate_chat_response(self, message: str, history, route: str = "chat"):
+        self.llm_calls += 1
+        return ("grounded answer", 0.2, 30)
+
+
+def test_rag_service_answers_repeat_queries_from_semantic_cache(monkeypatch):
+    ad = SimpleNamespace(**{**_CITATION["ad"], "cpc": Decimal("0.50")})
+    searches = []
+
+    class _FakeRepo:
+        def __init__(self, db):
+            pass
+
+        async def search_ads_by_embedding(self, query_embedding, top_k):
+            searches.append(top_k)
+            return [AdMatch(ad=ad, score=0.9, distance=0.1)]
+
+    monkeypatch.setattr(rag_service_module, "AsyncAdsVectorRepository", _FakeRepo)
+
+    gemini = _FakeGeminiWithAnswers()
+    cache = SemanticResponseCache(max_entries=8, ttl=60, threshold=0.95)
+    service = RagService(db=None, gemini_service=gemini, response_cache=cache)
+
+    async def _ask(top_k: int):
+        return await service.answer(message="camping", history=[], top_k=top_k)
+
+    first = asyncio.run(_ask(3))
+    second = asyncio.run(_ask(3))
+    other_top_k = asyncio.run(_ask(5))
+
+    assert first.breakdown["semantic_cache_hit"] is False
+    assert second.breakdown["semantic_cache_hit"] is True
+    assert second.response == "grounded answer"
+    assert second.citations[0].ad.id == 7
+    assert second.used_tokens == 4
+    assert other_top_k.breakdown["semantic_cache_hit"] is False
+    assert gemini.llm_calls == 2
+    assert searches == [3, 5]
+
+
+def test_rag_service_skips_retrieval_when_deadline_is_close(monkeypatch):
+    searches = []
+
+    class _FakeRepo:
+        def __init__(self, db):
+            pass
+
+        async def search_ads_by_embedding(self, query_embedding, top_k):
+            searches.append(top_k)
+            return []
+
+    monkeypatch.setattr(rag_service_module, "AsyncAdsVectorRepository", _FakeRepo)
+
+    gemini = _FakeGeminiWithAnswers()
+    service = RagService(
+        db=None,
+        gemini_service=gemini,
+        settings=Settings(DEADLINE_RESERVE=5),
+    )
+
+    async def _ask():
+        with deadline.deadline_scope(1.0):
+            return await service.answer(message="camping", history=[], top_k=3)
+
+    response = asyncio.run(_ask())
+
+    assert searches == []
+    assert response.citations == []
+    assert response.breakdown["deadline_degraded"] is True
+    assert gemini.llm_calls == 1
+
+
+def test_rag_service_skips_retrieval_while_circuit_is_open(monkeypatch):
+    searches = []
+
+    class _FailingRepo:
+        def __init__(self, db):
+            pass
+
+        async def search_ads_by_embedding(self, query_embedding, top_k):
+            searches.append(top_k)
+            raise ConnectionError("database is down")
+
+    monkeypatch.setattr(rag_service_module, "AsyncAdsVectorRepository", _FailingRepo)
+
+    gemini = _FakeGeminiWithAnswers()
+    breakers = CircuitBreakers(Settings(CIRCUIT_BREAKER_FAILURE_THRESHOLD=1))
+    service = RagService(db=None, gemini_service=gemini, breakers=breakers)
+
+    async def _ask():
+        return await service.answer(message="camping", history=[], top_k=3)
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(_ask())
+    response = asyncio.run(_ask())
+
+    assert searches == [3]
+    assert response.response == "grounded answer"
+    assert response.citations == []
+    assert response.breakdown["circuit_degraded"] is True
+    assert breakers.open_circuits() == [DB_RETRIEVAL]
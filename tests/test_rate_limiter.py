@@ -0,0 +1,112 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import create_app
+from app.services.rate_limiter import (
+    GeminiRateLimiter,
+    Priority,
+    RateLimitedAsyncTransport,
+    RateLimitQueueFull,
+    request_priority,
+)
+
+
+def test_interactive_calls_are_granted_before_batch_calls():
+    # 100 tokens/s: once the bucket is drained each 10-token call waits 0.1s.
+    limiter = GeminiRateLimiter(rpm=1000, tpm=6000)
+    granted: list[str] = []
+
+    async def _call(name: str, priority: Priority):
+        with request_priority(priority):
+            await limiter.acquire(10)
+        granted.append(name)
+
+    async def _run():
+        await limiter.acquire(6000)
+        await asyncio.gather(
+            _call("batch-1", Priority.BATCH),
+            _call("batch-2", Priority.BATCH),
+            _call("chat", Priority.INTERACTIVE),
+        )
+
+    asyncio.run(_run())
+
+    assert granted[0] == "chat"
+    stats = limiter.stats()
+    assert stats["queued"] == 3
+    assert stats["max_queue_depth"] == 3
+    assert stats["queue_depth"] == 0
+    assert stats["wait_time_max"] > 0
+
+
+def test_full_queue_rejects_new_calls():
+    limiter = GeminiRateLimiter(rpm=1000, tpm=6000, max_queue=1)
+
+    async def _run():
+        await limiter.acquire(6000)
+        waiting = asyncio.create_task(limiter.acquire(10))
+        await asyncio.sleep(0)
+        with pytest.raises(RateLimitQueueFull) as exc_info:
+            await limiter.acquire(10)
+        await waiting
+        return exc_info.value
+
+    error = asyncio.run(_run())
+
+    assert error.code == 503
+    assert limiter.stats()["rejected"] == 1
+
+
+def test_rate_limit_backs_off_and_recovers(fake_clock):
+    limiter = GeminiRateLimiter(rpm=60, tpm=60_000, clock=fake_clock)
+
+    assert limiter.report_rate_limited(retry_after=5.0) == 5.0
+
+    stats = limiter.stats()
+    assert stats["rate_factor"] == 0.5
+    assert stats["paused_for"] == 5.0
+    assert stats["rate_limited"] == 1
+
+    for _ in range(20):
+        limiter.report_success()
+    assert limiter.stats()["rate_factor"] == 1.0
+
+
+def test_transport_retries_429_and_settles_reported_usage():
+    limiter = GeminiRateLimiter(rpm=1000, tpm=100_000)
+    responses = iter(
+        [
+            httpx.Response(429, headers={"retry-after": "0"}),
+            httpx.Response(200, json={"usageMetadata": {"totalTokenCount": 1000}}),
+        ]
+    )
+    transport = RateLimitedAsyncTransport(
+        httpx.MockTransport(lambda request: next(responses)),
+        limiter,
+        output_allowance=0,
+    )
+
+    async def _run():
+        async with httpx.AsyncClient(transport=transport) as client:
+            return await client.post("https://example.com/v1:generateContent", content=b"x" * 40)
+
+    response = asyncio.run(_run())
+
+    assert response.status_code == 200
+    stats = limiter.stats()
+    assert stats["granted"] == 2
+    assert stats["rate_limited"] == 1
+    # Two 10-token estimates were debited, then corrected to the real 1000.
+    assert stats["available_tokens"] == pytest.approx(100_000 - 10 - 1000, abs=50)
+
+
+def test_metrics_endpoint_exposes_rate_limiter_stats():
+    client = TestClient(create_app())
+
+    body = client.get("/metrics").json()
+
+    assert body["gemini_rate_limiter"]["queue_depth"] == 0
+    assert "wait_time_mean" in body["gemini_rate_limiter"]
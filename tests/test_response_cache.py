@@ -0,0 +1,82 @@
+from sqlalchemy.orm import Session
+
+from app.db.models import Ad, ChatSession
+from app.models.chat import ChatMessage
+from app.services.response_cache import SemanticResponseCache, _changes_ad_catalog
+
+
+def _cache(**overrides) -> SemanticResponseCache:
+    params = {"max_entries": 8, "ttl": 60, "threshold": 0.9, **overrides}
+    return SemanticResponseCache(**params)
+
+
+def test_paraphrase_above_threshold_hits():
+    cache = _cache()
+    key = cache.context_key("chat", [])
+
+    cache.store(key, [1.0, 0.0, 0.0], "cached answer")
+
+    payload, similarity = cache.lookup(key, [0.98, 0.1, 0.0])
+    assert payload == "cached answer"
+    assert similarity > 0.9
+    assert cache.lookup(key, [0.0, 1.0, 0.0]) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_history_fingerprint_and_namespace_must_match():
+    cache = _cache()
+    empty = cache.context_key("chat", [])
+    with_history = cache.context_key(
+        "chat", [ChatMessage(role="user", parts=["hello"])]
+    )
+
+    cache.store(empty, [1.0, 0.0], "answer")
+
+    assert cache.lookup(with_history, [1.0, 0.0]) is None
+    assert cache.lookup(cache.context_key("rag", []), [1.0, 0.0]) is None
+    assert cache.context_key("rag", [], variant="top_k=3") != cache.context_key(
+        "rag", [], variant="top_k=5"
+    )
+
+
+def test_entries_expire_and_least_recently_used_is_evicted(fake_clock):
+    cache = _cache(max_entries=2, ttl=10, clock=fake_clock)
+    key = cache.context_key("chat", [])
+
+    cache.store(key, [1.0, 0.0, 0.0], "a")
+    fake_clock.now = 1
+    cache.store(key, [0.0, 1.0, 0.0], "b")
+    fake_clock.now = 2
+    assert cache.lookup(key, [1.0, 0.0, 0.0])[0] == "a"
+
+    fake_clock.now = 3
+    cache.store(key, [0.0, 0.0, 1.0], "c")  # evicts "b"
+    assert cache.lookup(key, [0.0, 1.0, 0.0]) is None
+    assert cache.stats()["evictions"] == 1
+
+    fake_clock.now = 20
+    assert cache.lookup(key, [1.0, 0.0, 0.0]) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_invalidate_namespace_only():
+    cache = _cache()
+    chat_key = cache.context_key("chat", [])
+    rag_key = cache.context_key("rag", [], variant="top_k=5")
+    cache.store(chat_key, [1.0, 0.0], "chat answer")
+    cache.store(rag_key, [1.0, 0.0], "rag answer")
+
+    assert cache.invalidate("rag") == 1
+
+    assert cache.lookup(rag_key, [1.0, 0.0]) is None
+    assert cache.lookup(chat_key, [1.0, 0.0])[0] == "chat answer"
+
+
+def test_new_ads_count_as_catalog_changes():
+    session = Session()
+    session.add(ChatSession(mode="basic", history=[]))
+    assert not _changes_ad_catalog(session)
+
+    session.add(Ad(title="Tent", description="2p tent", url="https://example.com"))
+    assert _changes_ad_catalog(session)
@@ -0,0 +1,238 @@
+"""serving_ads scheduler, plus trigger checks against a real database.
+
+The trigger tests need a disposable Postgres with pgvector:
+  TEST_DATABASE_URL=postgresql://... python -m pytest tests/test_serving_ads.py
+They create their tables in a scratch schema and drop it afterwards.
+"""
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+from app.core.settings import Settings
+from app.db.base import Base
+from app.db.models import Ad, AdCampaign, Campaign, ServingAd
+from app.db.serving import install_serving_ads
+from app.services.response_cache import SemanticResponseCache
+from app.services.serving_ads import (
+    ServingAdsScheduler,
+    build_serving_ads_scheduler,
+)
+
+_SCHEMA = "test_serving_ads"
+_T0 = datetime(2026, 10, 17, 12, 0, tzinfo=timezone.utc)
+
+
+class _FakeResult:
+    def __init__(self, row):
+        self._row = row
+
+    def one(self):
+        return self._row
+
+
+class _FakeSession:
+    def __init__(self, db):
+        self._db = db
+
+    @asynccontextmanager
+    async def begin(self):
+        yield
+
+    async def execute(self, stmt):
+        self._db.calls.append(stmt.compile().params["since"])
+        if self._db.fail:
+            raise ConnectionError("database is down")
+        self._db.now += timedelta(minutes=1)
+        return _FakeResult((self._db.now, 2))
+
+
+class _FakeDb:
+    def __init__(self):
+        self.now = _T0
+        self.calls: list[datetime | None] = []
+        self.fail = False
+
+    @asynccontextmanager
+    async def sessionmaker(self):
+        yield _FakeSession(self)
+
+
+def test_scheduler_reconciles_first_then_refreshes_since_previous_run(fake_clock):
+    db = _FakeDb()
+    scheduler = ServingAdsScheduler(
+        db.sessionmaker, interval=60, reconcile_interval=3600, clock=fake_clock
+    )
+
+    asyncio.run(scheduler.run_once())
+    fake_clock.now += 60
+    asyncio.run(scheduler.run_once())
+    fake_clock.now += 60
+    asyncio.run(scheduler.run_once())
+
+    assert db.calls == [
+        None,
+        _T0 + timedelta(minutes=1),
+        _T0 + timedelta(minutes=2),
+    ]
+    assert scheduler.stats()["reconciles"] == 1
+    assert scheduler.stats()["refreshed"] == 6
+
+
+def test_scheduler_reconciles_again_after_reconcile_interval(fake_clock):
+    db = _FakeDb()
+    scheduler = ServingAdsScheduler(
+        db.sessionmaker, interval=60, reconcile_interval=3600, clock=fake_clock
+    )
+
+    asyncio.run(scheduler.run_once())
+    fake_clock.now += 3600
+    asyncio.run(scheduler.run_once())
+
+    assert db.calls == [None, None]
+    assert scheduler.stats()["reconciles"] == 2
+
+
+def test_refreshed_rows_invalidate_cached_rag_answers():
+    cache = SemanticResponseCache(max_entries=4, ttl=600, threshold=0.9)
+    cache.store(SemanticResponseCache.context_key("rag", []), [1.0, 0.0], "rag")
+    cache.store(SemanticResponseCache.context_key("chat", []), [1.0, 0.0], "chat")
+    scheduler = ServingAdsScheduler(
+        _FakeDb().sessionmaker,
+        interval=60,
+        reconcile_interval=3600,
+        response_cache=cache,
+    )
+
+    asyncio.run(scheduler.run_once())
+
+    assert cache.stats()["entries"] == 1
+    assert cache.lookup(
+        SemanticResponseCache.context_key("chat", []), [1.0, 0.0]
+    ) is not None
+
+
+def test_scheduler_keeps_running_after_a_failed_refresh():
+    db = _FakeDb()
+    db.fail = True
+    scheduler = ServingAdsScheduler(
+        db.sessionmaker, interval=0.01, reconcile_interval=3600
+    )
+
+    async def _run():
+        scheduler.start()
+        await asyncio.sleep(0.05)
+        db.fail = False
+        await asyncio.sleep(0.05)
+        await scheduler.aclose()
+
+    asyncio.run(_run())
+
+    stats = scheduler.stats()
+    assert stats["failures"] >= 1
+    assert stats["runs"] >= 1
+    # A failed run does not advance the watermark: the first success is full.
+    assert db.calls[stats["failures"]] is None
+
+
+def test_scheduler_is_disabled_with_zero_interval():
+    assert build_serving_ads_scheduler(
+        Settings(SERVING_ADS_REFRESH_INTERVAL=0), sessionmaker=_FakeDb().sessionmaker
+    ) is None
+
+
+@pytest.fixture
+def pg_session():
+    url = os.getenv("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    engine = sa.create_engine(
+        url, connect_args={"options": f"-csearch_path={_SCHEMA},public"}
+    )
+    with engine.begin() as conn:
+        conn.execute(sa.text("CREATE EXTENSION IF NOT EXISTS vector"))
+        conn.execute(sa.text(f"DROP SCHEMA IF EXISTS {_SCHEMA} CASCADE"))
+        conn.execute(sa.text(f"CREATE SCHEMA {_SCHEMA}"))
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        install_serving_ads(conn)
+    with Session(engine) as session:
+        yield session
+    with engine.begin() as conn:
+        conn.execute(sa.text(f"DROP SCHEMA {_SCHEMA} CASCADE"))
+    engine.dispose()
+
+
+def _serving_ids(session) -> set[int]:
+    return set(session.execute(sa.select(ServingAd.id)).scalars())
+
+
+def _campaign(**overrides) -> Campaign:
+    values = {
+        "title": "c",
+        "company": "co",
+        "budget": 100,
+        "spending": 0,
+        "start_date": datetime.now(timezone.utc) - timedelta(days=1),
+    }
+    return Campaign(**{**values, **overrides})
+
+
+def test_triggers_follow_links_budget_and_ad_edits(pg_session):
+    campaign = _campaign()
+    ad = Ad(title="Tent", description="2-person tent", url="https://e.com", keywords=["camping"])
+    pg_session.add_all([campaign, ad])
+    pg_session.commit()
+    assert _serving_ids(pg_session) == set()
+
+    pg_session.add(AdCampaign(ad_id=ad.id, campaign_id=campaign.id))
+    pg_session.commit()
+    assert _serving_ids(pg_session) == {ad.id}
+
+    ad.title = "Ultralight tent"
+    pg_session.commit()
+    assert pg_session.get(ServingAd, ad.id, populate_existing=True).title == "Ultralight tent"
+
+    campaign.spending = 150
+    pg_session.commit()
+    assert _serving_ids(pg_session) == set()
+
+    campaign.budget = 500
+    pg_session.commit()
+    assert _serving_ids(pg_session) == {ad.id}
+
+    pg_session.delete(campaign)
+    pg_session.commit()
+    assert _serving_ids(pg_session) == set()
+
+
+def test_refresh_due_applies_date_transitions(pg_session):
+    starting = _campaign(start_date=datetime.now(timezone.utc) + timedelta(days=1))
+    ad = Ad(title="Tent", description="2-person tent", url="https://e.com")
+    pg_session.add_all([starting, ad])
+    pg_session.flush()
+    pg_session.add(AdCampaign(ad_id=ad.id, campaign_id=starting.id))
+    pg_session.commit()
+    assert _serving_ids(pg_session) == set()
+
+    since = pg_session.execute(sa.select(sa.func.now())).scalar()
+    pg_session.commit()
+    # Pretend the start date passed without firing the campaigns trigger.
+    pg_session.execute(sa.text(
+        "ALTER TABLE campaigns DISABLE TRIGGER trg_serving_ads_campaigns"
+    ))
+    starting.start_date = since + timedelta(microseconds=1)
+    pg_session.commit()
+    assert _serving_ids(pg_session) == set()
+
+    refreshed = pg_session.execute(
+        sa.select(sa.func.serving_ads_refresh_due(since))
+    ).scalar()
+    pg_session.commit()
+    assert refreshed == 1
+    assert _serving_ids(pg_session) == {ad.id}
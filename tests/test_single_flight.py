@@ -0,0 +1,175 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.core import deadline
+from app.main import create_app
+from app.models.chat import ChatRequest
+from app.services.single_flight import SingleFlight, request_key
+
+
+def test_request_key_covers_endpoint_message_and_history():
+    request = ChatRequest(message="hi")
+
+    assert request_key("chat", request) == request_key("chat", ChatRequest(message="hi"))
+    assert request_key("chat", request) != request_key("rag-chat", request)
+    assert request_key("chat", request) != request_key(
+        "chat",
+        ChatRequest(message="hi", history=[{"role": "user", "parts": ["x"]}]),
+    )
+
+
+def test_identical_in_flight_calls_share_one_result():
+    single_flight = SingleFlight(result_ttl=0)
+    calls = 0
+
+    async def _work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def _run():
+        return await asyncio.gather(
+            *(single_flight.do("key", _work) for _ in range(3))
+        )
+
+    results = asyncio.run(_run())
+
+    assert calls == 1
+    assert [r for r, _ in results] == ["answer"] * 3
+    assert [shared for _, shared in results] == [False, True, True]
+    assert single_flight.stats()["coalesced"] == 2
+
+
+def test_result_window_absorbs_immediate_retries(fake_clock):
+    single_flight = SingleFlight(result_ttl=2.0, clock=fake_clock)
+    calls = 0
+
+    async def _work():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    async def _run():
+        first = await single_flight.do("key", _work)
+        fake_clock.now = 1.0
+        retry = await single_flight.do("key", _work)
+        fake_clock.now = 5.0
+        later = await single_flight.do("key", _work)
+        return first, retry, later
+
+    first, retry, later = asyncio.run(_run())
+
+    assert first == (1, False)
+    assert retry == (1, True)
+    assert later == (2, False)
+    assert single_flight.stats()["window_hits"] == 1
+
+
+def test_failures_propagate_and_are_not_replayed():
+    single_flight = SingleFlight(result_ttl=2.0)
+    calls = 0
+
+    async def _failing():
+        nonlocal calls
+        calls += 1
+        raise RuntimeError("boom")
+
+    async def _run():
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                await single_flight.do("key", _failing)
+
+    asyncio.run(_run())
+
+    assert calls == 2
+    assert single_flight.stats()["failures"] == 2
+
+
+def test_cancelled_leader_does_not_take_the_shared_call_with_it():
+    single_flight = SingleFlight(result_ttl=0)
+    started = asyncio.Event()
+    budgets = []
+
+    async def _work():
+        budgets.append(deadline.remaining())
+        started.set()
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def _leader():
+        # The leader's tight budget must not become the shared call's.
+        with deadline.deadline_scope(0.01):
+            return await single_flight.do("key", _work, timeout=5.0)
+
+    async def _run():
+        leader = asyncio.create_task(_leader())
+        await started.wait()
+        follower = asyncio.create_task(single_flight.do("key", _work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(_run()) == ("answer", True)
+    assert len(budgets) == 1 and 4 < budgets[0] <= 5.0
+
+
+def test_each_caller_waits_within_its_own_deadline():
+    single_flight = SingleFlight(result_ttl=0)
+
+    async def _work():
+        await asyncio.sleep(0.1)
+        return "answer"
+
+    async def _impatient():
+        with deadline.deadline_scope(0.02):
+            return await single_flight.do("key", _work)
+
+    async def _run():
+        return await asyncio.gather(
+            _impatient(), single_flight.do("key", _work), return_exceptions=True
+        )
+
+    impatient, patient = asyncio.run(_run())
+
+    assert isinstance(impatient, deadline.DeadlineExceeded)
+    assert patient == ("answer", True)
+
+
+def test_concurrent_duplicate_chat_requests_make_one_llm_call():
+    class _SlowGeminiService:
+        calls = 0
+
+        async def generate_chat_response(self, message: str, history):
+            self.calls += 1
+            await asyncio.sleep(0.05)
+            return (f"echo:{message}", 0.05, 10)
+
+    app = create_app()
+
+    import app.api.chat as chat_api
+
+    gemini = _SlowGeminiService()
+    app.dependency_overrides[chat_api.get_gemini_service] = lambda: gemini
+
+    async def _run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            return await asyncio.gather(*(
+                client.post("/api/v1/chat", json={"message": "hi"})
+                for _ in range(3)
+            ))
+
+    responses = asyncio.run(_run())
+
+    assert gemini.calls == 1
+    payloads = [r.json() for r in responses]
+    assert {p["response"] for p in payloads} == {"echo:hi"}
+    assert sum(bool(p["breakdown"].get("coalesced")) for p in payloads) == 2
+    assert app.state.single_flight.stats()["coalesced"] == 2
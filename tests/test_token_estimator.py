@@ -0,0 +1,22 @@
+from app.services.token_estimator import TokenEstimator
+
+
+def test_estimate_uses_chars_per_token():
+    estimator = TokenEstimator(chars_per_token=4.0)
+
+    assert estimator.estimate(["abcdefgh", "a", ""]) == 3
+
+
+def test_observe_converges_towards_exact_ratio():
+    estimator = TokenEstimator(chars_per_token=4.0, smoothing=0.5)
+    texts = ["x" * 30]
+
+    for _ in range(10):
+        estimator.observe(texts, exact_tokens=10)
+
+    assert abs(estimator.chars_per_token - 3.0) < 0.01
+    assert estimator.estimate(texts) == 10
+
+    stats = estimator.stats()
+    assert stats["calibration_samples"] == 10
+    assert stats["mean_relative_error"] is not None
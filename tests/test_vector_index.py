@@ -0,0 +1,239 @@
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.core.settings import Settings
+from app.db.retrieval import AdsVectorRepository, AsyncAdsVectorRepository
+from app.db.vector_index import IndexedAd, InMemoryVectorIndex
+from app.services.vector_index_sync import VectorIndexSync
+
+_DIM = 8
+
+
+def _ad(ad_id: int, title: str = "ad") -> IndexedAd:
+    return IndexedAd(
+        id=ad_id,
+        title=title,
+        description="d",
+        keywords=None,
+        url="https://example.com",
+        image_url=None,
+        cpc=Decimal("0.50"),
+    )
+
+
+def _filled(n: int, seed: int = 0) -> tuple[InMemoryVectorIndex, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, _DIM)).astype(np.float32)
+    index = InMemoryVectorIndex(dim=_DIM)
+    for i, v in enumerate(vectors):
+        index.upsert(_ad(i + 1), v)
+    return index, vectors
+
+
+def test_search_returns_exact_cosine_top_k_best_first():
+    index, vectors = _filled(500)
+    query = np.random.default_rng(1).normal(size=_DIM)
+
+    results = index.search(query, 5)
+
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    expected = np.argsort(-(unit @ (query / np.linalg.norm(query))))[:5] + 1
+    assert [ad.id for ad, _, _ in results] == list(expected)
+    scores = [score for _, score, _ in results]
+    assert scores == sorted(scores, reverse=True)
+    assert all(abs(score + distance - 1.0) < 1e-6 for _, score, distance in results)
+
+
+def test_upsert_replaces_and_remove_keeps_other_rows_searchable():
+    index, vectors = _filled(10)
+
+    index.upsert(_ad(3, title="updated"), vectors[7])
+    best = index.search(vectors[7], 2)
+    assert {ad.id for ad, _, _ in best} == {3, 8}
+    assert any(ad.title == "updated" for ad, _, _ in best)
+
+    assert index.remove(1)
+    assert not index.remove(1)
+    assert len(index) == 9
+    # Row 1 was refilled with the last row (id 10); it must still be found.
+    assert index.search(vectors[9], 1)[0][0].id == 10
+    assert 1 not in index.ids()
+
+
+def test_unusable_vectors_drop_the_ad():
+    index, _ = _filled(3)
+
+    assert not index.upsert(_ad(2), np.zeros(_DIM))
+    assert not index.upsert(_ad(3), np.ones(_DIM + 1))
+
+    assert index.ids() == {1}
+    assert index.search(np.zeros(_DIM), 5) == []
+
+
+def test_index_grows_past_initial_capacity():
+    index, vectors = _filled(2500)
+
+    assert len(index) == 2500
+    assert index.stats()["capacity"] >= 2500
+    assert index.search(vectors[2400], 1)[0][0].id == 2401
+
+
+class _FailingDb:
+    def execute(self, stmt):
+        raise AssertionError("the database should not be queried")
+
+
+def test_repositories_use_the_index_once_ready():
+    index, vectors = _filled(20)
+    index.mark_ready()
+
+    sync_matches = AdsVectorRepository(_FailingDb(), index=index).search_ads_by_embedding(
+        vectors[4], 3
+    )
+    async_matches = asyncio.run(
+        AsyncAdsVectorRepository(_FailingDb(), index=index).search_ads_by_embedding(
+            vectors[4], 3
+        )
+    )
+
+    assert sync_matches[0].ad.id == 5
+    assert [m.ad.id for m in async_matches] == [m.ad.id for m in sync_matches]
+    assert sync_matches[0].distance < 1e-6
+
+
+def test_async_repository_offloads_search_on_large_indexes():
+    index, vectors = _filled(20)
+    index.mark_ready()
+    threads = []
+    search = index.search
+
+    def _recording_search(query, top_k):
+        threads.append(threading.get_ident())
+        return search(query, top_k)
+
+    index.search = _recording_search
+
+    async def _run(threshold: int):
+        repo = AsyncAdsVectorRepository(
+            _FailingDb(),
+            Settings(VECTOR_INDEX_OFFLOAD_THRESHOLD=threshold),
+            index=index,
+        )
+        return await repo.search_ads_by_embedding(vectors[4], 3)
+
+    inline = asyncio.run(_run(21))
+    offloaded = asyncio.run(_run(20))
+
+    assert threads[0] == threading.get_ident()
+    assert threads[1] != threading.get_ident()
+    assert [m.ad.id for m in offloaded] == [m.ad.id for m in inline]
+
+
+def test_repository_falls_back_to_postgres_until_the_index_is_loaded():
+    index, vectors = _filled(5)
+    queried = []
+
+    class _Db:
+        def execute(self, stmt):
+            queried.append(stmt)
+            return SimpleNamespace(all=lambda: [])
+
+    AdsVectorRepository(_Db(), index=index).search_ads_by_embedding(vectors[0], 3)
+
+    assert queried
+
+
+_T0 = datetime(2026, 10, 17, 12, 0, tzinfo=timezone.utc)
+
+
+def _row(ad_id: int, embedding, refreshed_at: datetime, title: str = "ad"):
+    return SimpleNamespace(
+        id=ad_id,
+        title=title,
+        description="d",
+        keywords=None,
+        url="https://example.com",
+        image_url=None,
+        cpc=Decimal("0.50"),
+        embedding=embedding,
+        refreshed_at=refreshed_at,
+    )
+
+
+class _FakeServingAds:
+    def __init__(self):
+        self.rows: dict[int, SimpleNamespace] = {}
+        self.since: list[datetime | None] = []
+
+    @asynccontextmanager
+    async def sessionmaker(self):
+        yield self
+
+    async def execute(self, stmt):
+        params = stmt.compile().params
+        if len(stmt.selected_columns) == 1:
+            ids = [r.id for r in self.rows.values() if r.embedding is not None]
+            return SimpleNamespace(scalars=lambda: ids)
+        since = next(iter(params.values()), None)
+        self.since.append(since)
+        rows = [r for r in self.rows.values() if since is None or r.refreshed_at > since]
+        return SimpleNamespace(all=lambda: rows)
+
+
+def test_sync_loads_then_applies_only_changes():
+    db = _FakeServingAds()
+    vectors = np.eye(_DIM, dtype=np.float32)
+    db.rows[1] = _row(1, vectors[0], _T0 - timedelta(minutes=10))
+    db.rows[2] = _row(2, vectors[1], _T0 - timedelta(minutes=10))
+    db.rows[3] = _row(3, vectors[2], _T0)
+    index = InMemoryVectorIndex(dim=_DIM)
+    sync = VectorIndexSync(index, db.sessionmaker, interval=5)
+
+    assert not index.ready
+    assert asyncio.run(sync.refresh_once()) == (3, 0)
+    assert index.ready
+
+    later = _T0 + timedelta(minutes=5)
+    db.rows[2] = _row(2, vectors[5], later, title="moved")
+    db.rows[4] = _row(4, vectors[6], later)
+    del db.rows[3]
+
+    assert asyncio.run(sync.refresh_once()) == (2, 1)
+    assert db.since == [None, _T0 - timedelta(seconds=60)]
+    assert index.ids() == {1, 2, 4}
+    assert index.search(vectors[5], 1)[0][0].title == "moved"
+    assert sync.stats()["size"] == 3
+
+
+def test_sync_overlap_is_configurable_and_reconcile_reloads_everything(fake_clock):
+    db = _FakeServingAds()
+    vectors = np.eye(_DIM, dtype=np.float32)
+    db.rows[1] = _row(1, vectors[0], _T0)
+    index = InMemoryVectorIndex(dim=_DIM)
+    sync = VectorIndexSync(
+        index,
+        db.sessionmaker,
+        interval=5,
+        overlap=timedelta(minutes=5),
+        reconcile_interval=600,
+        clock=fake_clock,
+    )
+
+    asyncio.run(sync.refresh_once())
+    # A transaction open for 10 minutes commits a row older than the overlap.
+    db.rows[2] = _row(2, vectors[1], _T0 - timedelta(minutes=10))
+    fake_clock.now = 300
+    assert asyncio.run(sync.refresh_once()) == (1, 0)
+    assert 2 not in index.ids()
+    fake_clock.now = 600
+    assert asyncio.run(sync.refresh_once()) == (2, 0)
+
+    assert db.since == [None, _T0 - timedelta(minutes=5), None]
+    assert index.ids() == {1, 2}
+    assert sync.stats()["reconciles"] == 2
@@ -0,0 +1,129 @@
+"""Retrieval query shape, plus an EXPLAIN check against a real database.
+
+The EXPLAIN test needs a disposable Postgres with pgvector:
+  TEST_DATABASE_URL=postgresql://... python -m pytest tests/test_vector_search.py
+It creates its tables (and the serving_ads triggers) in a scratch schema and drops it afterwards.
+"""
+
+import json
+import os
+
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.core.settings import Settings
+from app.db.base import Base
+from app.db.retrieval import keyword_search_stmt, search_settings, search_stmt
+from app.db.serving import install_serving_ads
+
+_SCHEMA = "test_vector_search"
+
+
+def _compiled(top_k: int = 5) -> str:
+    return str(search_stmt([0.1] * 768, top_k).compile(dialect=postgresql.dialect()))
+
+
+def test_search_reads_only_the_serving_table():
+    sql = _compiled()
+
+    assert "FROM serving_ads" in sql
+    assert "DISTINCT" not in sql
+    assert "JOIN" not in sql
+    assert "campaigns" not in sql
+
+
+def test_search_orders_by_bare_cosine_operator():
+    sql = _compiled()
+
+    # A cast around `<=>` in ORDER BY stops the HNSW index from serving it.
+    order_by = sql.split("ORDER BY", 1)[1]
+    assert order_by.strip().startswith("serving_ads.embedding <=>")
+    assert "CAST" not in order_by
+
+
+def test_keyword_search_matches_any_word_on_the_search_vector():
+    sql = str(
+        keyword_search_stmt(["wireless", "headphones"], 8).compile(
+            dialect=postgresql.dialect()
+        )
+    )
+
+    assert "FROM serving_ads" in sql
+    assert "JOIN" not in sql
+    assert sql.count("serving_ads.search_vector @@ plainto_tsquery") == 2
+    assert " OR " in sql
+
+
+def test_search_settings_follow_configuration():
+    default = [str(s) for s in search_settings(Settings())]
+    assert default == []
+
+    tuned = [
+        str(s)
+        for s in search_settings(
+            Settings(VECTOR_ITERATIVE_SCAN="strict_order", VECTOR_EF_SEARCH=100)
+        )
+    ]
+    assert tuned == [
+        "SET LOCAL hnsw.iterative_scan = strict_order",
+        "SET LOCAL hnsw.ef_search = 100",
+    ]
+
+
+@pytest.fixture(scope="module")
+def pg_engine():
+    url = os.getenv("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    engine = sa.create_engine(
+        url, connect_args={"options": f"-csearch_path={_SCHEMA},public"}
+    )
+    with engine.begin() as conn:
+        conn.execute(sa.text("CREATE EXTENSION IF NOT EXISTS vector"))
+        conn.execute(sa.text(f"DROP SCHEMA IF EXISTS {_SCHEMA} CASCADE"))
+        conn.execute(sa.text(f"CREATE SCHEMA {_SCHEMA}"))
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(sa.text(
+            "INSERT INTO campaigns (title, company, budget, spending, start_date) "
+            "SELECT 'c' || g, 'co', 100, CASE WHEN g % 2 = 0 THEN 0 ELSE 200 END, "
+            "now() - interval '1 day' FROM generate_series(1, 100) g"
+        ))
+        conn.execute(sa.text(
+            "INSERT INTO ads (title, description, url, embedding) "
+            "SELECT 'ad ' || g, 'd', 'https://example.com', "
+            "(SELECT array_agg(random())::vector FROM generate_series(1, 768) d WHERE g > 0) "
+            "FROM generate_series(1, 5000) g"
+        ))
+        conn.execute(sa.text(
+            "INSERT INTO ad_campaigns (ad_id, campaign_id) "
+            "SELECT id, 1 + id % 100 FROM ads"
+        ))
+        install_serving_ads(conn)
+        conn.execute(sa.text("ANALYZE"))
+    yield engine
+    with engine.begin() as conn:
+        conn.execute(sa.text(f"DROP SCHEMA {_SCHEMA} CASCADE"))
+    engine.dispose()
+
+
+def _plan_nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+def test_explain_walks_the_hnsw_index(pg_engine):
+    sql = search_stmt([0.5] * 768, 5).compile(
+        dialect=pg_engine.dialect, compile_kwargs={"literal_binds": True}
+    )
+    with pg_engine.begin() as conn:
+        for statement in search_settings(Settings()):
+            conn.execute(statement)
+        raw = conn.execute(sa.text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+
+    plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+    nodes = list(_plan_nodes(plan))
+    assert any(n.get("Index Name") == "ix_serving_ads_embedding_hnsw" for n in nodes)
+    assert not any(n["Node Type"] in {"Unique", "Sort"} for n in nodes)
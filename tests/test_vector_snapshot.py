@@ -0,0 +1,176 @@
+import time
+from decimal import Decimal
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.db.retrieval import AdsVectorRepository
+from app.db.vector_index import IndexedAd
+from app.db.vector_snapshot import (
+    SnapshotVectorIndex,
+    export_snapshot,
+    read_current,
+    write_snapshot,
+)
+
+_DIM = 8
+
+
+def _ad(ad_id: int, title: str = "ad") -> IndexedAd:
+    return IndexedAd(
+        id=ad_id,
+        title=title,
+        description="d",
+        keywords=["k"],
+        url="https://example.com",
+        image_url=None,
+        cpc=Decimal("0.50"),
+    )
+
+
+def _index(directory, **kwargs) -> SnapshotVectorIndex:
+    # No watcher thread: the tests drive `check` themselves.
+    index = SnapshotVectorIndex(directory, _DIM, check_interval=0, **kwargs)
+    index.check()
+    return index
+
+
+def test_snapshot_is_memory_mapped_read_only_and_searchable(tmp_path):
+    vectors = np.random.default_rng(0).normal(size=(50, _DIM)).astype(np.float32)
+    version = write_snapshot(tmp_path, [_ad(i + 1) for i in range(50)], vectors, _DIM)
+    index = _index(tmp_path)
+
+    assert read_current(tmp_path) == version
+    assert index.ready
+    results = index.search(vectors[17], 3)
+
+    assert results[0][0] == _ad(18)
+    assert results[0][2] < 1e-6
+    mapped = index._mapped.vectors
+    assert isinstance(mapped, np.memmap)
+    assert not mapped.flags.writeable
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["CURRENT", version]
+    assert sorted(p.name for p in (tmp_path / version).iterdir()) == [
+        "ads.json", "embeddings.npy", "ids.npy", "meta.json"
+    ]
+
+
+def test_unusable_embeddings_are_left_out_of_the_snapshot(tmp_path):
+    embeddings = [np.ones(_DIM), np.zeros(_DIM), np.ones(_DIM + 1)]
+    write_snapshot(tmp_path, [_ad(1), _ad(2), _ad(3)], embeddings, _DIM)
+
+    index = SnapshotVectorIndex(tmp_path, _DIM, check_interval=0)
+
+    assert index.stats()["size"] == 0  # nothing mapped before the first check
+    assert index.search(np.ones(_DIM), 5) == []
+    index.check()
+    assert [ad.id for ad, _, _ in index.search(np.ones(_DIM), 5)] == [1]
+
+
+def test_index_swaps_to_a_new_version_on_the_next_check(tmp_path):
+    eye = np.eye(_DIM, dtype=np.float32)
+    first = write_snapshot(tmp_path, [_ad(1, "old")], eye[:1], _DIM)
+    index = _index(tmp_path)
+    assert index.search(eye[0], 1)[0][0].title == "old"
+    old_vectors = index._mapped.vectors
+
+    second = write_snapshot(tmp_path, [_ad(1, "new"), _ad(2)], eye[:2], _DIM)
+    # Searches only read the installed mapping; the check swaps it.
+    assert index.search(eye[0], 1)[0][0].title == "old"
+    assert index.version == first
+    index.check()
+    assert index.search(eye[0], 1)[0][0].title == "new"
+    assert index.version == second
+    assert index.stats()["swaps"] == 2
+    # The previous mapping stays valid for searches that still hold it.
+    assert old_vectors.shape == (1, _DIM)
+
+
+def test_old_versions_are_pruned_and_no_temporary_files_remain(tmp_path):
+    eye = np.eye(_DIM, dtype=np.float32)
+    versions = [write_snapshot(tmp_path, [_ad(1)], eye[:1], _DIM) for _ in range(5)]
+
+    names = sorted(p.name for p in tmp_path.iterdir())
+    assert names == sorted(["CURRENT", *versions[-3:]])
+    assert read_current(tmp_path) == versions[-1]
+
+
+def test_missing_snapshot_leaves_index_not_ready(tmp_path):
+    index = _index(tmp_path / "absent")
+
+    assert not index.ready
+    assert index.search(np.ones(_DIM), 3) == []
+
+
+def test_stale_snapshot_is_not_served(tmp_path, fake_clock):
+    eye = np.eye(_DIM, dtype=np.float32)
+    write_snapshot(tmp_path, [_ad(1)], eye[:1], _DIM, exported_at=100.0)
+    index = _index(tmp_path, max_age=60, clock=fake_clock)
+
+    fake_clock.now = 150.0
+    assert index.ready
+    assert index.stats()["age"] == 50.0
+
+    fake_clock.now = 161.0
+    assert not index.ready
+    assert index.search(eye[0], 1) == []
+    assert index.stats()["age"] == 61.0
+
+    write_snapshot(tmp_path, [_ad(1)], eye[:1], _DIM, exported_at=160.0)
+    index.check()
+    assert index.ready
+
+
+def test_watcher_thread_maps_new_versions(tmp_path):
+    eye = np.eye(_DIM, dtype=np.float32)
+    index = SnapshotVectorIndex(tmp_path, _DIM, check_interval=0.01)
+    try:
+        assert not index.ready  # starts the watcher; nothing exported yet
+        version = write_snapshot(tmp_path, [_ad(1)], eye[:1], _DIM)
+        for _ in range(200):
+            if index.ready:
+                break
+            time.sleep(0.01)
+        assert index.version == version
+    finally:
+        index.close()
+
+
+def test_export_snapshot_writes_serving_rows_with_embeddings(tmp_path):
+    eye = np.eye(_DIM, dtype=np.float32)
+    rows = [
+        SimpleNamespace(id=1, title="Tent", description="d", keywords=None,
+                        url="https://example.com", image_url=None,
+                        cpc=Decimal("1.25"), embedding=eye[0]),
+        SimpleNamespace(id=2, title="No vector", description="d", keywords=None,
+                        url="https://example.com", image_url=None,
+                        cpc=Decimal("0.10"), embedding=None),
+    ]
+
+    class _Session:
+        def execute(self, stmt):
+            return SimpleNamespace(all=lambda: rows)
+
+    version, count = export_snapshot(_Session(), tmp_path, _DIM)
+
+    assert count == 1
+    assert read_current(tmp_path) == version
+    index = _index(tmp_path)
+    ad, _, _ = index.search(eye[0], 1)[0]
+    assert (ad.id, ad.title, ad.cpc) == (1, "Tent", Decimal("1.25"))
+
+
+def test_repository_serves_from_the_snapshot(tmp_path):
+    eye = np.eye(_DIM, dtype=np.float32)
+    write_snapshot(tmp_path, [_ad(1), _ad(2)], eye[:2], _DIM)
+    index = _index(tmp_path)
+
+    class _FailingDb:
+        def execute(self, stmt):
+            raise AssertionError("the database should not be queried")
+
+    matches = AdsVectorRepository(_FailingDb(), index=index).search_ads_by_embedding(
+        eye[1], 1
+    )
+
+    assert [m.ad.id for m in matches] == [2]